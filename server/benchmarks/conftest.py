@@ -0,0 +1,188 @@
+"""
+Endpoint benchmarks, run with ``pytest`` from the server directory:
+
+    pytest                                  # small dataset, compare to baseline.json
+    pytest --bench-size=large --bench-keepdb
+    pytest --bench-latency                  # also compare median latencies
+    pytest --update-baseline                # record the current numbers
+
+The dataset is seeded into a throwaway SQLite file using the production
+connection settings. With --bench-keepdb it is kept in
+benchmark_<size>.sqlite3 and reused by later runs, which saves seeding
+the large sizes again.
+
+A run fails when an endpoint makes more queries than its baseline entry
+or returns a payload more than 10% larger. These hold on any host. With
+--bench-latency it also fails when the median latency exceeds the
+baseline by more than --bench-tolerance; that is only meaningful on the
+machine that recorded the baseline, so it is left out by default.
+"""
+import json
+import os
+import tempfile
+import django
+import pytest
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--bench-size', default='small', help="Dataset size: small, medium or large.")
+    group.addoption('--bench-rounds', type=int, default=30, help="Timed requests per endpoint.")
+    group.addoption('--bench-keepdb', action='store_true', help="Keep and reuse the seeded database.")
+    group.addoption('--bench-baseline', default=BASELINE_PATH, help="Baseline file to compare against.")
+    group.addoption('--update-baseline', action='store_true', help="Write the results to the baseline file.")
+    group.addoption(
+        '--bench-latency', action='store_true',
+        help="Also fail on median latency regressions (only meaningful on the baseline's machine)."
+    )
+    group.addoption(
+        '--bench-tolerance', type=float, default=0.5,
+        help="Allowed median slowdown over the baseline, as a fraction (0.5 = 50%%)."
+    )
+
+
+def pytest_configure(config):
+    django.setup()
+    from django.conf import settings
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    settings.MEDIA_ROOT = tempfile.mkdtemp(prefix='benchmark-media-')
+    # Measure the views, not cache hits or the profiler.
+    settings.RESPONSE_CACHE = {**settings.RESPONSE_CACHE, 'ENABLED': False}
+    settings.REQUEST_INSTRUMENTATION = {**settings.REQUEST_INSTRUMENTATION, 'SAMPLE_RATE': 0}
+    settings.TOPIC_CONTENT_RENDER_IN_BACKGROUND = False
+
+    config.benchmark_results = {}
+    config.benchmark_baseline = Baseline(config.getoption('bench_baseline'), config.getoption('bench_size'))
+
+
+class Baseline:
+    """Stored results per dataset size and endpoint."""
+    # Latency is noisy, so small differences are never a regression.
+    min_slack_ms = 5.0
+    payload_tolerance = 0.1
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        try:
+            with open(path) as stream:
+                self.data = json.load(stream)
+        except FileNotFoundError:
+            self.data = {}
+
+    def get(self, name):
+        return self.data.get(self.size, {}).get(name)
+
+    def check(self, name, result, tolerance=None):
+        """
+        Return a list of regressions of ``result`` against the stored entry.
+        Latency is only compared when a ``tolerance`` is given.
+        """
+        expected = self.get(name)
+        if expected is None:
+            return []
+        problems = []
+        if result['queries'] > expected['queries']:
+            problems.append(f"queries {expected['queries']} -> {result['queries']}")
+        # p95 of a few dozen requests is mostly noise, the median is what's compared.
+        if tolerance is not None:
+            allowed_ms = max(expected['p50_ms'] * (1 + tolerance), expected['p50_ms'] + self.min_slack_ms)
+            if result['p50_ms'] > allowed_ms:
+                problems.append(
+                    f"p50 {expected['p50_ms']}ms -> {result['p50_ms']}ms (limit {allowed_ms:.1f}ms)"
+                )
+        if result['bytes'] > expected['bytes'] * (1 + self.payload_tolerance):
+            problems.append(f"payload {expected['bytes']} -> {result['bytes']} bytes")
+        return problems
+
+    def update(self, results):
+        self.data.setdefault(self.size, {}).update(results)
+        with open(self.path, 'w') as stream:
+            json.dump(self.data, stream, indent=2, sort_keys=True)
+            stream.write('\n')
+
+
+@pytest.fixture(scope='session')
+def dataset(request, django_db_setup):
+    """Seeded data shared by every benchmark."""
+    from benchmarks.datasets import get_size, is_seeded, seed_dataset
+
+    size = get_size(request.config.getoption('bench_size'))
+    if not is_seeded():
+        seed_dataset(size)
+    return size
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(request):
+    from django.conf import settings
+    from django.db import connections
+    from django.test.utils import setup_databases, teardown_databases
+
+    keepdb = request.config.getoption('bench_keepdb')
+    size = request.config.getoption('bench_size')
+    if keepdb:
+        name = os.path.join(settings.BASE_DIR, f'benchmark_{size}.sqlite3')
+    else:
+        name = os.path.join(tempfile.mkdtemp(prefix='benchmark-db-'), 'benchmark.sqlite3')
+    connections['default'].settings_dict['TEST']['NAME'] = name
+
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+    yield
+    teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+
+
+@pytest.fixture
+def record_result(request):
+    """Store an endpoint's numbers and fail on a regression against the baseline."""
+    config = request.config
+
+    def record(name, result):
+        config.benchmark_results[name] = result
+        if config.getoption('update_baseline'):
+            return
+        tolerance = config.getoption('bench_tolerance') if config.getoption('bench_latency') else None
+        problems = config.benchmark_baseline.check(name, result, tolerance)
+        if problems:
+            pytest.fail(f"{name} regressed: " + '; '.join(problems), pytrace=False)
+
+    return record
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    if config.getoption('update_baseline') and getattr(config, 'benchmark_results', None):
+        config.benchmark_baseline.update(config.benchmark_results)
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    results = getattr(config, 'benchmark_results', None)
+    if not results:
+        return
+    baseline = config.benchmark_baseline
+    terminalreporter.section(f"endpoint benchmarks ({baseline.size})")
+    terminalreporter.write_line(
+        f"{'endpoint':<40} {'p50 ms':>8} {'p95 ms':>8} {'base p50':>9} {'queries':>8} {'bytes':>9}"
+    )
+    for name, result in sorted(results.items()):
+        expected = baseline.get(name)
+        terminalreporter.write_line(
+            f"{name:<40} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+            f"{expected['p50_ms'] if expected else '-':>9} {result['queries']:>8} {result['bytes']:>9}"
+        )
+    # Requests run one at a time in one process, so this is what one core sustains.
+    login = results.get('users token')
+    if login:
+        expected = baseline.get('users token')
+        terminalreporter.write_line(
+            f"Logins per second per core: {1000 / login['p50_ms']:.2f}"
+            + (f" (baseline {1000 / expected['p50_ms']:.2f})" if expected else '')
+        )
+    if config.getoption('update_baseline'):
+        terminalreporter.write_line(f"Baseline written to {baseline.path}")
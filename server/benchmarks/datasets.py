@@ -0,0 +1,60 @@
+"""
+Seeded benchmark datasets, built with the same generator as the
+generate_fixtures command.
+"""
+from content_management_system.models import Course
+from content_management_system.synthetic import generate_catalog
+from user_management_system.models import CustomUser
+
+SIZES = {
+    'small': {
+        'users': 200,
+        'courses': 1000,
+        'lessons_per_course': 4,
+        'topics_per_lesson': 3,
+        'ratings_per_course': 5,
+        'comments': 20000,
+        'max_depth': 6,
+    },
+    'medium': {
+        'users': 2000,
+        'courses': 10000,
+        'lessons_per_course': 4,
+        'topics_per_lesson': 3,
+        'ratings_per_course': 10,
+        'comments': 100000,
+        'max_depth': 10,
+    },
+    'large': {
+        'users': 20000,
+        'courses': 100000,
+        'lessons_per_course': 4,
+        'topics_per_lesson': 3,
+        'ratings_per_course': 10,
+        'comments': 1000000,
+        'max_depth': 20,
+    },
+}
+
+# Every benchmark user shares this password; auth cases log in with it.
+PASSWORD = 'bench-Password-1'
+
+
+def get_size(name):
+    try:
+        return SIZES[name]
+    except KeyError:
+        raise ValueError(f"Unknown dataset size {name!r}, choose from: {', '.join(SIZES)}")
+
+
+def is_seeded():
+    return Course.objects.exists()
+
+
+def seed_dataset(size, seed=0):
+    """Create the dataset ``size`` (a SIZES entry). Returns the created row counts."""
+    # A few inactive rows keep the is_active filters honest.
+    counts = generate_catalog(**size, password=PASSWORD, seed=seed, inactive_ratio=0.02)
+    # The first user is the staff account of the admin cases.
+    CustomUser.objects.filter(pk=CustomUser.objects.order_by('pk').values('pk')[:1]).update(is_staff=True)
+    return counts
@@ -0,0 +1,374 @@
+"""
+One benchmark per route of content_management_system/urls.py and
+user_management_system/urls.py. Each case builds its request before the
+timer starts (fresh users, tokens, unique emails), so only the request
+itself is measured. The first request of a case is a warm-up; its query
+count is the one reported.
+"""
+import gc
+import io
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from content_management_system.models import Course, CourseComment, CourseLesson, LessonTopic
+from user_management_system.authentication import add_user_claims, user_cache
+from user_management_system.models import CustomUser
+from benchmarks.datasets import PASSWORD
+
+CASES = []
+
+# Cases that hash a password are slow by design and get fewer rounds.
+HASHING_ROUNDS = 5
+
+
+def endpoint(name, status=200, rounds=None):
+    """Register ``prepare(client, bench, round)``, which returns (method, path, kwargs)."""
+    def decorator(prepare):
+        CASES.append(SimpleNamespace(name=name, status=status, rounds=rounds, prepare=prepare))
+        return prepare
+    return decorator
+
+
+def authenticate(client, user):
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {add_user_claims(AccessToken.for_user(user), user)}')
+
+
+def make_user(bench, **fields):
+    """A verified user with the shared benchmark password, without hashing it again."""
+    key = uuid.uuid4().hex[:12]
+    values = {
+        'username': f'bench_{key}', 'email': f'{key}@bench.example.com',
+        'password': bench.staff.password, 'is_verified': True,
+    }
+    values.update(fields)
+    return CustomUser.objects.create(**values)
+
+
+def get_uid_and_token(user):
+    return urlsafe_base64_encode(force_bytes(user.pk)), default_token_generator.make_token(user)
+
+
+@pytest.fixture(scope='session')
+def bench(dataset):
+    """Objects the cases point at: the busiest course and its first lesson, topic and thread."""
+    staff = CustomUser.objects.filter(is_staff=True).order_by('pk').first()
+    course = Course.objects.filter(is_active=True).order_by('pk').first()
+    lesson = CourseLesson.objects.filter(course=course, is_active=True).order_by('lesson_order', 'pk').first()
+    topic = LessonTopic.objects.filter(lesson=lesson, is_active=True).order_by('topic_order', 'pk').first()
+    thread = CourseComment.objects.filter(course=course, parent=None).order_by('pk').first()
+    # Writes go to another course so they don't change what the read cases return.
+    scratch_course = Course.objects.filter(is_active=True).exclude(pk=course.pk).order_by('pk').first()
+    scratch_thread = CourseComment.objects.filter(course=scratch_course, parent=None).order_by('pk').first()
+    if scratch_thread is None:
+        scratch_thread = CourseComment.objects.create(course=scratch_course, user=staff, content='Scratch thread')
+
+    image = io.BytesIO()
+    Image.new('RGB', (64, 64), color=(200, 80, 40)).save(image, format='PNG')
+    return SimpleNamespace(
+        staff=staff, course=course, lesson=lesson, topic=topic, thread=thread,
+        scratch_course=scratch_course, scratch_thread=scratch_thread,
+        avatar_user=None, unverified=None, avatar=image.getvalue(),
+    )
+
+
+def measure(case, bench, rounds):
+    client = APIClient()
+    timings = []
+    queries = size = None
+    for round_number in range(rounds + 1):
+        method, path, kwargs = case.prepare(client, bench, round_number)
+        for cache in caches.all():
+            cache.clear()
+        user_cache.clear()
+        gc.collect()
+        if round_number == 0:
+            with CaptureQueriesContext(connection) as captured:
+                response = getattr(client, method)(path, **kwargs)
+            queries = len(captured.captured_queries)
+        else:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            timings.append(time.perf_counter() - started)
+
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        assert response.status_code == case.status, f"{case.name}: {response.status_code} {content[:300]!r}"
+        size = len(content)
+        client.credentials()
+        client.cookies.clear()
+
+    percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'p50_ms': round(percentiles[49] * 1000, 2),
+        'p95_ms': round(percentiles[94] * 1000, 2),
+        'queries': queries,
+        'bytes': size,
+    }
+
+
+@pytest.mark.parametrize('case', CASES, ids=lambda case: case.name)
+def test_endpoint(case, bench, record_result, request):
+    rounds = case.rounds or request.config.getoption('bench_rounds')
+    record_result(case.name, measure(case, bench, rounds))
+
+
+# content_management_system
+
+@endpoint('cms course-categories list')
+def course_categories(client, bench, round_number):
+    return 'get', '/api/cms/course-categories/', {}
+
+
+@endpoint('cms course-categories detail')
+def course_category(client, bench, round_number):
+    return 'get', f'/api/cms/course-categories/{bench.course.course_category_id}/', {}
+
+
+@endpoint('cms course-types list')
+def course_types(client, bench, round_number):
+    return 'get', '/api/cms/course-types/', {}
+
+
+@endpoint('cms course-types detail')
+def course_type(client, bench, round_number):
+    return 'get', f'/api/cms/course-types/{bench.course.course_type_id}/', {}
+
+
+@endpoint('cms courses list')
+def courses(client, bench, round_number):
+    return 'get', '/api/cms/courses/', {}
+
+
+@endpoint('cms courses list by score')
+def courses_by_score(client, bench, round_number):
+    return 'get', '/api/cms/courses/?ordering=-rating_score', {}
+
+
+@endpoint('cms courses list by category')
+def courses_by_category(client, bench, round_number):
+    return 'get', f'/api/cms/courses/?course_category={bench.course.course_category_id}', {}
+
+
+@endpoint('cms courses list cursor')
+def courses_cursor(client, bench, round_number):
+    return 'get', '/api/cms/courses/?pagination=cursor', {}
+
+
+@endpoint('cms courses list search')
+def courses_search(client, bench, round_number):
+    return 'get', '/api/cms/courses/?search=python', {}
+
+
+@endpoint('cms courses detail')
+def course(client, bench, round_number):
+    return 'get', f'/api/cms/courses/{bench.course.pk}/', {}
+
+
+@endpoint('cms courses outline')
+def course_outline(client, bench, round_number):
+    return 'get', f'/api/cms/courses/{bench.course.course_slug}/outline/', {}
+
+
+@endpoint('cms course-lessons list')
+def course_lessons(client, bench, round_number):
+    return 'get', '/api/cms/course-lessons/', {}
+
+
+@endpoint('cms course-lessons list by course')
+def course_lessons_by_course(client, bench, round_number):
+    return 'get', f'/api/cms/course-lessons/?course={bench.course.pk}', {}
+
+
+@endpoint('cms course-lessons detail')
+def course_lesson(client, bench, round_number):
+    return 'get', f'/api/cms/course-lessons/{bench.lesson.pk}/', {}
+
+
+@endpoint('cms topic-types list')
+def topic_types(client, bench, round_number):
+    return 'get', '/api/cms/topic-types/', {}
+
+
+@endpoint('cms topic-types detail')
+def topic_type(client, bench, round_number):
+    return 'get', f'/api/cms/topic-types/{bench.topic.type_id}/', {}
+
+
+@endpoint('cms lesson-topics list')
+def lesson_topics(client, bench, round_number):
+    return 'get', '/api/cms/lesson-topics/', {}
+
+
+@endpoint('cms lesson-topics list by course')
+def lesson_topics_by_course(client, bench, round_number):
+    return 'get', f'/api/cms/lesson-topics/?lesson__course={bench.course.pk}', {}
+
+
+@endpoint('cms lesson-topics detail')
+def lesson_topic(client, bench, round_number):
+    return 'get', f'/api/cms/lesson-topics/{bench.topic.pk}/', {}
+
+
+@endpoint('cms lesson-topics content')
+def lesson_topic_content(client, bench, round_number):
+    return 'get', f'/api/cms/lesson-topics/{bench.topic.pk}/content/', {}
+
+
+@endpoint('cms search')
+def search(client, bench, round_number):
+    return 'get', '/api/cms/search/?q=python', {}
+
+
+@endpoint('cms cache-stats')
+def cache_stats(client, bench, round_number):
+    authenticate(client, bench.staff)
+    return 'get', '/api/cms/cache-stats/', {}
+
+
+@endpoint('cms comments list by course')
+def comments(client, bench, round_number):
+    return 'get', f'/api/cms/comments/?course={bench.course.pk}', {}
+
+
+@endpoint('cms comments detail')
+def comment(client, bench, round_number):
+    return 'get', f'/api/cms/comments/{bench.thread.pk}/', {}
+
+
+@endpoint('cms comments create', status=201)
+def comment_create(client, bench, round_number):
+    authenticate(client, bench.staff)
+    data = {'course': bench.scratch_course.pk, 'content': 'Benchmark comment'}
+    return 'post', '/api/cms/comments/', {'data': data}
+
+
+@endpoint('cms comments reply', status=201)
+def comment_reply(client, bench, round_number):
+    authenticate(client, bench.staff)
+    data = {'course': bench.scratch_course.pk, 'content': 'Benchmark reply', 'parent': bench.scratch_thread.pk}
+    return 'post', '/api/cms/comments/', {'data': data}
+
+
+@endpoint('cms comments update')
+def comment_update(client, bench, round_number):
+    authenticate(client, bench.staff)
+    data = {'content': f'Edited {round_number}'}
+    return 'patch', f'/api/cms/comments/{bench.scratch_thread.pk}/', {'data': data}
+
+
+@endpoint('cms comments delete', status=204)
+def comment_delete(client, bench, round_number):
+    authenticate(client, bench.staff)
+    comment = CourseComment.objects.create(course=bench.scratch_course, user=bench.staff, content='Delete me')
+    return 'delete', f'/api/cms/comments/{comment.pk}/', {}
+
+
+# user_management_system
+
+@endpoint('users register', status=201, rounds=HASHING_ROUNDS)
+def register(client, bench, round_number):
+    data = {
+        'first_name': 'New', 'last_name': 'User', 'email': f'{uuid.uuid4().hex[:12]}@bench.example.com',
+        'password': PASSWORD, 'confirm_password': PASSWORD,
+    }
+    return 'post', '/api/users/register/', {'data': data}
+
+
+@endpoint('users verify-email')
+def verify_email(client, bench, round_number):
+    uid, token = get_uid_and_token(make_user(bench, is_verified=False, is_active=False))
+    return 'get', f'/api/users/verify-email/{uid}/{token}/', {}
+
+
+@endpoint('users token', rounds=HASHING_ROUNDS)
+def token(client, bench, round_number):
+    return 'post', '/api/users/token/', {'data': {'email': bench.staff.email, 'password': PASSWORD}}
+
+
+@endpoint('users token refresh')
+def token_refresh(client, bench, round_number):
+    client.cookies['refresh_token'] = str(RefreshToken.for_user(bench.staff))
+    return 'post', '/api/users/token/refresh/', {}
+
+
+@endpoint('users logout')
+def logout(client, bench, round_number):
+    authenticate(client, bench.staff)
+    client.cookies['refresh_token'] = str(RefreshToken.for_user(bench.staff))
+    return 'post', '/api/users/logout/', {}
+
+
+@endpoint('users profile')
+def profile(client, bench, round_number):
+    authenticate(client, bench.staff)
+    return 'get', '/api/users/profile/', {}
+
+
+@endpoint('users update-profile')
+def update_profile(client, bench, round_number):
+    authenticate(client, bench.staff)
+    return 'patch', '/api/users/update-profile/', {'data': {'first_name': f'Bench {round_number}'}}
+
+
+@endpoint('users update-username')
+def update_username(client, bench, round_number):
+    authenticate(client, bench.staff)
+    return 'patch', '/api/users/update-username/', {'data': {'username': f'bench_{uuid.uuid4().hex[:16]}'}}
+
+
+@endpoint('users update-avatar')
+def update_avatar(client, bench, round_number):
+    if bench.avatar_user is None:
+        bench.avatar_user = make_user(bench)
+    authenticate(client, bench.avatar_user)
+    avatar = SimpleUploadedFile('avatar.png', bench.avatar, content_type='image/png')
+    return 'patch', '/api/users/update-avatar/', {'data': {'avatar': avatar}, 'format': 'multipart'}
+
+
+@endpoint('users change-password', rounds=HASHING_ROUNDS)
+def change_password(client, bench, round_number):
+    authenticate(client, make_user(bench))
+    data = {'old_password': PASSWORD, 'new_password': PASSWORD + '!', 'confirm_new_password': PASSWORD + '!'}
+    return 'put', '/api/users/change-password/', {'data': data}
+
+
+@endpoint('users change-email')
+def change_email(client, bench, round_number):
+    authenticate(client, make_user(bench))
+    return 'put', '/api/users/change-email/', {'data': {'new_email': f'{uuid.uuid4().hex[:12]}@bench.example.com'}}
+
+
+@endpoint('users delete-account')
+def delete_account(client, bench, round_number):
+    authenticate(client, make_user(bench))
+    return 'delete', '/api/users/delete-account/', {}
+
+
+@endpoint('users resend-verification-email')
+def resend_verification_email(client, bench, round_number):
+    if bench.unverified is None:
+        bench.unverified = make_user(bench, is_verified=False, is_active=False)
+    return 'post', '/api/users/resend-verification-email/', {'data': {'email': bench.unverified.email}}
+
+
+@endpoint('users request-password-reset')
+def request_password_reset(client, bench, round_number):
+    return 'post', '/api/users/request-password-reset/', {'data': {'email': bench.staff.email}}
+
+
+@endpoint('users reset-password', rounds=HASHING_ROUNDS)
+def reset_password(client, bench, round_number):
+    uid, token = get_uid_and_token(make_user(bench))
+    data = {'new_password': PASSWORD + '!', 'confirm_password': PASSWORD + '!'}
+    return 'post', f'/api/users/reset-password/{uid}/{token}/', {'data': data}
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ContentManagementSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'content_management_system'
+
+    def ready(self):
+        # Connect the search index, rating statistics, response cache,
+        # course timestamp and topic rendering signal handlers
+        from content_management_system import (  # noqa: F401
+            search, ratings, response_cache, course_timestamps, render_queue
+        )
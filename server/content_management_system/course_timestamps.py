@@ -0,0 +1,117 @@
+import threading
+from contextlib import contextmanager
+from django.db import router, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from content_management_system.models import Course, CourseLesson, LessonTopic, AuthorDetails
+from content_management_system.response_cache import bump_generation
+
+
+class CourseTimestampQueue:
+    """
+    Courses whose ``updated_at`` has to be bumped, written with one
+    ``UPDATE ... WHERE id IN (...)`` when the current transaction commits
+    (immediately in autocommit mode). Saving 30 topics of one lesson in a
+    formset thus costs one UPDATE instead of 30 course saves. Topics queue
+    their lesson id, which the UPDATE resolves to the course with a
+    subquery, so no lesson is loaded per topic.
+
+    Ids recorded by a transaction that is rolled back stay queued and are
+    bumped with the next flush, which only makes that course look changed.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def get_state(self):
+        if not hasattr(self.local, 'course_ids'):
+            self.local.course_ids = set()
+            self.local.lesson_ids = set()
+            self.local.batch_depth = 0
+            self.local.suppressed = False
+        return self.local
+
+    def add(self, course_id):
+        self.queue('course_ids', course_id)
+
+    def add_lesson(self, lesson_id):
+        """Queue the course of ``lesson_id``, looked up when flushing."""
+        self.queue('lesson_ids', lesson_id)
+
+    def queue(self, name, value):
+        state = self.get_state()
+        if state.suppressed:
+            return
+        getattr(state, name).add(value)
+        if not state.batch_depth:
+            # One callback per save, the first one to run does the work
+            # and the rest find the queue empty.
+            transaction.on_commit(self.flush, using=router.db_for_write(Course))
+
+    def flush(self):
+        """Bump every queued course. Returns the number of courses updated."""
+        state = self.get_state()
+        course_ids, state.course_ids = state.course_ids, set()
+        lesson_ids, state.lesson_ids = state.lesson_ids, set()
+        if not course_ids and not lesson_ids:
+            return 0
+        condition = Q(pk__in=course_ids)
+        if lesson_ids:
+            condition |= Q(pk__in=CourseLesson.objects.filter(pk__in=lesson_ids).values('course_id'))
+        updated = Course.objects.filter(condition).update(updated_at=timezone.now())
+        # update() sends no post_save, so drop the cached course responses here.
+        bump_generation(Course)
+        return updated
+
+    @contextmanager
+    def batch(self, suppress=False):
+        """
+        Collect bumps until the block exits and flush them once, or drop them
+        altogether with ``suppress=True`` (e.g. when the caller sets
+        ``updated_at`` itself).
+        """
+        state = self.get_state()
+        previous = state.suppressed
+        state.batch_depth += 1
+        state.suppressed = previous or suppress
+        try:
+            yield
+        finally:
+            state.batch_depth -= 1
+            state.suppressed = previous
+            if not state.batch_depth and (state.course_ids or state.lesson_ids):
+                transaction.on_commit(self.flush, using=router.db_for_write(Course))
+
+
+course_timestamp_queue = CourseTimestampQueue()
+
+
+def batch_course_timestamps(suppress=False):
+    """
+    Context manager coalescing course ``updated_at`` bumps for bulk work:
+
+        with batch_course_timestamps():
+            for topic in topics:
+                topic.save()
+    """
+    return course_timestamp_queue.batch(suppress=suppress)
+
+
+# Signal handlers
+@receiver(post_save, sender=CourseLesson)
+@receiver(post_delete, sender=CourseLesson)
+@receiver(post_save, sender=LessonTopic)
+@receiver(post_delete, sender=LessonTopic)
+@receiver(post_save, sender=AuthorDetails)
+@receiver(post_delete, sender=AuthorDetails)
+def update_course_modified_date(sender, instance, **kwargs):
+    """Queue the parent course's modified date for an update when related objects change"""
+    if isinstance(instance, LessonTopic):
+        # A topic deleted along with its lesson finds no course, which
+        # is being deleted or bumped by the lesson anyway.
+        if instance.lesson_id:
+            course_timestamp_queue.add_lesson(instance.lesson_id)
+    elif instance.course_id:
+        course_timestamp_queue.add(instance.course_id)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from content_management_system.ratings import reconcile_course_ratings
+
+
+class Command(BaseCommand):
+    help = "Recalculate the denormalized rating statistics of every course."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        updated = reconcile_course_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated rating statistics for {updated} courses."))
@@ -0,0 +1,134 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure SQLite reader/writer throughput with Django's default connection "
+        "settings and with the SQLITE_PRAGMAS production profile, on a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0, help="Seconds per profile.")
+        parser.add_argument('--rows', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        profiles = [
+            # Django defaults: rollback journal, a connection per request,
+            # deferred transactions.
+            ('default', [], False, 'DEFERRED'),
+            (
+                'production',
+                [f'PRAGMA {name}={value}' for name, value in settings.SQLITE_PRAGMAS.items()],
+                True,
+                settings.DATABASES['default'].get('OPTIONS', {}).get('transaction_mode', 'DEFERRED'),
+            ),
+        ]
+        self.stdout.write(
+            f"{options['readers']} readers, {options['writers']} writers, "
+            f"{options['duration']}s per profile, {options['rows']} rows"
+        )
+        for name, pragmas, persistent, transaction_mode in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.create_database(path, options['rows'])
+                result = self.run_profile(path, pragmas, persistent, transaction_mode, options)
+            self.stdout.write(
+                f"{name:>10}: {result['reads'] / options['duration']:9.0f} reads/s  "
+                f"{result['writes'] / options['duration']:7.0f} writes/s  "
+                f"read p99 {result['read_p99'] * 1000:6.1f}ms  "
+                f"write p99 {result['write_p99'] * 1000:6.1f}ms  "
+                f"{result['errors']} lock errors"
+            )
+
+    def create_database(self, path, rows):
+        connection = sqlite3.connect(path)
+        connection.execute(
+            "CREATE TABLE item (id INTEGER PRIMARY KEY, title TEXT, body TEXT, views INTEGER)"
+        )
+        connection.executemany(
+            "INSERT INTO item (title, body, views) VALUES (?, ?, 0)",
+            ((f'Topic {index}', 'lorem ipsum ' * 40) for index in range(rows))
+        )
+        connection.commit()
+        connection.close()
+
+    def connect(self, path, pragmas):
+        connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        for pragma in pragmas:
+            connection.execute(pragma)
+        return connection
+
+    def run_profile(self, path, pragmas, persistent, transaction_mode, options):
+        rows = options['rows']
+        deadline = time.monotonic() + options['duration']
+        lock = threading.Lock()
+        result = {'reads': 0, 'writes': 0, 'errors': 0}
+        latencies = {'read': [], 'write': []}
+
+        def read(connection):
+            start = connection.execute("SELECT abs(random()) % ?", [rows]).fetchone()[0]
+            connection.execute(
+                "SELECT id, title, body FROM item WHERE id > ? ORDER BY id LIMIT 20", [start]
+            ).fetchall()
+            connection.execute("SELECT count(*) FROM item WHERE views > 0").fetchone()
+
+        def write(connection):
+            connection.execute(f"BEGIN {transaction_mode}")
+            try:
+                # Read then write, like a view updating a row it just loaded
+                item_id = random.randint(1, rows)
+                connection.execute("SELECT views FROM item WHERE id = ?", [item_id]).fetchone()
+                connection.execute("UPDATE item SET views = views + 1 WHERE id = ?", [item_id])
+                connection.execute("COMMIT")
+            except sqlite3.OperationalError:
+                connection.execute("ROLLBACK")
+                raise
+
+        def worker(kind, operation):
+            connection = self.connect(path, pragmas) if persistent else None
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    if persistent:
+                        operation(connection)
+                    else:
+                        # No CONN_MAX_AGE: every request opens its own connection.
+                        request_connection = self.connect(path, pragmas)
+                        try:
+                            operation(request_connection)
+                        finally:
+                            request_connection.close()
+                except sqlite3.OperationalError:
+                    with lock:
+                        result['errors'] += 1
+                    continue
+                elapsed = time.perf_counter() - started
+                with lock:
+                    result[kind + 's'] += 1
+                    latencies[kind].append(elapsed)
+            if connection is not None:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=('read', read)) for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=worker, args=('write', write)) for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for kind, values in latencies.items():
+            values.sort()
+            result[f'{kind}_p99'] = values[int(len(values) * 0.99)] if values else 0.0
+        return result
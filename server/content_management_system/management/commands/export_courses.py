@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from content_management_system.models import Course
+from content_management_system.transfer import export_courses
+
+
+class Command(BaseCommand):
+    help = "Export courses with their lessons and topics as JSON lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help="File to write to, '-' for stdout (default)."
+        )
+        parser.add_argument(
+            '--course', action='append', dest='courses', metavar='SLUG',
+            help="Only export the course with this slug. May be repeated."
+        )
+        parser.add_argument('--published', action='store_true', help="Only export published courses.")
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        queryset = Course.objects.all()
+        if options['courses']:
+            queryset = queryset.filter(course_slug__in=options['courses'])
+        if options['published']:
+            queryset = queryset.filter(is_published=True)
+
+        if options['output'] == '-':
+            total = export_courses(self.stdout, queryset, batch_size=options['batch_size'])
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                total = export_courses(stream, queryset, batch_size=options['batch_size'])
+        self.stderr.write(self.style.SUCCESS(f"Exported {total} courses."))
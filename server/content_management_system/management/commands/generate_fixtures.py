@@ -0,0 +1,76 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from content_management_system.synthetic import DEFAULTS, generate_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic catalog for load testing: users, categories, "
+        "courses with lessons, topics, authors and ratings, and threaded comments spread "
+        "over the courses following a Zipf distribution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=DEFAULTS['users'])
+        parser.add_argument('--courses', type=int, default=DEFAULTS['courses'])
+        parser.add_argument('--lessons-per-course', type=int, default=DEFAULTS['lessons_per_course'])
+        parser.add_argument('--topics-per-lesson', type=int, default=DEFAULTS['topics_per_lesson'])
+        parser.add_argument(
+            '--authors-per-course', type=int, default=DEFAULTS['authors_per_course'],
+            help="Authors per course, including its creator."
+        )
+        parser.add_argument(
+            '--ratings-per-course', type=int, default=DEFAULTS['ratings_per_course'],
+            help="Average number of ratings per course."
+        )
+        parser.add_argument('--comments', type=int, default=DEFAULTS['comments'], help="Total comments.")
+        parser.add_argument(
+            '--zipf', type=float, default=DEFAULTS['zipf'],
+            help="Exponent of the comment distribution; higher puts more comments on the busiest courses."
+        )
+        parser.add_argument('--max-depth', type=int, default=DEFAULTS['max_depth'], help="Deepest reply level.")
+        parser.add_argument(
+            '--workers', type=int, default=DEFAULTS['workers'],
+            help="Worker processes generating courses (default: one per CPU)."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULTS['batch_size'], help="Rows per INSERT."
+        )
+        parser.add_argument(
+            '--seed', type=int, default=DEFAULTS['seed'],
+            help="Random seed; the same seed and options produce the same catalog."
+        )
+        parser.add_argument(
+            '--password', default=DEFAULTS['password'], help="Password of every generated user."
+        )
+        parser.add_argument(
+            '--no-index', action='store_true', help="Don't rebuild the search index afterwards."
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            counts = generate_catalog(
+                users=options['users'],
+                courses=options['courses'],
+                lessons_per_course=options['lessons_per_course'],
+                topics_per_lesson=options['topics_per_lesson'],
+                authors_per_course=options['authors_per_course'],
+                ratings_per_course=options['ratings_per_course'],
+                comments=options['comments'],
+                zipf=options['zipf'],
+                max_depth=options['max_depth'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                seed=options['seed'],
+                password=options['password'],
+                build_search_index=not options['no_index'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {total} rows in {time.perf_counter() - started:.1f}s: " +
+            ', '.join(f"{count} {name}" for name, count in counts.items())
+        ))
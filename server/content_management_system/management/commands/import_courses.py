@@ -0,0 +1,45 @@
+import sys
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from content_management_system.transfer import CourseImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Import courses with their lessons and topics from JSON lines written by "
+        "export_courses. Imported courses are always created as new courses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, '-' for stdin.")
+        parser.add_argument(
+            '--owner', metavar='EMAIL',
+            help="User owning content whose author does not exist in this database."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Rows (courses, lessons and topics) inserted per transaction."
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            try:
+                owner = get_user_model().objects.get(email=options['owner'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['owner']}.")
+
+        importer = CourseImporter(owner=owner, batch_size=options['batch_size'])
+        try:
+            if options['path'] == '-':
+                counts = importer.run(sys.stdin)
+            else:
+                with open(options['path'], encoding='utf-8') as stream:
+                    counts = importer.run(stream)
+        except (ValueError, KeyError) as e:
+            raise CommandError(f"Import failed: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {counts['courses']} courses, {counts['lessons']} lessons "
+            f"and {counts['topics']} topics."
+        ))
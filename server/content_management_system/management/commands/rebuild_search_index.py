@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from content_management_system.search import rebuild_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for courses, lessons and topics."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError("The search index requires the SQLite database backend.")
+        with transaction.atomic():
+            total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} documents."))
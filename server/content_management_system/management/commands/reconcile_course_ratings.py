@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from content_management_system.ratings import reconcile_course_ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Check course rating statistics against CourseRating and repair any drift. "
+        "Meant to run periodically, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report drifted courses without fixing them."
+        )
+
+    def handle(self, *args, **options):
+        drifted = reconcile_course_ratings(
+            batch_size=options['batch_size'], dry_run=options['dry_run']
+        )
+        if drifted:
+            action = "found" if options['dry_run'] else "repaired"
+            self.stdout.write(self.style.WARNING(f"{drifted} courses had drifted rating statistics ({action})."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Rating statistics are consistent."))
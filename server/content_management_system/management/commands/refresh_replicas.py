@@ -0,0 +1,49 @@
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the SQLite replicas listed in "
+        "DATABASE_REPLICAS, for running the replica router locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch', type=float, metavar='SECONDS',
+            help="Keep refreshing every SECONDS instead of once."
+        )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = list(getattr(settings, 'DATABASE_REPLICAS', []))
+        if not replicas:
+            raise CommandError("DATABASE_REPLICAS is empty.")
+        for alias in [DEFAULT_DB_ALIAS, *replicas]:
+            if settings.DATABASES[alias]['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f"Database '{alias}' is not SQLite.")
+
+        while True:
+            for alias in replicas:
+                started = time.monotonic()
+                self.copy_database(primary['NAME'], settings.DATABASES[alias]['NAME'])
+                self.stdout.write(f"Refreshed {alias} in {time.monotonic() - started:.2f}s.")
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
+
+    def copy_database(self, source_path, target_path):
+        # The backup API copies a consistent snapshot page by page and writes
+        # into the live replica file under its lock, so connections already
+        # open on the replica see the new content (a file copy or rename
+        # would leave them reading the old one).
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
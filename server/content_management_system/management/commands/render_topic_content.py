@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from content_management_system.render_queue import render_missing_content
+
+
+class Command(BaseCommand):
+    help = (
+        "Render topic content that has no stored rendered output yet, e.g. after "
+        "the migration or when a worker exited with jobs still queued."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        total = render_missing_content(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rendered {total} topic bodies."))
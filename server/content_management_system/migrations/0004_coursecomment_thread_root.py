@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_threads(apps, schema_editor):
+    CourseComment = apps.get_model('content_management_system', 'CourseComment')
+    parents = dict(CourseComment.objects.values_list('id', 'parent_id'))
+    resolved = {}
+
+    def resolve(comment_id):
+        # Returns (thread_root_id, depth) walking up the parent chain.
+        if comment_id in resolved:
+            return resolved[comment_id]
+        parent_id = parents[comment_id]
+        if parent_id is None:
+            result = (None, 0)
+        else:
+            root_id, depth = resolve(parent_id)
+            result = (root_id or parent_id, depth + 1)
+        resolved[comment_id] = result
+        return result
+
+    comments = []
+    for comment in CourseComment.objects.filter(parent__isnull=False).only('id', 'parent_id'):
+        comment.thread_root_id, comment.depth = resolve(comment.id)
+        comments.append(comment)
+    CourseComment.objects.bulk_update(comments, ['thread_root', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management_system', '0003_alter_contactdetails_created_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursecomment',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='coursecomment',
+            name='thread_root',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_comments', to='content_management_system.coursecomment'),
+        ),
+        migrations.RunPython(backfill_threads, migrations.RunPython.noop),
+    ]
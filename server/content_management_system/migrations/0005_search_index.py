@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:05
+
+from django.db import migrations
+
+# Kept in sync with content_management_system.search
+SEARCH_TABLE = 'cms_search_index'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+            kind UNINDEXED,
+            object_id UNINDEXED,
+            course_id UNINDEXED,
+            lesson_id UNINDEXED,
+            slug UNINDEXED,
+            title,
+            body,
+            tokenize = 'porter unicode61'
+        )
+    """)
+    columns = "(rowid, kind, object_id, course_id, lesson_id, slug, title, body)"
+    schema_editor.execute(f"""
+        INSERT INTO {SEARCH_TABLE} {columns}
+        SELECT id * 3 + 1, 'course', id, id, NULL, course_slug, course_title, course_description
+        FROM content_management_system_course WHERE is_active = 1
+    """)
+    schema_editor.execute(f"""
+        INSERT INTO {SEARCH_TABLE} {columns}
+        SELECT id * 3 + 2, 'lesson', id, course_id, id, lesson_slug, lesson_title, lesson_description
+        FROM content_management_system_courselesson WHERE is_active = 1
+    """)
+    schema_editor.execute(f"""
+        INSERT INTO {SEARCH_TABLE} {columns}
+        SELECT t.id * 3 + 3, 'topic', t.id, l.course_id, l.id, t.topic_slug, t.topic_title, t.topic_content
+        FROM content_management_system_lessontopic t
+        JOIN content_management_system_courselesson l ON l.id = t.lesson_id
+        WHERE t.is_active = 1
+    """)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management_system', '0004_coursecomment_thread_root'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
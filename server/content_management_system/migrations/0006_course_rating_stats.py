@@ -0,0 +1,93 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:57
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_stats(apps, schema_editor):
+    Course = apps.get_model('content_management_system', 'Course')
+    CourseRating = apps.get_model('content_management_system', 'CourseRating')
+    prior_mean = getattr(settings, 'COURSE_RATING_PRIOR_MEAN', 3.0)
+    prior_weight = getattr(settings, 'COURSE_RATING_PRIOR_WEIGHT', 5)
+
+    stats = {}
+    rows = CourseRating.objects.values('course_id', 'rating').annotate(
+        count=Count('id'), total=Sum('rating')
+    ).order_by()
+    for row in rows:
+        course_stats = stats.setdefault(row['course_id'], {'rating_count': 0, 'rating_sum': 0})
+        course_stats['rating_count'] += row['count']
+        course_stats['rating_sum'] += row['total']
+        course_stats[f"rating_{row['rating']}_count"] = row['count']
+
+    for course_id, course_stats in stats.items():
+        count, total = course_stats['rating_count'], course_stats['rating_sum']
+        course_stats['rating_average'] = total / count
+        course_stats['rating_score'] = (prior_mean * prior_weight + total) / (prior_weight + count)
+        Course.objects.filter(pk=course_id).update(**course_stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management_system', '0005_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_average',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['rating_score'], name='content_man_rating__af8e1f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['rating_average'], name='content_man_rating__7c51e8_idx'),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
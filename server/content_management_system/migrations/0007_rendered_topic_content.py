@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:08
+
+import django.db.models.deletion
+import hashlib
+from django.db import migrations, models
+
+
+def backfill_content_hashes(apps, schema_editor):
+    # Rendering itself is left to ``manage.py render_topic_content``.
+    LessonTopic = apps.get_model('content_management_system', 'LessonTopic')
+    batch = []
+    for topic in LessonTopic.objects.only('id', 'topic_content').iterator(chunk_size=500):
+        topic.rendered_content_id = hashlib.sha256(topic.topic_content.encode('utf-8')).hexdigest()
+        batch.append(topic)
+        if len(batch) >= 500:
+            LessonTopic.objects.bulk_update(batch, ['rendered_content'])
+            batch = []
+    LessonTopic.objects.bulk_update(batch, ['rendered_content'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management_system', '0006_course_rating_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedTopicContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('rendered_html', models.TextField()),
+                ('code_blocks', models.JSONField(default=list)),
+                ('compressed_html', models.BinaryField()),
+                ('word_count', models.PositiveIntegerField(default=0)),
+                ('reading_time', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Rendered Topic Content',
+                'verbose_name_plural': 'Rendered Topic Contents',
+            },
+        ),
+        migrations.AddField(
+            model_name='lessontopic',
+            name='rendered_content',
+            field=models.ForeignKey(blank=True, db_column='content_hash', db_constraint=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='content_management_system.renderedtopiccontent', to_field='content_hash'),
+        ),
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
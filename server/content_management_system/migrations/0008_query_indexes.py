@@ -0,0 +1,91 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management_system', '0007_rendered_topic_content'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='course',
+            name='content_man_course__8d52f7_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='course',
+            name='content_man_course__962575_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='course',
+            name='content_man_is_publ_a267d0_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='course',
+            name='content_man_is_acti_339795_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='course',
+            name='content_man_rating__af8e1f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='course',
+            name='content_man_rating__7c51e8_idx',
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['course_title'], name='course_active_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['course_category', 'course_title'], name='course_active_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['rating_score'], name='course_active_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['rating_average'], name='course_active_average_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category_name'], name='category_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecomment',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['course', '-created_at'], name='comment_course_root_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecomment',
+            index=models.Index(fields=['parent', '-created_at'], name='comment_parent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courselesson',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['course', 'lesson_order'], name='lesson_active_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courselesson',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['lesson_order'], name='lesson_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursetype',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['course_name'], name='coursetype_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessontopic',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['lesson', 'topic_order'], name='topic_active_lesson_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessontopic',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['topic_order'], name='topic_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topictype',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['type_name'], name='topictype_active_name_idx'),
+        ),
+    ]
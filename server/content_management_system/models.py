@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.text import slugify
 from django.conf import settings
@@ -6,8 +7,8 @@ from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.utils.translation import gettext_lazy as _
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from content_management_system.rendering import get_content_hash
+from content_management_system.slugs import save_with_unique_slug
 
 User = get_user_model()
 
@@ -23,6 +24,9 @@ class CourseCategory(models.Model):
         verbose_name = "Course Category"
         verbose_name_plural = "Course Categories"
         ordering = ['category_name']
+        indexes = [
+            models.Index(fields=['category_name'], condition=Q(is_active=True), name='category_active_name_idx'),
+        ]
 
     def __str__(self):
         return self.category_name
@@ -44,6 +48,9 @@ class CourseType(models.Model):
         verbose_name = "Course Type"
         verbose_name_plural = "Course Types"
         ordering = ['course_name']
+        indexes = [
+            models.Index(fields=['course_name'], condition=Q(is_active=True), name='coursetype_active_name_idx'),
+        ]
 
     def __str__(self):
         return self.course_name
@@ -94,15 +101,32 @@ class Course(models.Model):
     )
     is_active = models.BooleanField(default=True)
 
+    # Denormalized rating statistics, maintained by content_management_system.ratings
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.FloatField(default=0, editable=False)
+    rating_score = models.FloatField(default=0, editable=False)
+
     class Meta:
         verbose_name = "Course"
         verbose_name_plural = "Courses"
         ordering = ['-created_at']
+        # Built from the CourseViewSet queries, which only ever read active
+        # courses: the default listing, the category filter and the rating
+        # orderings. Text search goes through the FTS index instead.
         indexes = [
-            models.Index(fields=['course_title']),
-            models.Index(fields=['course_description']),
-            models.Index(fields=['is_published']),
-            models.Index(fields=['is_active']),
+            models.Index(fields=['course_title'], condition=Q(is_active=True), name='course_active_title_idx'),
+            models.Index(
+                fields=['course_category', 'course_title'], condition=Q(is_active=True),
+                name='course_active_category_idx'
+            ),
+            models.Index(fields=['rating_score'], condition=Q(is_active=True), name='course_active_score_idx'),
+            models.Index(fields=['rating_average'], condition=Q(is_active=True), name='course_active_average_idx'),
         ]
 
     def __str__(self):
@@ -110,13 +134,9 @@ class Course(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.course_slug:
-            base_slug = slugify(self.course_title)
-            slug = base_slug
-            counter = 1
-            while Course.objects.filter(course_slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.course_slug = slug
+            return save_with_unique_slug(
+                self, 'course_slug', self.course_title, super().save, *args, **kwargs
+            )
         super().save(*args, **kwargs)
 
 class CourseRating(models.Model):
@@ -235,6 +255,15 @@ class CourseComment(models.Model):
         on_delete=models.CASCADE, 
         related_name='replies'
     )
+    thread_root = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='thread_comments',
+        editable=False
+    )
+    depth = models.PositiveIntegerField(default=0, editable=False)
     content = models.TextField(max_length=1000)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -244,11 +273,32 @@ class CourseComment(models.Model):
         verbose_name = "Course Comment"
         verbose_name_plural = "Course Comments"
         ordering = ['-created_at']
+        # Listings only show top-level comments, newest first
+        indexes = [
+            models.Index(
+                fields=['course', '-created_at'], condition=Q(parent__isnull=True), name='comment_course_root_idx'
+            ),
+            # Without a course filter SQLite prefers an equality match on
+            # parent_id over a partial index, so the order rides along here.
+            models.Index(fields=['parent', '-created_at'], name='comment_parent_created_idx'),
+        ]
 
     def __str__(self):
         prefix = "Reply" if self.parent else "Comment"
         return f"{prefix} by {self.user.username} on {self.course.course_title}"
 
+    def save(self, *args, **kwargs):
+        # Store the top-level comment and nesting level so a whole thread
+        # can be loaded with a single query on thread_root.
+        if self.parent_id:
+            parent = self.parent
+            self.thread_root_id = parent.thread_root_id or parent.id
+            self.depth = parent.depth + 1
+        else:
+            self.thread_root = None
+            self.depth = 0
+        super().save(*args, **kwargs)
+
 class CourseLesson(models.Model):
     course = models.ForeignKey(
         Course, 
@@ -273,22 +323,22 @@ class CourseLesson(models.Model):
         verbose_name_plural = "Course Lessons"
         ordering = ['lesson_order']
         unique_together = ('course', 'lesson_slug')
+        indexes = [
+            models.Index(
+                fields=['course', 'lesson_order'], condition=Q(is_active=True), name='lesson_active_course_idx'
+            ),
+            models.Index(fields=['lesson_order'], condition=Q(is_active=True), name='lesson_active_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.course.course_title} - {self.lesson_title}"
 
     def save(self, *args, **kwargs):
         if not self.lesson_slug:
-            base_slug = slugify(self.lesson_title)
-            slug = base_slug
-            counter = 1
-            while CourseLesson.objects.filter(
-                course=self.course, 
-                lesson_slug=slug
-            ).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.lesson_slug = slug
+            return save_with_unique_slug(
+                self, 'lesson_slug', self.lesson_title, super().save, *args,
+                scope_fields=['course_id'], **kwargs
+            )
         super().save(*args, **kwargs)
 
 class TopicType(models.Model):
@@ -308,6 +358,9 @@ class TopicType(models.Model):
         verbose_name = "Topic Type"
         verbose_name_plural = "Topic Types"
         ordering = ['type_name']
+        indexes = [
+            models.Index(fields=['type_name'], condition=Q(is_active=True), name='topictype_active_name_idx'),
+        ]
 
     def __str__(self):
         return self.type_name
@@ -317,6 +370,27 @@ class TopicType(models.Model):
             self.topic_slug = slugify(self.type_name)
         super().save(*args, **kwargs)
 
+class RenderedTopicContent(models.Model):
+    """
+    Precomputed output for a topic body, keyed by the hash of the raw text
+    so topics with identical content share one row and unchanged content
+    is never rendered twice. Filled by content_management_system.render_queue.
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    rendered_html = models.TextField()
+    code_blocks = models.JSONField(default=list)
+    compressed_html = models.BinaryField()
+    word_count = models.PositiveIntegerField(default=0)
+    reading_time = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Rendered Topic Content"
+        verbose_name_plural = "Rendered Topic Contents"
+
+    def __str__(self):
+        return self.content_hash
+
 class LessonTopic(models.Model):
     lesson = models.ForeignKey(
         CourseLesson, 
@@ -331,6 +405,19 @@ class LessonTopic(models.Model):
     topic_title = models.CharField(max_length=200)
     topic_slug = models.SlugField(max_length=200, blank=True)
     topic_content = models.TextField()
+    # Hash of topic_content, doubling as the key of its rendered output.
+    # The row is created after the topic is saved, hence no constraint.
+    rendered_content = models.ForeignKey(
+        RenderedTopicContent,
+        to_field='content_hash',
+        db_column='content_hash',
+        db_constraint=False,
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.DO_NOTHING,
+        related_name='+'
+    )
     topic_order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -346,39 +433,24 @@ class LessonTopic(models.Model):
         verbose_name_plural = "Lesson Topics"
         ordering = ['topic_order']
         unique_together = ('lesson', 'topic_slug')
+        indexes = [
+            models.Index(
+                fields=['lesson', 'topic_order'], condition=Q(is_active=True), name='topic_active_lesson_idx'
+            ),
+            models.Index(fields=['topic_order'], condition=Q(is_active=True), name='topic_active_order_idx'),
+        ]
 
     def __str__(self):
         return self.topic_title
 
     def save(self, *args, **kwargs):
+        self.rendered_content_id = get_content_hash(self.topic_content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'topic_content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'rendered_content'}
         if not self.topic_slug:
-            base_slug = slugify(self.topic_title)
-            slug = base_slug
-            counter = 1
-            while LessonTopic.objects.filter(
-                lesson=self.lesson, 
-                topic_slug=slug
-            ).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.topic_slug = slug
+            return save_with_unique_slug(
+                self, 'topic_slug', self.topic_title, super().save, *args,
+                scope_fields=['lesson_id'], **kwargs
+            )
         super().save(*args, **kwargs)
-
-# Signal handlers
-@receiver(post_save, sender=CourseLesson)
-@receiver(post_delete, sender=CourseLesson)
-@receiver(post_save, sender=LessonTopic)
-@receiver(post_delete, sender=LessonTopic)
-@receiver(post_save, sender=AuthorDetails)
-@receiver(post_delete, sender=AuthorDetails)
-def update_course_modified_date(sender, instance, **kwargs):
-    """Update parent course's modified date when related objects change"""
-    course = None
-    if hasattr(instance, 'course'):
-        course = instance.course
-    elif hasattr(instance, 'lesson'):
-        course = instance.lesson.course
-    
-    if course:
-        course.updated_at = timezone.now()
-        course.save(update_fields=['updated_at'])
\ No newline at end of file
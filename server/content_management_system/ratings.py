@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Greatest
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from content_management_system.models import Course, CourseRating
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+STAT_FIELDS = [
+    'rating_count', 'rating_sum',
+    'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    'rating_average', 'rating_score',
+]
+
+
+def get_prior():
+    return (
+        getattr(settings, 'COURSE_RATING_PRIOR_MEAN', 3.0),
+        getattr(settings, 'COURSE_RATING_PRIOR_WEIGHT', 5),
+    )
+
+
+def bayesian_score(count, total):
+    # Unrated courses score 0 so they sort after every rated course.
+    if count == 0:
+        return 0.0
+    prior_mean, prior_weight = get_prior()
+    return (prior_mean * prior_weight + total) / (prior_weight + count)
+
+
+def build_stats(count, total, histogram):
+    """Course field values for the given rating count, sum and {rating: count} histogram."""
+    stats = {
+        'rating_count': count,
+        'rating_sum': total,
+        'rating_average': total / count if count else 0.0,
+        'rating_score': bayesian_score(count, total),
+    }
+    for value in RATING_VALUES:
+        stats[f'rating_{value}_count'] = histogram.get(value, 0)
+    return stats
+
+
+def apply_rating_change(course_id, rating, sign):
+    """
+    Add (sign=1) or remove (sign=-1) one rating from a course's statistics
+    in a single UPDATE. All values are computed by the database from the
+    current row, so concurrent ratings never overwrite each other.
+    Counters are clamped at 0: if they drifted below the ratings that
+    exist, removing one must not fail the positive field's check.
+    reconcile_course_ratings repairs the drift.
+    """
+    prior_mean, prior_weight = get_prior()
+    count = Greatest(F('rating_count') + sign, 0)
+    total = Greatest(F('rating_sum') + sign * rating, 0)
+    Course.objects.filter(pk=course_id).update(
+        # Rating statistics are part of the course payload, so bump its version.
+        updated_at=timezone.now(),
+        rating_count=count,
+        rating_sum=total,
+        **{f'rating_{rating}_count': Greatest(F(f'rating_{rating}_count') + sign, 0)},
+        rating_average=Case(
+            When(rating_count__lte=-sign, then=Value(0.0)),
+            default=Cast(total, FloatField()) / count,
+            output_field=FloatField(),
+        ),
+        rating_score=Case(
+            When(rating_count__lte=-sign, then=Value(0.0)),
+            default=(Cast(total, FloatField()) + prior_mean * prior_weight) / (count + prior_weight),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def compute_course_stats(course_ids=None):
+    """Recalculate statistics from CourseRating with one GROUP BY query."""
+    ratings = CourseRating.objects.all()
+    if course_ids is not None:
+        ratings = ratings.filter(course_id__in=course_ids)
+    histogram_counts = {
+        f'r{value}': Count('id', filter=Q(rating=value)) for value in RATING_VALUES
+    }
+    rows = ratings.values('course_id').annotate(
+        count=Count('id'), total=Sum('rating'), **histogram_counts
+    )
+    return {
+        row['course_id']: build_stats(
+            row['count'], row['total'],
+            {value: row[f'r{value}'] for value in RATING_VALUES}
+        )
+        for row in rows
+    }
+
+
+def reconcile_course_ratings(course_ids=None, batch_size=500, dry_run=False):
+    """
+    Compare stored statistics against a fresh aggregate and fix any course
+    that has drifted. Returns the number of courses that were out of date.
+    """
+    courses = Course.objects.only('id', *STAT_FIELDS).order_by('pk')
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+
+    empty = build_stats(0, 0, {})
+    drifted = 0
+    batch = []
+    last_pk = 0
+    while True:
+        chunk = list(courses.filter(pk__gt=last_pk)[:batch_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+        expected = compute_course_stats([course.pk for course in chunk])
+        for course in chunk:
+            stats = expected.get(course.pk, empty)
+            if any(not _same(getattr(course, field), value) for field, value in stats.items()):
+                for field, value in stats.items():
+                    setattr(course, field, value)
+                course.updated_at = timezone.now()
+                batch.append(course)
+        drifted += len(batch)
+        if batch and not dry_run:
+            Course.objects.bulk_update(batch, STAT_FIELDS + ['updated_at'])
+        batch = []
+    return drifted
+
+
+def _same(stored, expected):
+    if isinstance(expected, float):
+        return abs(stored - expected) < 1e-9
+    return stored == expected
+
+
+# Signal handlers keeping Course statistics in step with CourseRating
+@receiver(pre_save, sender=CourseRating)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if instance.pk and not raw:
+        instance._previous_rating = CourseRating.objects.filter(
+            pk=instance.pk
+        ).values_list('course_id', 'rating').first()
+
+
+@receiver(post_save, sender=CourseRating)
+def update_rating_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    current = (instance.course_id, int(instance.rating))
+    if previous == current:
+        return
+    if previous is not None:
+        apply_rating_change(previous[0], previous[1], -1)
+    apply_rating_change(current[0], current[1], 1)
+
+
+@receiver(post_delete, sender=CourseRating)
+def remove_rating_stats(sender, instance, **kwargs):
+    apply_rating_change(instance.course_id, instance.rating, -1)
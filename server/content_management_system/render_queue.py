@@ -0,0 +1,141 @@
+import logging
+import os
+import queue
+import threading
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from content_management_system.models import LessonTopic, RenderedTopicContent
+from content_management_system.rendering import get_content_hash, render_topic_content
+from content_management_system.response_cache import bump_generation_on_commit
+
+logger = logging.getLogger(__name__)
+
+
+def store_rendered_content(contents):
+    """
+    Render and store the given ``{content_hash: text}`` bodies, skipping
+    hashes that already have a row. Returns the number of rows created.
+    """
+    existing = set(RenderedTopicContent.objects.filter(
+        content_hash__in=list(contents)
+    ).values_list('content_hash', flat=True))
+    rows = [
+        RenderedTopicContent(content_hash=content_hash, **render_topic_content(text))
+        for content_hash, text in contents.items() if content_hash not in existing
+    ]
+    if rows:
+        # A concurrent worker may store the same hash, the unique key keeps one.
+        RenderedTopicContent.objects.bulk_create(rows, ignore_conflicts=True)
+        # Cached topic responses were built without the rendered output.
+        bump_generation_on_commit(RenderedTopicContent)
+    return len(rows)
+
+
+def get_topic_hash(topic):
+    """
+    Content hash of a topic. Topics inserted without save(), e.g. by a bulk
+    insert, may have none stored; render_missing_content fills it in.
+    """
+    return topic.rendered_content_id or get_content_hash(topic.topic_content)
+
+
+def get_or_render(topic):
+    """Rendered content of a topic, rendering it now if the worker has not yet."""
+    content_hash = get_topic_hash(topic)
+    try:
+        return RenderedTopicContent.objects.get(content_hash=content_hash)
+    except RenderedTopicContent.DoesNotExist:
+        store_rendered_content({content_hash: topic.topic_content})
+        return RenderedTopicContent.objects.get(content_hash=content_hash)
+
+
+def render_missing_content(batch_size=200):
+    """
+    Render every topic body without stored output, storing the content hash
+    of topics that have none. Returns the number rendered.
+    """
+    total = 0
+    last_pk = 0
+    stored = RenderedTopicContent.objects.filter(content_hash=OuterRef('rendered_content_id'))
+    missing = LessonTopic.objects.filter(~Exists(stored)).only(
+        'id', 'topic_content', 'rendered_content'
+    ).order_by('pk')
+    while True:
+        chunk = list(missing.filter(pk__gt=last_pk)[:batch_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+        unhashed = [topic for topic in chunk if topic.rendered_content_id is None]
+        for topic in unhashed:
+            topic.rendered_content_id = get_content_hash(topic.topic_content)
+        total += store_rendered_content({
+            topic.rendered_content_id: topic.topic_content for topic in chunk
+        })
+        LessonTopic.objects.bulk_update(unhashed, ['rendered_content'])
+    return total
+
+
+class RenderWorker:
+    """
+    Background thread rendering topic bodies after their save commits, so
+    requests never render or compress. Jobs still queued when the process
+    exits are lost; ``manage.py render_topic_content`` picks them up.
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()
+
+    def ensure_started(self):
+        # Threads don't survive a fork, so each worker process starts its own.
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.jobs = queue.Queue()
+                threading.Thread(target=self.run, name='topic-render-worker', daemon=True).start()
+
+    def submit(self, content_hash, text):
+        self.ensure_started()
+        self.jobs.put((content_hash, text))
+
+    def run(self):
+        jobs = self.jobs
+        while True:
+            batch = dict([jobs.get()])
+            # Drain whatever else is waiting into the same batch.
+            while len(batch) < 100:
+                try:
+                    content_hash, text = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                batch[content_hash] = text
+            # Any error only loses this batch; the thread has to keep
+            # serving the process.
+            try:
+                close_old_connections()
+                store_rendered_content(batch)
+            except Exception:
+                logger.exception("Could not store rendered topic content")
+
+
+render_worker = RenderWorker()
+
+
+def render_in_background():
+    return getattr(settings, 'TOPIC_CONTENT_RENDER_IN_BACKGROUND', True)
+
+
+# Signal handlers
+@receiver(post_save, sender=LessonTopic)
+def queue_topic_rendering(sender, instance, raw=False, **kwargs):
+    if raw or not instance.rendered_content_id:
+        return
+    content_hash, text = instance.rendered_content_id, instance.topic_content
+    if render_in_background():
+        transaction.on_commit(lambda: render_worker.submit(content_hash, text))
+    else:
+        transaction.on_commit(lambda: store_rendered_content({content_hash: text}))
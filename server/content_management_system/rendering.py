@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import html
+import math
+import re
+
+# Topic bodies are plain text with a small markdown subset: ``#`` headings,
+# ``-``/``*`` bullet lists, fenced code blocks, `inline code`, **bold**,
+# *emphasis* and [links](https://...). Everything else is escaped.
+
+WORDS_PER_MINUTE = 200
+
+FENCE_RE = re.compile(r'^\s*```\s*([\w+#.-]*)\s*$')
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+BULLET_RE = re.compile(r'^\s*[-*]\s+(.*)$')
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+EMPHASIS_RE = re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])')
+LINK_RE = re.compile(r'\[([^\]]+)\]\((https?://[^\s)]+)\)')
+
+
+def get_content_hash(text):
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def render_inline(text):
+    # Code spans are cut out first so their content isn't formatted, and
+    # marked with NUL-delimited indexes. NULs in the text itself are dropped
+    # so they can't forge a marker.
+    text = text.replace('\x00', '')
+    spans = []
+
+    def keep_code(match):
+        spans.append('<code>%s</code>' % html.escape(match.group(1)))
+        return '\x00%d\x00' % (len(spans) - 1)
+
+    text = html.escape(INLINE_CODE_RE.sub(keep_code, text), quote=False)
+    text = LINK_RE.sub(
+        lambda match: '<a href="%s" rel="nofollow noopener">%s</a>' % (
+            html.escape(html.unescape(match.group(2))), match.group(1)
+        ),
+        text
+    )
+    text = BOLD_RE.sub(r'<strong>\1</strong>', text)
+    text = EMPHASIS_RE.sub(r'<em>\1</em>', text)
+    return re.sub('\x00(\\d+)\x00', lambda match: spans[int(match.group(1))], text)
+
+
+def render_topic_content(text):
+    """
+    Render a topic body. Returns a dict with the HTML, the code blocks
+    (``[{'language': ..., 'code': ...}]``), a gzip copy of the HTML, the
+    prose word count and the reading time in minutes.
+    """
+    parts = []
+    code_blocks = []
+    paragraph = []
+    bullets = []
+    words = 0
+
+    def close_paragraph():
+        if paragraph:
+            parts.append('<p>%s</p>' % render_inline(' '.join(paragraph)))
+            paragraph.clear()
+
+    def close_bullets():
+        if bullets:
+            items = ''.join('<li>%s</li>' % render_inline(item) for item in bullets)
+            parts.append('<ul>%s</ul>' % items)
+            bullets.clear()
+
+    lines = (text or '').replace('\r\n', '\n').split('\n')
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+
+        fence = FENCE_RE.match(line)
+        if fence:
+            close_paragraph()
+            close_bullets()
+            code = []
+            while index < len(lines) and not FENCE_RE.match(lines[index]):
+                code.append(lines[index])
+                index += 1
+            index += 1  # closing fence
+            language = fence.group(1).lower() or 'text'
+            code_blocks.append({'language': language, 'code': '\n'.join(code)})
+            parts.append('<pre><code class="language-%s">%s</code></pre>' % (
+                html.escape(language), html.escape('\n'.join(code))
+            ))
+            continue
+
+        words += len(WORD_RE.findall(line))
+        heading = HEADING_RE.match(line)
+        bullet = BULLET_RE.match(line)
+        if not line.strip():
+            close_paragraph()
+            close_bullets()
+        elif heading:
+            close_paragraph()
+            close_bullets()
+            level = len(heading.group(1))
+            parts.append('<h%d>%s</h%d>' % (level, render_inline(heading.group(2)), level))
+        elif bullet:
+            close_paragraph()
+            bullets.append(bullet.group(1))
+        else:
+            close_bullets()
+            paragraph.append(line.strip())
+    close_paragraph()
+    close_bullets()
+
+    rendered_html = '\n'.join(parts)
+    return {
+        'rendered_html': rendered_html,
+        'code_blocks': code_blocks,
+        'compressed_html': gzip.compress(rendered_html.encode('utf-8'), compresslevel=9, mtime=0),
+        'word_count': words,
+        'reading_time': math.ceil(words / WORDS_PER_MINUTE) if words else 0,
+    }
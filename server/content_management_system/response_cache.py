@@ -0,0 +1,268 @@
+import functools
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from server.middleware import (
+    accepts_gzip, get_config as get_compression_config, gzip_compress, mark_compressed
+)
+from server.routers import is_pinned_to_primary
+from content_management_system.models import (
+    CourseCategory, CourseType, Course, CourseLesson, TopicType, LessonTopic, CourseRating
+)
+
+# Headers stored with a cached response and replayed on a hit
+CACHED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Vary', 'Allow']
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 5,
+}
+
+
+def get_config(name):
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_config('CACHE_ALIAS')]
+
+
+# Generation counters. Every cached response key includes the current
+# generation of each model it was built from; bumping a generation makes
+# all of those keys unreachable. The counters live in the cache backend
+# itself, so every worker sharing that backend sees the bump.
+def generation_key(model):
+    return f'cms-generation:{model._meta.label_lower}'
+
+
+def get_generations(models):
+    keys = [generation_key(model) for model in models]
+    found = get_cache().get_many(keys)
+    return [found.get(key, 0) for key in keys]
+
+
+def bump_generation(model):
+    cache = get_cache()
+    key = generation_key(model)
+    # Start at the current time so a counter lost on eviction can't come
+    # back with a value that matches keys written before it was lost.
+    if not cache.add(key, time.time_ns(), timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not get_config('ENABLED') or not isinstance(get_cache(), LocMemCache):
+        return []
+    return [Warning(
+        f"The response cache uses the per-process LocMemCache '{get_config('CACHE_ALIAS')}'.",
+        hint=(
+            "Generation bumps then only invalidate the responses cached by the process that "
+            "made the write. Use a backend shared by all workers, e.g. FileBasedCache or Redis."
+        ),
+        id='content_management_system.W001',
+    )]
+
+
+class CacheStats:
+    """Hit/miss counters for this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+cache_stats = CacheStats()
+
+# Striped locks for in-process single flight, so memory stays bounded
+# however many keys are seen.
+_local_locks = [threading.Lock() for _ in range(64)]
+
+
+def _get_local_lock(key):
+    return _local_locks[hash(key) % len(_local_locks)]
+
+
+class ResponseCacheMixin:
+    """
+    Read-through cache for anonymous, read-only viewsets.
+
+    GET responses are stored rendered, keyed by path, sorted query params,
+    the negotiated format and the generations of ``cache_models``. On a cold
+    key only one request per process (and, through ``cache.add``, one per
+    shared backend) renders the response; the others wait for its result.
+
+    Clients pinned to the primary after a write bypass the cache: an entry
+    filled from a lagging replica can hold rows older than their write
+    under the generation that write bumped.
+    """
+    cache_models = []
+
+    def get_response_cache_key(self, request):
+        query = sorted(
+            (key, value)
+            for key in request.GET
+            for value in request.GET.getlist(key)
+        )
+        generations = get_generations(self.cache_models)
+        fingerprint = '|'.join([
+            request.path,
+            repr(query),
+            request.headers.get('Accept', ''),
+            repr(generations),
+        ])
+        return 'cms-response:%s' % hashlib.md5(fingerprint.encode()).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or not get_config('ENABLED') or is_pinned_to_primary(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            cached = self.fill_response_cache(key, request, *args, **kwargs)
+            if isinstance(cached, HttpResponse):
+                # Not cacheable (error, redirect, ...), pass it through.
+                return cached
+            hit = False
+        else:
+            hit = True
+
+        cache_stats.record(hit)
+        self.on_cached_response(request, hit, *args, **kwargs)
+        return self.build_cached_response(request, cached, hit)
+
+    def fill_response_cache(self, key, request, *args, **kwargs):
+        cache = get_cache()
+        lock_timeout = get_config('LOCK_TIMEOUT')
+        lock_key = key + ':lock'
+        with _get_local_lock(key):
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+            if not cache.add(lock_key, 1, timeout=lock_timeout):
+                # Another process is rendering this key, wait for it.
+                deadline = time.monotonic() + lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    cached = cache.get(key)
+                    if cached is not None:
+                        return cached
+
+            try:
+                response = super().dispatch(request, *args, **kwargs)
+                if response.status_code != 200 or getattr(response, 'streaming', False):
+                    return response
+                if hasattr(response, 'render'):
+                    response.render()
+                cached = {
+                    'content': response.content,
+                    'headers': {
+                        header: response[header]
+                        for header in CACHED_HEADERS if response.has_header(header)
+                    },
+                }
+                # Compress once here so hits don't pay for it on every request.
+                if len(response.content) >= get_compression_config('MIN_SIZE'):
+                    compressed = gzip_compress(response.content)
+                    if len(compressed) < len(response.content):
+                        cached['gzip'] = compressed
+                cache.set(key, cached, get_config('TIMEOUT'))
+                return cached
+            finally:
+                cache.delete(lock_key)
+
+    def build_cached_response(self, request, cached, hit):
+        headers = cached['headers']
+        use_gzip = 'gzip' in cached and accepts_gzip(request)
+        response = HttpResponse(
+            cached['gzip'] if use_gzip else cached['content'],
+            content_type=headers.get('Content-Type')
+        )
+        for header, value in headers.items():
+            response[header] = value
+        if use_gzip:
+            mark_compressed(response)
+        elif 'gzip' in cached:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+
+        if hit and ('ETag' in headers or 'Last-Modified' in headers):
+            last_modified = headers.get('Last-Modified')
+            not_modified = get_conditional_response(
+                request,
+                etag=headers.get('ETag'),
+                last_modified=None if last_modified is None else parse_http_date_safe(last_modified),
+                response=response
+            )
+            if not_modified is not None:
+                return not_modified
+        return response
+
+    def on_cached_response(self, request, hit, *args, **kwargs):
+        """Hook for side effects that must run even when the view is skipped."""
+
+
+def bump_generation_on_commit(model, using=None):
+    # Bumped before the commit, a concurrent miss could cache the old rows
+    # under the new generation for the whole TIMEOUT.
+    transaction.on_commit(functools.partial(bump_generation, model), using=using)
+
+
+# Signal handlers bumping generations when cached content changes
+@receiver(post_save, sender=CourseCategory)
+@receiver(post_delete, sender=CourseCategory)
+@receiver(post_save, sender=CourseType)
+@receiver(post_delete, sender=CourseType)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=CourseLesson)
+@receiver(post_delete, sender=CourseLesson)
+@receiver(post_save, sender=TopicType)
+@receiver(post_delete, sender=TopicType)
+@receiver(post_save, sender=LessonTopic)
+@receiver(post_delete, sender=LessonTopic)
+def invalidate_cached_responses(sender, using, **kwargs):
+    bump_generation_on_commit(sender, using)
+
+
+@receiver(post_save, sender=CourseRating)
+@receiver(post_delete, sender=CourseRating)
+def invalidate_cached_courses(sender, using, **kwargs):
+    # Rating statistics are written to Course with update(), which sends
+    # no signal of its own.
+    bump_generation_on_commit(Course, using)
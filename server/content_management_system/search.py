@@ -0,0 +1,303 @@
+import html
+import re
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from content_management_system.models import Course, CourseLesson, LessonTopic
+
+# SQLite FTS5 index over course, lesson and topic text. Each row's rowid is
+# derived from the object id and its kind so updates and deletes are
+# single-row operations.
+SEARCH_TABLE = 'cms_search_index'
+
+KIND_CODES = {
+    'course': 1,
+    'lesson': 2,
+    'topic': 3,
+}
+
+CREATE_SEARCH_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    kind UNINDEXED,
+    object_id UNINDEXED,
+    course_id UNINDEXED,
+    lesson_id UNINDEXED,
+    slug UNINDEXED,
+    title,
+    body,
+    tokenize = 'porter unicode61'
+)
+"""
+
+# Title matches weigh more than body matches
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# highlight() and snippet() wrap matches in these private use characters.
+# The text is escaped before they become <mark> tags, so stored content
+# can't inject markup into results.
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+
+
+def mark_matches(text):
+    if text is None:
+        return None
+    return html.escape(text).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+def search_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def get_rowid(kind, object_id):
+    return object_id * len(KIND_CODES) + KIND_CODES[kind]
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query. Every word is quoted so user input
+    can't inject FTS syntax, and the last word is a prefix match.
+    """
+    tokens = TOKEN_RE.findall(text or '')
+    if not tokens:
+        return None
+    terms = ['"%s"' % token for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def get_document(instance):
+    if isinstance(instance, Course):
+        return {
+            'kind': 'course',
+            'course_id': instance.id,
+            'lesson_id': None,
+            'slug': instance.course_slug,
+            'title': instance.course_title,
+            'body': instance.course_description,
+            'is_active': instance.is_active,
+        }
+    if isinstance(instance, CourseLesson):
+        return {
+            'kind': 'lesson',
+            'course_id': instance.course_id,
+            'lesson_id': instance.id,
+            'slug': instance.lesson_slug,
+            'title': instance.lesson_title,
+            'body': instance.lesson_description,
+            'is_active': instance.is_active,
+        }
+    if isinstance(instance, LessonTopic):
+        lesson = instance.lesson
+        return {
+            'kind': 'topic',
+            'course_id': lesson.course_id,
+            'lesson_id': lesson.id,
+            'slug': instance.topic_slug,
+            'title': instance.topic_title,
+            'body': instance.topic_content,
+            'is_active': instance.is_active,
+        }
+    return None
+
+
+def index_document(instance):
+    document = get_document(instance)
+    if document is None:
+        return
+    rowid = get_rowid(document['kind'], instance.id)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [rowid])
+        if document['is_active']:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} "
+                "(rowid, kind, object_id, course_id, lesson_id, slug, title, body) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                [
+                    rowid, document['kind'], instance.id, document['course_id'],
+                    document['lesson_id'], document['slug'], document['title'], document['body'],
+                ]
+            )
+
+
+def remove_document(kind, object_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+            [get_rowid(kind, object_id)]
+        )
+
+
+def rebuild_index(batch_size=500):
+    """Empty and repopulate the whole index. Returns the number of documents."""
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_SEARCH_TABLE)
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    total = 0
+    querysets = [
+        Course.objects.filter(is_active=True),
+        CourseLesson.objects.filter(is_active=True),
+        LessonTopic.objects.filter(is_active=True).select_related('lesson'),
+    ]
+    for queryset in querysets:
+        rows = []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            rows.append(get_row(instance, get_document(instance)))
+            if len(rows) >= batch_size:
+                total += _insert_rows(rows)
+                rows = []
+        total += _insert_rows(rows)
+    return total
+
+
+def index_documents(instances):
+    """
+    Add newly created objects to the index with one multi-row insert, for
+    bulk_create() callers that bypass the post_save handler.
+    """
+    rows = []
+    for instance in instances:
+        document = get_document(instance)
+        if document is not None and document['is_active']:
+            rows.append(get_row(instance, document))
+    return _insert_rows(rows)
+
+
+def get_row(instance, document):
+    return [
+        get_rowid(document['kind'], instance.id), document['kind'], instance.id,
+        document['course_id'], document['lesson_id'], document['slug'],
+        document['title'], document['body'],
+    ]
+
+
+def _insert_rows(rows):
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} "
+                "(rowid, kind, object_id, course_id, lesson_id, slug, title, body) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                rows
+            )
+    return len(rows)
+
+
+def matching_ids(kind, text):
+    """
+    Subquery of object ids of the given kind matching ``text``, for use as
+    ``queryset.filter(id__in=matching_ids('course', text))``.
+    """
+    return RawSQL(
+        f"SELECT object_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND kind = %s",
+        [build_match_query(text), kind]
+    )
+
+
+class SearchResults:
+    """
+    Lazy ranked result list. ``count()`` and slicing each run one query, so
+    it can be handed to Django's paginator without loading every match.
+    """
+
+    def __init__(self, text, kind=None, course_id=None):
+        self.match = build_match_query(text)
+        self.where = [
+            f"{SEARCH_TABLE} MATCH %s",
+            "c.is_active = 1",
+            f"({SEARCH_TABLE}.lesson_id IS NULL OR l.is_active = 1)",
+        ]
+        self.params = [self.match]
+        if kind:
+            self.where.append(f"{SEARCH_TABLE}.kind = %s")
+            self.params.append(kind)
+        if course_id:
+            self.where.append(f"{SEARCH_TABLE}.course_id = %s")
+            self.params.append(course_id)
+        self._count = None
+
+    def get_from_clause(self):
+        # Deactivating a course or lesson hides everything below it
+        # without having to reindex its children.
+        course_table = Course._meta.db_table
+        lesson_table = CourseLesson._meta.db_table
+        return (
+            f"FROM {SEARCH_TABLE} "
+            f"JOIN {course_table} AS c ON c.id = {SEARCH_TABLE}.course_id "
+            f"LEFT JOIN {lesson_table} AS l ON l.id = {SEARCH_TABLE}.lesson_id "
+            f"WHERE {' AND '.join(self.where)}"
+        )
+
+    def count(self):
+        if self.match is None:
+            return 0
+        if self._count is None:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) {self.get_from_clause()}", self.params)
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if self.match is None:
+            return []
+        start = key.start or 0
+        limit = -1 if key.stop is None else max(key.stop - start, 0)
+        sql = (
+            f"SELECT {SEARCH_TABLE}.kind, {SEARCH_TABLE}.object_id, {SEARCH_TABLE}.slug, "
+            f"highlight({SEARCH_TABLE}, 5, '{MATCH_START}', '{MATCH_END}'), "
+            f"snippet({SEARCH_TABLE}, 6, '{MATCH_START}', '{MATCH_END}', '…', 16), "
+            f"bm25({SEARCH_TABLE}, 0, 0, 0, 0, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank, "
+            "c.id, c.course_title, c.course_slug, l.id, l.lesson_title, l.lesson_slug "
+            f"{self.get_from_clause()} "
+            "ORDER BY rank LIMIT %s OFFSET %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, self.params + [limit, start])
+            rows = cursor.fetchall()
+        return [
+            {
+                'type': kind,
+                'id': object_id,
+                'slug': slug,
+                'title': mark_matches(title),
+                'snippet': mark_matches(snippet),
+                'rank': rank,
+                'course': {'id': course_id, 'course_title': course_title, 'course_slug': course_slug},
+                'lesson': (
+                    {'id': lesson_id, 'lesson_title': lesson_title, 'lesson_slug': lesson_slug}
+                    if lesson_id else None
+                ),
+            }
+            for (kind, object_id, slug, title, snippet, rank,
+                 course_id, course_title, course_slug, lesson_id, lesson_title, lesson_slug) in rows
+        ]
+
+
+# Signal handlers keeping the index in step with the content tables
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=CourseLesson)
+@receiver(post_save, sender=LessonTopic)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw or not search_enabled():
+        return
+    index_document(instance)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=CourseLesson)
+@receiver(post_delete, sender=LessonTopic)
+def remove_from_search_index(sender, instance, **kwargs):
+    if not search_enabled():
+        return
+    kind = {Course: 'course', CourseLesson: 'lesson', LessonTopic: 'topic'}[sender]
+    remove_document(kind, instance.id)
@@ -1,15 +1,329 @@
+import json
+from functools import lru_cache
+from types import SimpleNamespace
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count
 from rest_framework import serializers
 from content_management_system.models import CourseComment
+from server.instrumentation import timed_method
 
-class CourseCommentSerializer(serializers.ModelSerializer):
+
+def parse_field_tree(value):
+    """
+    Parse a comma separated list of dotted paths into a nested dict, e.g.
+    ``"id,lesson.course"`` -> ``{'id': {}, 'lesson': {'course': {}}}``.
+    """
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+class ExpandableFieldsMixin:
+    """
+    Serializer mixin behind the ``?fields=`` and ``?expand=`` query params.
+
+    ``fields`` limits the output to the named fields. ``expand`` lists the
+    relations from ``expandable_fields`` to nest; every other relation is
+    returned as its id. Both accept dotted paths into nested serializers.
+    Without them every field is returned and every relation nested.
+    ``model_field_dependencies`` names the model columns read by method
+    fields, so the viewset can restrict its query with ``only()``.
+    """
+    expandable_fields = {}
+    model_field_dependencies = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requested_fields = fields
+        self.requested_expand = expand
+
+        for name, serializer_class in self.expandable_fields.items():
+            if name not in self.fields:
+                continue
+            subfields = (fields.get(name) or None) if fields is not None else None
+            if expand is None or name in expand:
+                if subfields is not None or expand is not None:
+                    self.fields[name] = serializer_class(
+                        read_only=True,
+                        fields=subfields,
+                        expand=None if expand is None else expand[name]
+                    )
+            else:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @timed_method('serializer')
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+    def get_query_shape(self, prefix=''):
+        """
+        Return the ``select_related`` paths and ``only()`` columns needed to
+        render this serializer's current fields.
+        """
+        related, columns = [], [prefix + self.Meta.model._meta.pk.name]
+        for name, field in self.fields.items():
+            if isinstance(field, ExpandableFieldsMixin):
+                path = prefix + field.source
+                related.append(path)
+                columns.append(path)
+                nested_related, nested_columns = field.get_query_shape(path + '__')
+                related += nested_related
+                columns += nested_columns
+            elif field.source == '*':
+                for dependency in self.model_field_dependencies.get(name, []):
+                    columns.append(prefix + dependency)
+                    if '__' in dependency:
+                        related.append(prefix + dependency.rsplit('__', 1)[0])
+            elif not isinstance(field, serializers.BaseSerializer):
+                parts = field.source.split('.')
+                for index in range(1, len(parts)):
+                    related.append(prefix + '__'.join(parts[:index]))
+                    columns.append(prefix + '__'.join(parts[:index]))
+                columns.append(prefix + '__'.join(parts))
+        return related, columns
+
+
+class RowPlanUnsupported(Exception):
+    """The serializer uses a field the values() fast path can't reproduce."""
+
+
+# Field classes whose to_representation() returns database values of the
+# matching column type unchanged, so the call can be skipped.
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField, serializers.CharField, serializers.SlugField, serializers.BooleanField,
+)
+
+
+class RowSerializer:
+    """
+    Renders ``values()`` rows in the shape of an ExpandableFieldsMixin
+    serializer without building model instances.
+
+    The serializer's fields are compiled once into a list of steps per
+    nesting level; ``columns`` names the ``values()`` columns they read,
+    joined fields included. Method fields are called with a lightweight
+    object holding the columns listed in ``model_field_dependencies``, so
+    they must only read those and not the serializer context.
+    """
+
+    def __init__(self, serializer):
+        self.columns = []
+        self.render_row = self.compile(serializer, '')
+
+    def add_column(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+        return column
+
+    def get_model_field(self, model, path):
+        """Resolve a ``__`` separated path to (model field, model it belongs to)."""
+        field = None
+        for part in path.split('__'):
+            if field is not None:
+                if not field.is_relation:
+                    raise RowPlanUnsupported(path)
+                model = field.related_model
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                raise RowPlanUnsupported(path)
+            if field.many_to_many or field.one_to_many:
+                raise RowPlanUnsupported(path)
+        return field
+
+    def compile(self, serializer, prefix):
+        model = serializer.Meta.model
+        steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, ExpandableFieldsMixin):
+                model_field = self.get_model_field(model, field.source)
+                render = self.compile(field, prefix + field.source + '__')
+                exists = None
+                if model_field.null:
+                    exists = self.add_column(
+                        prefix + field.source + '__' + model_field.related_model._meta.pk.name
+                    )
+                steps.append((name, 'nested', (exists, render)))
+            elif isinstance(field, serializers.SerializerMethodField):
+                method = getattr(serializer, field.method_name)
+                build = self.compile_object(
+                    model, prefix, serializer.model_field_dependencies.get(name, [])
+                )
+                steps.append((name, 'method', (method, build)))
+            elif isinstance(field, serializers.BaseSerializer) or field.source == '*':
+                raise RowPlanUnsupported(name)
+            else:
+                path = '__'.join(field.source.split('.'))
+                model_field = self.get_model_field(model, path)
+                if isinstance(field, serializers.FileField) or model_field.many_to_many:
+                    raise RowPlanUnsupported(name)
+                column = self.add_column(prefix + path)
+                if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+                    steps.append((name, 'value', column))
+                elif type(field) in PASSTHROUGH_FIELDS:
+                    steps.append((name, 'value', column))
+                else:
+                    steps.append((name, 'convert', (column, field.to_representation)))
+
+        def render_row(row):
+            data = {}
+            for name, kind, spec in steps:
+                if kind == 'value':
+                    data[name] = row[spec]
+                elif kind == 'convert':
+                    value = row[spec[0]]
+                    data[name] = None if value is None else spec[1](value)
+                elif kind == 'nested':
+                    exists, render = spec
+                    data[name] = None if exists is not None and row[exists] is None else render(row)
+                else:
+                    method, build = spec
+                    data[name] = method(build(row))
+            return data
+        return render_row
+
+    def compile_object(self, model, prefix, dependencies):
+        """Build a row -> object function exposing ``dependencies`` as attributes."""
+        tree = {}
+        for dependency in dependencies:
+            node = tree
+            for part in dependency.split('__'):
+                node = node.setdefault(part, {})
+
+        def compile_node(model, path, node):
+            attributes = []
+            for part, children in node.items():
+                column_path = path + part
+                field = self.get_model_field(model, part)
+                if field.is_relation and children:
+                    exists = self.add_column(
+                        prefix + column_path + '__' + field.related_model._meta.pk.name
+                    )
+                    attributes.append((part, exists, compile_node(field.related_model, column_path + '__', children)))
+                elif field.is_relation:
+                    # Without nested attributes a relation is read as its id.
+                    attributes.append((field.attname, None, self.add_column(prefix + column_path)))
+                else:
+                    attributes.append((part, None, self.add_column(prefix + column_path)))
+
+            def build(row):
+                values = {}
+                for part, exists, spec in attributes:
+                    if exists is None:
+                        values[part] = row[spec]
+                    else:
+                        values[part] = None if row[exists] is None else spec(row)
+                return SimpleNamespace(**values)
+            return build
+
+        return compile_node(model, '', tree)
+
+    @timed_method('serializer')
+    def render(self, rows):
+        render_row = self.render_row
+        return [render_row(row) for row in rows]
+
+
+@lru_cache(maxsize=256)
+def _get_row_serializer(serializer_class, fields, expand):
+    try:
+        return RowSerializer(serializer_class(
+            fields=None if fields is None else json.loads(fields),
+            expand=None if expand is None else json.loads(expand),
+        ))
+    except RowPlanUnsupported:
+        return None
+
+
+def get_row_serializer(serializer_class, fields=None, expand=None):
+    """
+    Cached RowSerializer for a serializer class and ``?fields`` /
+    ``?expand`` trees, or None when the serializer isn't supported.
+    """
+    def freeze(tree):
+        return None if tree is None else json.dumps(tree, sort_keys=True)
+    return _get_row_serializer(serializer_class, freeze(fields), freeze(expand))
+
+
+def get_comment_max_depth():
+    return getattr(settings, 'COMMENT_THREAD_MAX_DEPTH', 10)
+
+
+def load_comment_threads(roots, max_depth=None):
+    """
+    Load every reply below the given top-level comments and group them by
+    parent, using one query for the replies and one for the reply counts of
+    comments sitting on the depth limit.
+    """
+    if max_depth is None:
+        max_depth = get_comment_max_depth()
+
+    root_ids = [root.id for root in roots]
+    reply_map = {}
+    reply_counts = {}
+    if not root_ids:
+        return {'reply_map': reply_map, 'reply_counts': reply_counts}
+
+    replies = CourseComment.objects.filter(
+        thread_root__in=root_ids,
+        depth__lte=max_depth
+    ).select_related('user')
+    for reply in replies:
+        reply_map.setdefault(reply.parent_id, []).append(reply)
+
+    for parent_id, children in reply_map.items():
+        reply_counts[parent_id] = len(children)
+
+    # Comments on the depth limit keep their reply count even though the
+    # replies themselves are not returned.
+    if max_depth == 0:
+        boundary = CourseComment.objects.filter(parent__in=root_ids)
+    else:
+        boundary = CourseComment.objects.filter(thread_root__in=root_ids, depth=max_depth + 1)
+    for row in boundary.values('parent').annotate(total=Count('id')):
+        reply_counts[row['parent']] = row['total']
+
+    return {'reply_map': reply_map, 'reply_counts': reply_counts}
+
+
+class CourseCommentSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     avatar = serializers.SerializerMethodField()
     replies = serializers.SerializerMethodField()
+    reply_count = serializers.SerializerMethodField()
 
     class Meta:
         model = CourseComment
-        fields = ['id', 'course', 'username', 'avatar', 'content', 'created_at', 'parent', 'replies']
-        read_only_fields = ['id', 'username', 'avatar', 'created_at', 'replies']
+        fields = ['id', 'course', 'username', 'avatar', 'content', 'created_at', 'parent', 'reply_count', 'replies']
+        read_only_fields = ['id', 'username', 'avatar', 'created_at', 'reply_count', 'replies']
+
+    model_field_dependencies = {
+        'avatar': ['user__avatar'],
+        'reply_count': ['thread_root'],
+        'replies': ['thread_root'],
+    }
+
+    def get_thread_context(self, obj):
+        if 'reply_map' not in self.context:
+            # Single comment responses (create/update) load their own thread.
+            root = obj if obj.thread_root_id is None else obj.thread_root
+            self.context.update(load_comment_threads([root]))
+        return self.context
 
     def get_avatar(self, obj):
         request = self.context.get('request')
@@ -17,7 +331,13 @@ class CourseCommentSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.user.avatar.url)
         return None
 
+    def get_reply_count(self, obj):
+        return self.get_thread_context(obj)['reply_counts'].get(obj.id, 0)
+
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CourseCommentSerializer(obj.replies.all(), many=True, context=self.context).data
-        return []
\ No newline at end of file
+        children = self.get_thread_context(obj)['reply_map'].get(obj.id)
+        if children:
+            return CourseCommentSerializer(
+                children, many=True, context=self.context, fields=self.requested_fields
+            ).data
+        return []
@@ -0,0 +1,157 @@
+import re
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+# How often save_with_unique_slug re-allocates after losing an insert race
+MAX_SLUG_RETRIES = 5
+
+SUFFIX_RE = re.compile(r'^(.+)-(\d+)$')
+
+
+def get_slug_base(model, slug_field, value, suffix_room=8):
+    """Slugify ``value`` leaving room for a ``-<n>`` suffix within max_length."""
+    max_length = model._meta.get_field(slug_field).max_length
+    base = slugify(value)[:max_length - suffix_room].strip('-')
+    return base or 'item'
+
+
+def get_used_suffixes(queryset, slug_field, base):
+    """
+    Return the suffixes already taken for ``base`` with one range query
+    (``base`` itself counts as suffix 0). The range form
+    ``base- <= slug < base.`` can use the slug index, unlike LIKE.
+    """
+    taken = queryset.filter(
+        Q(**{slug_field: base})
+        | Q(**{f'{slug_field}__gte': f'{base}-', f'{slug_field}__lt': f'{base}.'})
+    ).values_list(slug_field, flat=True)
+
+    pattern = re.compile(r'^%s-(\d+)$' % re.escape(base))
+    used = set()
+    for slug in taken:
+        if slug == base:
+            used.add(0)
+            continue
+        match = pattern.match(slug)
+        if match:
+            used.add(int(match.group(1)))
+    return used
+
+
+def get_slug_suffixes(slug):
+    """The (base, suffix) pairs ``slug`` occupies: itself, and its prefix if it ends in -<n>."""
+    pairs = [(slug, 0)]
+    match = SUFFIX_RE.match(slug)
+    if match:
+        pairs.append((match.group(1), int(match.group(2))))
+    return pairs
+
+
+def next_free_slug(base, used):
+    if 0 not in used:
+        return base, 0
+    counter = 1
+    while counter in used:
+        counter += 1
+    return f'{base}-{counter}', counter
+
+
+def allocate_slug(model, slug_field, value, scope=None):
+    """
+    Find a free slug for ``value``: ``base``, then ``base-1``, ``base-2``...
+    ``scope`` is a dict of field filters the slug only has to be unique in
+    (e.g. ``{'course_id': course.id}`` for lessons).
+    """
+    base = get_slug_base(model, slug_field, value)
+    queryset = model._default_manager.filter(**(scope or {}))
+    slug, _ = next_free_slug(base, get_used_suffixes(queryset, slug_field, base))
+    return slug
+
+
+def save_with_unique_slug(instance, slug_field, value, save, *args, scope_fields=(), **kwargs):
+    """
+    Allocate a slug for ``instance`` and call ``save``. If a concurrent
+    insert takes the same slug first, the unique constraint rejects ours and
+    a fresh slug is allocated, up to MAX_SLUG_RETRIES times.
+    """
+    model = type(instance)
+    scope = {field: getattr(instance, field) for field in scope_fields}
+    for attempt in range(MAX_SLUG_RETRIES + 1):
+        setattr(instance, slug_field, allocate_slug(model, slug_field, value, scope))
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            slug_taken = model._default_manager.filter(
+                **scope, **{slug_field: getattr(instance, slug_field)}
+            ).exists()
+            if not slug_taken or attempt == MAX_SLUG_RETRIES:
+                raise
+
+
+class SlugAllocator:
+    """
+    Slug allocation for bulk inserts. The taken suffixes of each
+    (scope, base) pair are loaded once and then handed out in memory, so
+    allocating n similar slugs costs one query instead of O(n).
+
+        allocator = SlugAllocator(CourseLesson, 'lesson_slug', scope_fields=['course_id'])
+        lesson.lesson_slug = allocator.allocate(lesson.lesson_title, course_id=course.id)
+    """
+
+    def __init__(self, model, slug_field, scope_fields=()):
+        self.model = model
+        self.slug_field = slug_field
+        self.scope_fields = tuple(scope_fields)
+        self.used = {}
+        self.taken = {}
+        self.new_scopes = set()
+
+    def allocate(self, value, preferred=None, **scope):
+        """
+        Return a free slug for ``value``. A ``preferred`` slug (e.g. one
+        carried over from an export) is used as is when still free.
+        """
+        if preferred:
+            preferred = get_slug_base(self.model, self.slug_field, preferred, suffix_room=0)
+            if 0 not in self.get_used(preferred, scope):
+                self.reserve(preferred, **scope)
+                return preferred
+        base = get_slug_base(self.model, self.slug_field, value)
+        slug, _ = next_free_slug(base, self.get_used(base, scope))
+        self.reserve(slug, **scope)
+        return slug
+
+    def reserve(self, slug, **scope):
+        """Mark a slug as taken."""
+        scope_key = self.get_scope_key(scope)
+        self.taken.setdefault(scope_key, set()).add(slug)
+        for base, suffix in get_slug_suffixes(slug):
+            used = self.used.get((scope_key, base))
+            if used is not None:
+                used.add(suffix)
+
+    def mark_new(self, **scope):
+        """Declare a scope empty (e.g. a parent created by this import), skipping its lookups."""
+        self.new_scopes.add(self.get_scope_key(scope))
+
+    def get_scope_key(self, scope):
+        return tuple(scope.get(field) for field in self.scope_fields)
+
+    def get_used(self, base, scope):
+        scope_key = self.get_scope_key(scope)
+        key = (scope_key, base)
+        if key not in self.used:
+            if scope_key in self.new_scopes:
+                used = set()
+            else:
+                queryset = self.model._default_manager.filter(**scope)
+                used = get_used_suffixes(queryset, self.slug_field, base)
+            # Slugs handed out before this base was first looked up
+            for slug in self.taken.get(scope_key, ()):
+                for slug_base, suffix in get_slug_suffixes(slug):
+                    if slug_base == base:
+                        used.add(suffix)
+            self.used[key] = used
+        return self.used[key]
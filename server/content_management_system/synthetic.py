@@ -0,0 +1,341 @@
+import multiprocessing
+import random
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.text import slugify
+from content_management_system.models import (
+    AuthorDetails, CourseCategory, CourseType, Course, CourseComment, CourseLesson, CourseRating,
+    LessonTopic, RenderedTopicContent, TopicType
+)
+from content_management_system.ratings import build_stats
+from content_management_system.render_queue import render_missing_content
+from content_management_system.rendering import get_content_hash
+from content_management_system.response_cache import bump_generation
+from content_management_system.search import rebuild_index, search_enabled
+
+User = get_user_model()
+
+# Synthetic catalog generation for load tests and benchmarks. Every row is
+# built in memory with its slug, content hash and thread fields already
+# set and inserted with bulk_create, skipping the per-row save() and
+# signal work. Courses are generated in shards by worker processes; ids
+# are assigned up front so shards never need to read each other's rows.
+
+DEFAULTS = {
+    'users': 1000,
+    'courses': 1000,
+    'categories': 20,
+    'lessons_per_course': 5,
+    'topics_per_lesson': 4,
+    'authors_per_course': 2,
+    'ratings_per_course': 10,
+    'comments': 20000,
+    # Exponent of the Zipf distribution of comments over courses
+    'zipf': 1.1,
+    # Share of comments that start a new thread rather than reply
+    'root_ratio': 0.3,
+    'max_depth': 12,
+    'inactive_ratio': 0.02,
+    'password': 'password',
+    'seed': 0,
+    'workers': None,
+    'batch_size': 2000,
+    'shard_size': 200,
+    'build_search_index': True,
+}
+
+WORDS = (
+    'python django sql react rust data web async testing design systems network security cloud '
+    'api linux git docker algorithms graphs statistics machine learning compilers caching '
+    'databases queues streams types functions objects patterns performance profiling'
+).split()
+LEVELS = ['Introduction to', 'Practical', 'Advanced', 'Hands-on', 'Modern', 'Fundamentals of']
+COURSE_TYPES = ['Video', 'Text', 'Interactive', 'Project']
+TOPIC_TYPES = ['Markdown', 'Video', 'Quiz', 'Exercise', 'Reading']
+DESIGNATIONS = ['Instructor', 'Teaching Assistant', 'Reviewer', 'Guest Lecturer']
+SENTENCES = [
+    'This part walks through the core ideas with small examples.',
+    'We build on the previous section and add error handling.',
+    'Pay attention to the edge cases, they come back in the exercises.',
+    'The snippet below shows the complete version.',
+    'Try changing the inputs and compare the output.',
+    'Most bugs here come from mutable shared state.',
+]
+
+# Topic bodies are drawn from a fixed pool, so identical bodies share one
+# rendered content row like they do in production.
+TOPIC_BODY_POOL = 64
+
+
+def build_topic_bodies(seed):
+    rng = random.Random(seed)
+    bodies = []
+    for index in range(TOPIC_BODY_POOL):
+        word = rng.choice(WORDS)
+        paragraphs = [' '.join(rng.choices(SENTENCES, k=rng.randint(2, 6))) for _ in range(rng.randint(1, 4))]
+        bodies.append(
+            f'# {word.title()} {index}\n\n' + '\n\n'.join(paragraphs) +
+            f'\n\n- point about {word}\n- another point\n\n```python\nprint("{word}")\n```'
+        )
+    return bodies
+
+
+def get_zipf_counts(total, size, exponent):
+    """Split ``total`` over ``size`` ranks, rank 0 the largest, following Zipf's law."""
+    if size <= 0:
+        return []
+    weights = [1 / (rank ** exponent) for rank in range(1, size + 1)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for rank in range(total - sum(counts)):
+        counts[rank % size] += 1
+    return counts
+
+
+def get_next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def create_lookups(options, owner):
+    """Categories, course types and topic types, reusing existing ones by slug."""
+    categories = [
+        CourseCategory(category_name=f'{word.title()} Category', category_slug=f'{word}-category')
+        for word in WORDS[:options['categories']]
+    ]
+    CourseCategory.objects.bulk_create(categories, ignore_conflicts=True)
+    CourseType.objects.bulk_create([
+        CourseType(course_name=name, course_slug=slugify(name)) for name in COURSE_TYPES
+    ], ignore_conflicts=True)
+    TopicType.objects.bulk_create([
+        TopicType(type_name=name, topic_slug=slugify(name), created_by=owner) for name in TOPIC_TYPES
+    ], ignore_conflicts=True)
+    return {
+        'categories': list(CourseCategory.objects.filter(
+            Q(category_slug__in=[category.category_slug for category in categories]) |
+            Q(category_name__in=[category.category_name for category in categories])
+        ).order_by('id').values_list('id', flat=True)),
+        'course_types': list(CourseType.objects.filter(
+            Q(course_slug__in=[slugify(name) for name in COURSE_TYPES]) | Q(course_name__in=COURSE_TYPES)
+        ).order_by('id').values_list('id', flat=True)),
+        'topic_types': list(TopicType.objects.filter(
+            Q(topic_slug__in=[slugify(name) for name in TOPIC_TYPES]) | Q(type_name__in=TOPIC_TYPES)
+        ).order_by('id').values_list('id', flat=True)),
+    }
+
+
+def create_users(options):
+    """Users sharing one precomputed password hash. Returns their ids."""
+    password = make_password(options['password'])
+    first_id = get_next_id(User)
+    users = [
+        User(
+            id=first_id + index, username=f'user_{first_id + index}',
+            email=f'user{first_id + index}@example.com', password=password,
+            first_name=random.Random(index).choice(WORDS).title(), last_name=f'User {first_id + index}',
+            is_verified=True,
+        )
+        for index in range(options['users'])
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=options['batch_size'])
+    return [user.id for user in users]
+
+
+def generate_catalog(**options):
+    """
+    Create a synthetic catalog; see DEFAULTS for the options. Returns the
+    number of rows created per model.
+    """
+    options = {**DEFAULTS, **options}
+    if options['users'] < 1:
+        raise ValueError("At least one user is needed to own the courses.")
+
+    user_ids = create_users(options)
+    lookups = create_lookups(options, User.objects.get(pk=user_ids[0]))
+    plan = {
+        'options': options,
+        'user_ids': user_ids,
+        'lookups': lookups,
+        'course_offset': get_next_id(Course),
+        'lesson_offset': get_next_id(CourseLesson),
+        'comment_offset': get_next_id(CourseComment),
+        'comment_counts': get_zipf_counts(options['comments'], options['courses'], options['zipf']),
+    }
+    # First comment id of each course
+    comment_starts = []
+    position = plan['comment_offset']
+    for count in plan['comment_counts']:
+        comment_starts.append(position)
+        position += count
+    plan['comment_starts'] = comment_starts
+
+    shards = [
+        (start, min(start + options['shard_size'], options['courses']))
+        for start in range(0, options['courses'], options['shard_size'])
+    ]
+    totals = {'users': len(user_ids)}
+    for counts in run_shards(plan, shards, get_worker_count(options['workers'])):
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+
+    render_missing_content()
+    if options['build_search_index'] and search_enabled():
+        rebuild_index()
+    for model in (Course, CourseLesson, LessonTopic, CourseComment, CourseRating, RenderedTopicContent):
+        bump_generation(model)
+    return totals
+
+
+def get_worker_count(workers):
+    # Forked workers would each get a different in-memory database.
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        return 1
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return 1
+    return max(1, workers or multiprocessing.cpu_count())
+
+
+def run_shards(plan, shards, workers):
+    if workers == 1:
+        for shard in shards:
+            yield generate_shard(plan, shard)
+        return
+    # Children must open their own connections instead of sharing ours.
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(workers, initializer=init_worker) as pool:
+        yield from pool.imap_unordered(generate_shard_task, [(plan, shard) for shard in shards])
+
+
+def init_worker():
+    connections.close_all()
+    if connection.vendor == 'sqlite':
+        # Workers take turns holding the write lock; wait for it as long
+        # as a large batch may take.
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout = 120000')
+
+
+def generate_shard_task(args):
+    return generate_shard(*args)
+
+
+def generate_shard(plan, shard):
+    """Create the courses ``shard`` = (first, last) indexes, with everything below them."""
+    options = plan['options']
+    lookups = plan['lookups']
+    user_ids = plan['user_ids']
+    bodies = build_topic_bodies(options['seed'])
+    body_hashes = [get_content_hash(body) for body in bodies]
+    inactive_every = round(1 / options['inactive_ratio']) if options['inactive_ratio'] else 0
+    lessons_per_course = options['lessons_per_course']
+    co_authors = max(0, options['authors_per_course'] - 1)
+    now = timezone.now()
+
+    rows = {
+        'courses': [], 'lessons': [], 'topics': [], 'authors': [], 'ratings': [], 'comments': [],
+    }
+    for index in range(*shard):
+        rng = random.Random(options['seed'] * 1000003 + index)
+        course_id = plan['course_offset'] + index
+        owner_id = rng.choice(user_ids)
+        title = f'{rng.choice(LEVELS)} {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}'
+
+        ratings = [
+            CourseRating(course_id=course_id, user_id=user_id, rating=min(5, max(1, round(rng.gauss(3.8, 1.0)))))
+            for user_id in rng.sample(user_ids, min(len(user_ids), rng.randint(0, 2 * options['ratings_per_course'])))
+        ]
+        histogram = {}
+        for rating in ratings:
+            histogram[rating.rating] = histogram.get(rating.rating, 0) + 1
+        rows['ratings'] += ratings
+
+        rows['courses'].append(Course(
+            id=course_id,
+            course_category_id=rng.choice(lookups['categories']),
+            course_type_id=rng.choice(lookups['course_types']),
+            course_title=title,
+            course_slug=f'{slugify(title)}-{course_id}',
+            course_description=' '.join(rng.choices(SENTENCES, k=rng.randint(2, 8))),
+            course_views=int(rng.paretovariate(1.2) * 10),
+            is_free_course=rng.random() < 0.7,
+            course_price=0 if rng.random() < 0.7 else rng.choice([9, 19, 29, 49, 99]),
+            is_published=rng.random() < 0.95,
+            created_by_id=owner_id,
+            is_active=not inactive_every or index % inactive_every != inactive_every - 1,
+            **build_stats(len(ratings), sum(rating.rating for rating in ratings), histogram),
+        ))
+
+        for user_id in sorted({owner_id, *rng.sample(user_ids, min(len(user_ids), co_authors))}):
+            consent = rng.random() < 0.8
+            rows['authors'].append(AuthorDetails(
+                user_id=user_id, course_id=course_id, designation=rng.choice(DESIGNATIONS),
+                consent_given=consent, consent_date=now if consent else None,
+            ))
+
+        for order in range(lessons_per_course):
+            lesson_id = plan['lesson_offset'] + index * lessons_per_course + order
+            lesson_title = f'{rng.choice(WORDS).title()} {order + 1}'
+            rows['lessons'].append(CourseLesson(
+                id=lesson_id, course_id=course_id, lesson_title=lesson_title,
+                lesson_slug=f'{slugify(lesson_title)}-{order + 1}',
+                lesson_description=rng.choice(SENTENCES), lesson_order=order, created_by_id=owner_id,
+            ))
+            for topic_order in range(options['topics_per_lesson']):
+                body = rng.randrange(len(bodies))
+                topic_title = f'{rng.choice(WORDS).title()} {topic_order + 1}'
+                rows['topics'].append(LessonTopic(
+                    lesson_id=lesson_id, type_id=rng.choice(lookups['topic_types']), topic_title=topic_title,
+                    topic_slug=f'{slugify(topic_title)}-{topic_order + 1}', topic_content=bodies[body],
+                    rendered_content_id=body_hashes[body], topic_order=topic_order, created_by_id=owner_id,
+                ))
+
+        rows['comments'] += build_comments(
+            rng, options, course_id, plan['comment_starts'][index], plan['comment_counts'][index], user_ids
+        )
+
+    # Parents before children, so each batch only points at saved rows.
+    order = [
+        ('courses', Course), ('lessons', CourseLesson), ('topics', LessonTopic),
+        ('authors', AuthorDetails), ('ratings', CourseRating), ('comments', CourseComment),
+    ]
+    with transaction.atomic():
+        for name, model in order:
+            model.objects.bulk_create(rows[name], batch_size=options['batch_size'])
+    return {name: len(objects) for name, objects in rows.items()}
+
+
+def build_comments(rng, options, course_id, first_id, count, user_ids):
+    """
+    ``count`` comments of one course. Replies mostly continue the deepest
+    branch of a recent thread, which gives the long chains real
+    discussions have, up to ``max_depth``.
+    """
+    comments = []
+    threads = []
+    for comment_id in range(first_id, first_id + count):
+        comment = CourseComment(
+            id=comment_id, course_id=course_id, user_id=rng.choice(user_ids),
+            content=' '.join(rng.choices(SENTENCES, k=rng.randint(1, 3))),
+        )
+        if not threads or rng.random() < options['root_ratio']:
+            comment.depth = 0
+            threads.append([comment])
+        else:
+            # Recent threads get most of the replies.
+            thread = threads[-1 - min(int(rng.expovariate(0.5)), len(threads) - 1)]
+            if rng.random() < 0.7:
+                parent = thread[-1]
+            else:
+                parent = rng.choice(thread)
+            if parent.depth >= options['max_depth']:
+                parent = thread[0]
+            comment.parent_id = parent.id
+            comment.thread_root_id = thread[0].id
+            comment.depth = parent.depth + 1
+            thread.append(comment)
+        comments.append(comment)
+    return comments
@@ -1,3 +1,860 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import re
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from content_management_system.models import (
+    CourseCategory, CourseType, Course, CourseComment, CourseLesson, CourseRating, TopicType,
+    LessonTopic, RenderedTopicContent
+)
+from content_management_system.course_timestamps import (
+    batch_course_timestamps, course_timestamp_queue, update_course_modified_date
+)
+from content_management_system.ratings import reconcile_course_ratings
+from content_management_system.render_queue import RenderWorker, render_missing_content
+from content_management_system.rendering import render_inline
+from content_management_system.response_cache import check_shared_cache
+from content_management_system.serializers import get_row_serializer
+from content_management_system.slugs import SlugAllocator, allocate_slug
+from content_management_system.synthetic import generate_catalog, get_zipf_counts
+from content_management_system.transfer import CourseImporter, export_courses
+from content_management_system.view_tracking import ViewCountBuffer
+from content_management_system.views import (
+    CourseCategoryViewSet, CourseTypeViewSet, CourseViewSet, CourseLessonViewSet, TopicTypeViewSet,
+    LessonTopicViewSet, LessonTopicSerializer, CustomPagination
+)
+from server.middleware import ReplicaStickinessMiddleware, should_compress
+from server.routers import STICKY_COOKIE, ReplicaRouter, pin_to_primary, replica_reads
+from user_management_system.models import CustomUser
 
-# Create your tests here.
+
+def create_catalog():
+    """Two categories and types, four courses with two lessons of two topics each."""
+    user = CustomUser.objects.create_user(username='author', email='author@example.com', password='x')
+    categories = [
+        CourseCategory.objects.create(category_name='Programming'),
+        CourseCategory.objects.create(category_name='Data', category_description='Numbers'),
+    ]
+    course_types = [
+        CourseType.objects.create(course_name='Video'),
+        CourseType.objects.create(course_name='Text'),
+    ]
+    topic_type = TopicType.objects.create(type_name='Markdown', created_by=user)
+    for index in range(4):
+        course = Course.objects.create(
+            course_category=categories[index % 2],
+            course_type=course_types[index % 2],
+            course_title=f'Course {index}',
+            course_description='Learn things',
+            is_free_course=index % 2 == 0,
+            course_price=Decimal('19.90') * index,
+            is_published=True,
+            created_by=user
+        )
+        for lesson_index in range(2):
+            lesson = CourseLesson.objects.create(
+                course=course,
+                lesson_title=f'Lesson {lesson_index}',
+                lesson_description='About',
+                lesson_order=lesson_index,
+                created_by=user
+            )
+            for topic_index in range(2):
+                LessonTopic.objects.create(
+                    lesson=lesson,
+                    type=topic_type,
+                    topic_title=f'Topic {topic_index}',
+                    topic_content=f'Some **text** {index}\n\n```python\nprint({topic_index})\n```',
+                    topic_order=topic_index,
+                    created_by=user
+                )
+    # Rendering is queued on commit, which test transactions never reach.
+    render_missing_content()
+    return user
+
+
+@override_settings(
+    RESPONSE_CACHE={'ENABLED': False},
+    TOPIC_CONTENT_RENDER_IN_BACKGROUND=False,
+)
+class ValuesFastPathTests(TestCase):
+    """The values() list path must render exactly what the serializers render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog()
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def assertSameOutput(self, url):
+        with self.settings(CMS_VALUES_FAST_PATH=False):
+            expected = self.client.get(url)
+        actual = self.client.get(url)
+        self.assertEqual(expected.status_code, 200, url)
+        self.assertEqual(actual.status_code, 200, url)
+        self.assertEqual(actual.content, expected.content, url)
+        return actual
+
+    def test_list_endpoints(self):
+        response = self.assertSameOutput('/api/cms/lesson-topics/')
+        self.assertIn('<strong>text</strong>', response.json()['results'][0]['rendered_html'])
+        for endpoint in ['course-categories', 'course-types', 'courses', 'course-lessons', 'topic-types', 'lesson-topics']:
+            self.assertSameOutput(f'/api/cms/{endpoint}/')
+            self.assertSameOutput(f'/api/cms/{endpoint}/?page_size=100&ordering=-id')
+
+    def test_fields_and_expand(self):
+        for query in [
+            'fields=id,topic_title,word_count',
+            'expand=type',
+            'expand=lesson.course',
+            'fields=id,lesson.lesson_title,lesson.course.course_title,code_blocks&expand=lesson.course',
+            'fields=lesson,type',
+        ]:
+            self.assertSameOutput(f'/api/cms/lesson-topics/?{query}')
+        self.assertSameOutput('/api/cms/courses/?fields=id,course_price,rating_histogram,course_category')
+        self.assertSameOutput('/api/cms/course-lessons/?expand=course.course_type&fields=id,course')
+
+    def test_filters(self):
+        course = Course.objects.order_by('id').first()
+        self.assertSameOutput(f'/api/cms/lesson-topics/?lesson__course={course.id}')
+        self.assertSameOutput(f'/api/cms/course-lessons/?course__course_slug={course.course_slug}')
+        self.assertSameOutput('/api/cms/courses/?search=course')
+
+    def test_cursor_pagination(self):
+        url = '/api/cms/lesson-topics/?pagination=cursor&page_size=3&ordering=topic_title'
+        pages = 0
+        while url:
+            response = self.assertSameOutput(url)
+            url = response.json()['next_page_link']
+            pages += 1
+        self.assertEqual(pages, 6)
+
+    def test_unrendered_topic_content(self):
+        # Topics saved outside a commit have no rendered content yet.
+        LessonTopic.objects.update(rendered_content=None)
+        LessonTopic.objects.filter(pk=LessonTopic.objects.order_by('id').first().pk).update(
+            topic_content='changed', rendered_content='0' * 64
+        )
+        response = self.assertSameOutput('/api/cms/lesson-topics/?page_size=100')
+        self.assertIsNone(response.json()['results'][0]['rendered_html'])
+
+    def test_row_serializers_compile(self):
+        for viewset in [
+            CourseCategoryViewSet, CourseTypeViewSet, CourseViewSet,
+            CourseLessonViewSet, TopicTypeViewSet, LessonTopicViewSet,
+        ]:
+            self.assertIsNotNone(get_row_serializer(viewset.serializer_class), viewset.__name__)
+        row_serializer = get_row_serializer(LessonTopicSerializer, {'id': {}, 'lesson': {}}, {})
+        self.assertEqual(row_serializer.columns, ['id', 'lesson'])
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False}, COMMENT_THREAD_MAX_DEPTH=3)
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_catalog()
+        cls.course = Course.objects.order_by('id').first()
+        cls.roots = [
+            CourseComment.objects.create(course=cls.course, user=cls.user, content=f'Comment {index}')
+            for index in range(3)
+        ]
+
+    def add_chain(self, parent, length):
+        """``length`` replies, each replying to the one before."""
+        for index in range(length):
+            parent = CourseComment.objects.create(
+                course=self.course, user=self.user, content=f'Reply {index}', parent=parent
+            )
+        return parent
+
+    def test_thread_fields(self):
+        last = self.add_chain(self.roots[0], 3)
+        self.assertEqual(last.depth, 3)
+        self.assertEqual(last.thread_root_id, self.roots[0].id)
+        self.assertIsNone(self.roots[0].thread_root_id)
+
+    def test_query_count_does_not_grow_with_replies(self):
+        url = f'/api/cms/comments/?course={self.course.id}'
+        self.add_chain(self.roots[0], 1)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for root in self.roots:
+            self.add_chain(root, 3)
+            self.add_chain(root, 2)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_nested_replies_and_depth_limit(self):
+        root = self.roots[0]
+        self.add_chain(root, 5)
+        response = self.client.get(f'/api/cms/comments/{root.id}/')
+        node = response.data
+        for depth in range(3):
+            self.assertEqual(node['reply_count'], 1)
+            node = node['replies'][0]
+        # The comment on the limit keeps its count, without its replies
+        self.assertEqual(node['reply_count'], 1)
+        self.assertEqual(node['replies'], [])
+
+        response = self.client.get(f'/api/cms/comments/{root.id}/?max_depth=0')
+        self.assertEqual(response.data['reply_count'], 1)
+        self.assertEqual(response.data['replies'], [])
+
+
+class SlugTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_catalog()
+        cls.course = Course.objects.get(course_slug='course-0')
+
+    def create_course(self, title, **kwargs):
+        return Course.objects.create(
+            course_category=self.course.course_category,
+            course_type=self.course.course_type,
+            course_title=title,
+            course_description='Learn things',
+            created_by=self.user,
+            **kwargs
+        )
+
+    def test_first_free_suffix(self):
+        self.assertEqual(self.create_course('Course 0').course_slug, 'course-0-1')
+        self.create_course('Course 0', course_slug='course-0-3')
+        # Taken suffixes are read with one query, however many there are
+        with self.assertNumQueries(1):
+            self.assertEqual(allocate_slug(Course, 'course_slug', 'Course 0'), 'course-0-2')
+        # Slugs sharing the prefix don't take suffixes
+        self.create_course('Course 0 10')
+        self.assertEqual(self.create_course('Course 0').course_slug, 'course-0-2')
+
+    def test_lesson_slugs_are_unique_per_course(self):
+        lesson = CourseLesson.objects.create(
+            course=self.course, lesson_title='Lesson 0', lesson_order=5, created_by=self.user
+        )
+        self.assertEqual(lesson.lesson_slug, 'lesson-0-1')
+        lesson = CourseLesson.objects.create(
+            course=self.create_course('New'), lesson_title='Lesson 0', lesson_order=0, created_by=self.user
+        )
+        self.assertEqual(lesson.lesson_slug, 'lesson-0')
+
+    def test_save_retries_after_losing_race(self):
+        # The first allocation returns a slug another insert took meanwhile
+        with mock.patch(
+            'content_management_system.slugs.allocate_slug', side_effect=['course-0', 'course-0-1']
+        ) as allocate:
+            course = self.create_course('Course 0')
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual(course.course_slug, 'course-0-1')
+
+    def test_allocator_hands_out_slugs_in_memory(self):
+        allocator = SlugAllocator(CourseLesson, 'lesson_slug', scope_fields=['course_id'])
+        with self.assertNumQueries(1):
+            slugs = [allocator.allocate('Lesson 0', course_id=self.course.id) for _ in range(3)]
+        self.assertEqual(slugs, ['lesson-0-1', 'lesson-0-2', 'lesson-0-3'])
+        self.assertEqual(allocator.allocate('Lesson 9', preferred='lesson-1', course_id=self.course.id), 'lesson-9')
+        self.assertEqual(allocator.allocate('Lesson 9', preferred='custom', course_id=self.course.id), 'custom')
+
+
+class SQLiteProfileTests(TestCase):
+    def test_connection_pragmas(self):
+        # The test database is in memory, which keeps its own journal and has no mmap.
+        expected = {'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -20000, 'temp_store': 2}
+        with connection.cursor() as cursor:
+            for name, value in expected.items():
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], value, name)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_benchmark_database_concurrency(self):
+        out = StringIO()
+        call_command(
+            'benchmark_database_concurrency', readers=2, writers=1, duration=0.2, rows=100, stdout=out
+        )
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split(':')[0].strip() for line in lines[1:]], ['default', 'production'])
+
+
+class OptimizeDatabaseTests(TransactionTestCase):
+    # The WAL can't be checkpointed inside TestCase's transaction
+
+    def test_optimize_database(self):
+        out = StringIO()
+        call_command('optimize_database', '--analyze', stdout=out)
+        self.assertIn('Database optimized.', out.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    def test_reads_use_replica_inside_replica_reads(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Course))
+        with replica_reads() as alias:
+            self.assertEqual(alias, 'replica')
+            self.assertEqual(router.db_for_read(Course), 'replica')
+            # Auth tables and writes stay on the primary
+            self.assertIsNone(router.db_for_read(CustomUser))
+            self.assertEqual(router.db_for_write(Course), 'default')
+        self.assertIsNone(router.db_for_read(Course))
+        self.assertFalse(router.allow_migrate('replica', 'content_management_system'))
+
+    def test_client_reads_own_writes_from_primary(self):
+        response = HttpResponse()
+        pin_to_primary(response)
+        request = RequestFactory().get('/api/cms/courses/')
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        with replica_reads(request) as alias:
+            self.assertIsNone(alias)
+        request.COOKIES[STICKY_COOKIE] = str(time.time() - 1)
+        with replica_reads(request) as alias:
+            self.assertEqual(alias, 'replica')
+
+    def test_stickiness_middleware(self):
+        factory = RequestFactory()
+        for request, status, pinned in [
+            (factory.post('/api/cms/comments/'), 201, True),
+            (factory.post('/api/cms/comments/'), 400, False),
+            (factory.get('/api/cms/courses/'), 200, False),
+        ]:
+            middleware = ReplicaStickinessMiddleware(lambda request: HttpResponse(status=status))
+            self.assertEqual(STICKY_COOKIE in middleware(request).cookies, pinned, request.method)
+        with self.settings(DATABASE_REPLICAS=[]):
+            response = middleware(factory.post('/api/cms/comments/'))
+            self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+
+@override_settings(COURSE_RATING_PRIOR_MEAN=3.0, COURSE_RATING_PRIOR_WEIGHT=5)
+class RatingStatsTests(TestCase):
+    def setUp(self):
+        self.author = create_catalog()
+        self.course = Course.objects.order_by('id').first()
+        self.users = [
+            CustomUser.objects.create_user(username=f'rater{index}', email=f'rater{index}@example.com')
+            for index in range(2)
+        ]
+
+    def test_counters_follow_ratings(self):
+        first = CourseRating.objects.create(course=self.course, user=self.users[0], rating=5)
+        CourseRating.objects.create(course=self.course, user=self.users[1], rating=2)
+        first.rating = 4
+        first.save()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.rating_count, self.course.rating_sum), (2, 6))
+        self.assertEqual((self.course.rating_4_count, self.course.rating_5_count), (1, 0))
+        self.assertEqual(self.course.rating_average, 3.0)
+        self.assertAlmostEqual(self.course.rating_score, 21 / 7)
+        self.assertEqual(reconcile_course_ratings(dry_run=True), 0)
+
+        first.delete()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.rating_count, self.course.rating_sum, self.course.rating_4_count), (1, 2, 0))
+        self.assertEqual(reconcile_course_ratings(dry_run=True), 0)
+
+    def test_drifted_counters_stay_positive(self):
+        rating = CourseRating.objects.create(course=self.course, user=self.users[0], rating=5)
+        CourseRating.objects.create(course=self.course, user=self.users[1], rating=3)
+        Course.objects.filter(pk=self.course.pk).update(rating_count=0, rating_sum=0, rating_5_count=0)
+        rating.delete()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.rating_count, self.course.rating_sum, self.course.rating_5_count), (0, 0, 0))
+
+        self.assertEqual(reconcile_course_ratings(), 1)
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.rating_count, self.course.rating_sum, self.course.rating_3_count), (1, 3, 1))
+
+
+@override_settings(
+    COURSE_VIEWS_FLUSH_INTERVAL=3600, COURSE_VIEWS_FLUSH_SIZE=3, COURSE_VIEWS_FLUSH_IN_BACKGROUND=False
+)
+class ViewCountBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog()
+
+    def setUp(self):
+        self.courses = list(Course.objects.order_by('id')[:2])
+        self.buffer = ViewCountBuffer()
+
+    def get_views(self):
+        courses = Course.objects.filter(pk__in=[course.pk for course in self.courses]).order_by('id')
+        return list(courses.values_list('course_views', flat=True))
+
+    def test_flush_when_full(self):
+        self.buffer.record(self.courses[0].pk)
+        self.buffer.record(self.courses[1].pk)
+        self.assertEqual(self.get_views(), [0, 0])
+        self.buffer.record(self.courses[0].pk)
+        self.assertEqual(self.get_views(), [2, 1])
+        self.assertEqual(self.buffer.pending_total, 0)
+
+    def test_idle_buffer_is_flushed_in_background(self):
+        flushed = threading.Event()
+        self.buffer.flush = flushed.set
+        with self.settings(COURSE_VIEWS_FLUSH_INTERVAL=0.05, COURSE_VIEWS_FLUSH_IN_BACKGROUND=True):
+            self.buffer.record(self.courses[1].pk)
+            # No further views arrive, the thread flushes on its own.
+            self.assertTrue(flushed.wait(5))
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': True, 'CACHE_ALIAS': 'responses'})
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog()
+
+    def setUp(self):
+        caches['responses'].clear()
+
+    def test_writes_bump_generation(self):
+        url = '/api/cms/courses/?page_size=100'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        course = Course.objects.order_by('id').first()
+        course.course_title = 'Renamed course'
+        with self.captureOnCommitCallbacks() as callbacks:
+            course.save()
+        # Not before the commit, or a concurrent miss could cache the old rows
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        for callback in callbacks:
+            callback()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Renamed course', [item['course_title'] for item in response.json()['results']])
+        # Models the response wasn't built from don't invalidate it
+        with self.captureOnCommitCallbacks(execute=True):
+            TopicType.objects.get().save()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_clients_pinned_to_primary_bypass_cache(self):
+        url = '/api/cms/courses/?page_size=100'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        # As if the cached page had been read from a replica that hadn't
+        # caught up with this write yet
+        Course.objects.update(course_title='Written')
+        response = HttpResponse()
+        pin_to_primary(response)
+        self.client.cookies[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('X-Cache'))
+        self.assertEqual({item['course_title'] for item in response.json()['results']}, {'Written'})
+
+        # Nor do they fill it
+        caches['responses'].clear()
+        self.client.get(url)
+        del self.client.cookies[STICKY_COOKIE]
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_per_process_backend_warning(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['content_management_system.W001'])
+        with self.settings(CACHES={'responses': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+        }}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class RenderingTests(SimpleTestCase):
+    def test_nul_in_text_cannot_forge_code_marker(self):
+        self.assertEqual(render_inline('a \x001\x00 `b`'), 'a 1 <code>b</code>')
+
+    def test_worker_survives_failed_batch(self):
+        calls = []
+        second_batch = threading.Event()
+
+        def store(batch):
+            calls.append(batch)
+            if len(calls) == 1:
+                raise IndexError('broken content')
+            second_batch.set()
+
+        worker = RenderWorker()
+        with mock.patch('content_management_system.render_queue.store_rendered_content', side_effect=store), \
+                self.assertLogs('content_management_system.render_queue', 'ERROR'):
+            worker.submit('a', 'first')
+            while not calls:
+                time.sleep(0.01)
+            worker.submit('b', 'second')
+            self.assertTrue(second_batch.wait(5))
+        self.assertEqual(calls, [{'a': 'first'}, {'b': 'second'}])
+
+
+class CourseTimestampTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog()
+
+    def test_topic_saves_bump_course_once(self):
+        # Drop bumps left queued by setUpTestData, whose commit never runs
+        course_timestamp_queue.flush()
+        courses = list(Course.objects.order_by('id')[:2])
+        Course.objects.update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        topics = list(LessonTopic.objects.filter(lesson__course__in=courses))
+        self.assertEqual(len(topics), 8)
+
+        # One UPDATE for every topic, with no lesson loaded per topic
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            with batch_course_timestamps():
+                for topic in topics:
+                    update_course_modified_date(LessonTopic, topic)
+        bumped = Course.objects.exclude(updated_at__year=2020)
+        self.assertEqual(set(bumped), set(courses))
+
+class InstrumentationTests(TestCase):
+    @override_settings(REQUEST_INSTRUMENTATION={'SAMPLE_RATE': 1})
+    def test_sampled_request_is_profiled(self):
+        with self.assertLogs('server.instrumentation', 'INFO') as logs:
+            response = self.client.get('/api/cms/courses/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertTrue(logs.output[0].startswith('INFO:server.instrumentation:method=GET path=/api/cms/courses/'))
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog()
+
+    def test_negotiation(self):
+        url = '/api/cms/lesson-topics/?page_size=100'
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        compressed = self.client.get(url, headers={'accept-encoding': 'gzip, deflate'})
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertTrue(compressed['ETag'].startswith('W/'))
+
+        # Below MIN_SIZE the body is sent as it is
+        small = self.client.get('/api/cms/topic-types/', headers={'accept-encoding': 'gzip'})
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+    def test_account_endpoints_are_not_compressed(self):
+        response = HttpResponse(b'x' * 4096)
+        for path, expected in [('/api/cms/courses/', True), ('/api/users/token/', False), ('/api/users/profile/', False)]:
+            request = RequestFactory().get(path, headers={'accept-encoding': 'gzip'})
+            self.assertEqual(should_compress(request, response), expected, path)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_catalog()
+        cls.course = Course.objects.order_by('id').first()
+
+    def assertNotModified(self, url, **headers):
+        self.assertEqual(self.client.get(url, headers=headers).status_code, 304, url)
+
+    def test_unchanged_list_is_not_modified(self):
+        url = '/api/cms/course-categories/'
+        response = self.client.get(url)
+        self.assertNotModified(url, if_none_match=response['ETag'])
+        self.assertNotModified(url, if_modified_since=response['Last-Modified'])
+
+        category = CourseCategory.objects.order_by('id').first()
+        category.category_description = 'Changed'
+        category.save()
+        changed = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_view_count_changes_etag(self):
+        for url in [
+            f'/api/cms/courses/{self.course.id}/',
+            f'/api/cms/course-lessons/?course={self.course.id}',
+            f'/api/cms/courses/{self.course.course_slug}/outline/',
+        ]:
+            response = self.client.get(url)
+            self.assertFalse(response.has_header('Last-Modified'), url)
+            self.assertNotModified(url, if_none_match=response['ETag'])
+
+            # Flushed view counts don't touch updated_at
+            Course.objects.filter(pk=self.course.pk).update(course_views=F('course_views') + 1)
+            changed = self.client.get(url, headers={'if-none-match': response['ETag']})
+            self.assertEqual(changed.status_code, 200, url)
+
+    def test_deleted_comment_changes_etag(self):
+        old = CourseComment.objects.create(course=self.course, user=self.user, content='Old')
+        thread = CourseComment.objects.create(course=self.course, user=self.user, content='Thread')
+        CourseComment.objects.create(course=self.course, user=self.user, content='Reply', parent=thread)
+        url = f'/api/cms/comments/?course={self.course.id}'
+        response = self.client.get(url)
+        self.assertNotModified(url, if_none_match=response['ETag'])
+
+        # Neither the newest timestamp nor the reply count moves
+        old.delete()
+        changed = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.data['results']), 1)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False}, CMS_VALUES_FAST_PATH=False)
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_catalog()
+
+    def get_ids(self, url):
+        response = self.client.get(url).json()
+        return [course['id'] for course in response['results']], response
+
+    def test_pages_follow_ordering_with_ties(self):
+        # Every course has rating_count 0, the primary key orders the ties.
+        url = '/api/cms/courses/?pagination=cursor&page_size=1&ordering=rating_count'
+        seen = []
+        while url:
+            ids, response = self.get_ids(url)
+            seen += ids
+            url = response['next_page_link']
+            if len(seen) == 2:
+                # A row added after the cursor's position shows up once, in order.
+                added = Course.objects.create(
+                    course_category=CourseCategory.objects.first(), course_type=CourseType.objects.first(),
+                    course_title='Added', course_description='New', created_by=self.user
+                )
+        expected = list(Course.objects.order_by('rating_count', 'pk').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(seen[-1], added.id)
+
+        # Walking back returns the same pages in reverse
+        url, back = response['previous_page_link'], []
+        while url:
+            ids, response = self.get_ids(url)
+            back = ids + back
+            url = response['previous_page_link']
+        self.assertEqual(back, expected[:-1])
+
+    def test_expression_ordering_falls_back_to_offset(self):
+        request = Request(APIRequestFactory().get('/api/cms/courses/', {'pagination': 'cursor', 'page_size': 3}))
+        paginator = CustomPagination()
+        queryset = Course.objects.order_by(F('course_price').desc(nulls_last=True))
+        page = paginator.paginate_queryset(queryset, request)
+        self.assertFalse(paginator.cursor_mode)
+        self.assertEqual(page, list(queryset[:3]))
+        self.assertEqual(paginator.get_paginated_response([]).data['current_page'], 1)
+
+    def test_mistyped_cursor_is_not_found(self):
+        for ordering, position in [('rating_count', ['x', 'notanint']), ('-created_at', ['yesterday', 1])]:
+            cursor = CustomPagination().encode_cursor(position)
+            response = self.client.get(f'/api/cms/courses/?ordering={ordering}&cursor={cursor}')
+            self.assertEqual(response.status_code, 404, ordering)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class QueryPlanTests(TestCase):
+    """
+    Every query the read endpoints run must be answered from an index.
+    SQLite reports a table read without one as ``SCAN <table>``.
+    """
+    endpoints = [
+        '/api/cms/course-categories/',
+        '/api/cms/course-types/',
+        '/api/cms/topic-types/',
+        '/api/cms/courses/',
+        '/api/cms/courses/?pagination=cursor',
+        '/api/cms/courses/?ordering=-rating_score',
+        '/api/cms/courses/?ordering=-rating_average',
+        '/api/cms/courses/?course_category={course.course_category_id}',
+        '/api/cms/courses/?course_category__category_slug={course.course_category.category_slug}',
+        '/api/cms/courses/{course.id}/',
+        '/api/cms/courses/{course.course_slug}/outline/',
+        '/api/cms/course-lessons/',
+        '/api/cms/course-lessons/?course={course.id}',
+        '/api/cms/course-lessons/?course__course_slug={course.course_slug}',
+        '/api/cms/lesson-topics/',
+        '/api/cms/lesson-topics/?lesson={lesson.id}',
+        '/api/cms/lesson-topics/?lesson__course={course.id}',
+        '/api/cms/lesson-topics/?lesson__course__course_slug={course.course_slug}',
+        '/api/cms/lesson-topics/{topic.id}/content/',
+        '/api/cms/comments/',
+        '/api/cms/comments/?course={course.id}',
+        '/api/cms/search/?q=course',
+    ]
+    full_scan_re = re.compile(r'^SCAN (\w+)$')
+
+    @classmethod
+    def setUpTestData(cls):
+        user = create_catalog()
+        cls.course = Course.objects.order_by('id').first()
+        cls.lesson = CourseLesson.objects.filter(course=cls.course).order_by('id').first()
+        cls.topic = LessonTopic.objects.filter(lesson=cls.lesson).order_by('id').first()
+        comment = CourseComment.objects.create(course=cls.course, user=user, content='First')
+        CourseComment.objects.create(course=cls.course, user=user, content='Reply', parent=comment)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def get_query_plans(self, url):
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        plans = []
+        with connection.cursor() as cursor:
+            for sql, params in queries:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plans.append((sql, [row[3] for row in cursor.fetchall()]))
+        return plans
+
+    def test_no_full_table_scans(self):
+        for endpoint in self.endpoints:
+            url = endpoint.format(course=self.course, lesson=self.lesson, topic=self.topic)
+            plans = self.get_query_plans(url)
+            self.assertTrue(plans, url)
+            for sql, plan in plans:
+                scans = [step for step in plan if self.full_scan_re.match(step)]
+                self.assertEqual(scans, [], f'{url}\n{sql}\n' + '\n'.join(plan))
+
+    def test_listings_use_query_indexes(self):
+        expected = {
+            '/api/cms/courses/': 'course_active_title_idx',
+            '/api/cms/courses/?ordering=-rating_score': 'course_active_score_idx',
+            '/api/cms/course-lessons/?course={course.id}': 'lesson_active_course_idx',
+            '/api/cms/lesson-topics/?lesson={lesson.id}': 'topic_active_lesson_idx',
+            '/api/cms/comments/?course={course.id}': 'comment_course_root_idx',
+            '/api/cms/comments/': 'comment_parent_created_idx',
+        }
+        for endpoint, index_name in expected.items():
+            url = endpoint.format(course=self.course, lesson=self.lesson)
+            steps = [step for sql, plan in self.get_query_plans(url) for step in plan]
+            self.assertTrue(any(index_name in step for step in steps), f'{url}\n' + '\n'.join(steps))
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class SearchTests(TestCase):
+    def test_highlights_escape_content(self):
+        user = create_catalog()
+        lesson = CourseLesson.objects.order_by('id').first()
+        LessonTopic.objects.create(
+            lesson=lesson, type=TopicType.objects.get(), created_by=user,
+            topic_title='<img src=x onerror=alert(1)> Pythonic',
+            topic_content='Use <script>alert(1)</script> pythonic code'
+        )
+        result = self.client.get('/api/cms/search/?q=pythonic').json()['results'][0]
+        self.assertEqual(result['title'], '&lt;img src=x onerror=alert(1)&gt; <mark>Pythonic</mark>')
+        self.assertEqual(result['snippet'], 'Use &lt;script&gt;alert(1)&lt;/script&gt; <mark>pythonic</mark> code')
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class CourseTransferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog()
+
+    def export(self, queryset=None):
+        stream = StringIO()
+        export_courses(stream, queryset)
+        return stream.getvalue().splitlines()
+
+    def test_imported_topics_are_rendered(self):
+        lines = self.export(Course.objects.filter(course_title='Course 0'))
+        LessonTopic.objects.all().delete()
+        RenderedTopicContent.objects.all().delete()
+        counts = CourseImporter().run(lines)
+        self.assertEqual(counts, {'courses': 1, 'lessons': 2, 'topics': 4})
+
+        topic = LessonTopic.objects.order_by('id').first()
+        self.assertIsNotNone(topic.rendered_content_id)
+        self.assertTrue(RenderedTopicContent.objects.filter(content_hash=topic.rendered_content_id).exists())
+        response = self.client.get(f'/api/cms/lesson-topics/{topic.id}/content/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<strong>text</strong>', response.content)
+
+    def test_round_trip(self):
+        out = StringIO()
+        call_command('export_courses', '--course=course-0', '--course=course-1', stdout=out, stderr=StringIO())
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8') as stream:
+            stream.write(out.getvalue())
+            stream.flush()
+            result = StringIO()
+            call_command('import_courses', stream.name, stdout=result)
+        self.assertIn('Imported 2 courses, 4 lessons and 8 topics.', result.getvalue())
+
+        # The copies keep everything but their course slugs, which were taken
+        imported = Course.objects.filter(course_slug__in=['course-0-1', 'course-1-1'])
+        copies = [json.loads(line) for line in self.export(imported)]
+        originals = [json.loads(line) for line in lines]
+        self.assertEqual([data.pop('slug') for data in copies], ['course-0-1', 'course-1-1'])
+        for data in originals:
+            data.pop('slug')
+        self.assertEqual(copies, originals)
+
+    def test_lookups_match_by_slug_or_name(self):
+        lines = self.export(Course.objects.filter(course_title='Course 0'))
+        # Re-slugged here: the import finds it by name instead of failing
+        # on the unique name
+        CourseCategory.objects.filter(category_name='Programming').update(category_slug='coding')
+        CourseImporter().run(lines)
+        self.assertEqual(CourseCategory.objects.count(), 2)
+        self.assertEqual(Course.objects.filter(course_category__category_slug='coding').count(), 3)
+
+    def test_topic_without_content_hash(self):
+        topic = LessonTopic.objects.order_by('id').first()
+        LessonTopic.objects.filter(pk=topic.pk).update(rendered_content=None)
+        response = self.client.get(f'/api/cms/lesson-topics/{topic.id}/content/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<strong>text</strong>', response.content)
+
+        render_missing_content()
+        topic.refresh_from_db()
+        self.assertEqual(response['ETag'], f'"{topic.rendered_content_id}"')
+
+
+class SyntheticCatalogTests(TestCase):
+    def test_zipf_counts(self):
+        counts = get_zipf_counts(1000, 10, 1.1)
+        self.assertEqual(sum(counts), 1000)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_generate_catalog(self):
+        counts = generate_catalog(
+            users=5, courses=12, lessons_per_course=2, topics_per_lesson=2, comments=300, max_depth=4,
+            shard_size=5, password='fixture-Password-1'
+        )
+        self.assertEqual(counts['courses'], Course.objects.count())
+        self.assertEqual(CourseLesson.objects.count(), 24)
+        self.assertEqual(LessonTopic.objects.filter(rendered_content__isnull=True).count(), 0)
+        self.assertTrue(CustomUser.objects.first().check_password('fixture-Password-1'))
+
+        # Stored thread fields match what CourseComment.save would compute
+        self.assertEqual(CourseComment.objects.count(), 300)
+        for comment in CourseComment.objects.select_related('parent'):
+            if comment.parent is None:
+                self.assertEqual((comment.thread_root_id, comment.depth), (None, 0))
+            else:
+                self.assertEqual(comment.thread_root_id, comment.parent.thread_root_id or comment.parent_id)
+                self.assertEqual(comment.depth, comment.parent.depth + 1)
+                self.assertEqual(comment.course_id, comment.parent.course_id)
+                self.assertLessEqual(comment.depth, 4)
+
+        # Denormalized rating statistics are consistent
+        self.assertEqual(reconcile_course_ratings(dry_run=True), 0)
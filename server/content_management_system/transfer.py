@@ -0,0 +1,309 @@
+import json
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from content_management_system.models import (
+    CourseCategory, CourseType, Course, CourseLesson, TopicType, LessonTopic
+)
+from content_management_system.render_queue import store_rendered_content
+from content_management_system.rendering import get_content_hash
+from content_management_system.response_cache import bump_generation_on_commit
+from content_management_system.search import index_documents, search_enabled
+from content_management_system.slugs import SlugAllocator
+
+User = get_user_model()
+
+# Course content is exchanged as JSON lines, one course per line with its
+# lessons and their topics nested inside:
+#
+#   {"title": ..., "slug": ..., "category": {"slug": ..., "name": ...},
+#    "type": {...}, "created_by": "author@example.com", ...,
+#    "lessons": [{"title": ..., "topics": [{"title": ..., "type": {...}}]}]}
+
+
+def serialize_course(course, lessons):
+    return {
+        'title': course.course_title,
+        'slug': course.course_slug,
+        'description': course.course_description,
+        'category': {
+            'slug': course.course_category.category_slug,
+            'name': course.course_category.category_name,
+        },
+        'type': {
+            'slug': course.course_type.course_slug,
+            'name': course.course_type.course_name,
+        },
+        'banner': course.course_banner.name or None,
+        'is_free_course': course.is_free_course,
+        'price': str(course.course_price),
+        'is_published': course.is_published,
+        'is_active': course.is_active,
+        'created_by': course.created_by.email,
+        'lessons': lessons,
+    }
+
+
+def serialize_lesson(lesson, topics):
+    return {
+        'title': lesson.lesson_title,
+        'slug': lesson.lesson_slug,
+        'description': lesson.lesson_description,
+        'order': lesson.lesson_order,
+        'is_active': lesson.is_active,
+        'created_by': lesson.created_by.email,
+        'topics': topics,
+    }
+
+
+def serialize_topic(topic):
+    return {
+        'title': topic.topic_title,
+        'slug': topic.topic_slug,
+        'type': {
+            'slug': topic.type.topic_slug,
+            'name': topic.type.type_name,
+        },
+        'content': topic.topic_content,
+        'order': topic.topic_order,
+        'is_active': topic.is_active,
+        'created_by': topic.created_by.email,
+    }
+
+
+def export_courses(stream, queryset=None, batch_size=100):
+    """
+    Write courses as JSON lines to ``stream``. Courses are read with
+    ``iterator()`` and their lessons and topics fetched per batch of
+    ``batch_size`` courses, so memory use doesn't grow with the catalog.
+    Returns the number of courses written.
+    """
+    if queryset is None:
+        queryset = Course.objects.all()
+    queryset = queryset.select_related(
+        'course_category', 'course_type', 'created_by'
+    ).order_by('id')
+
+    total = 0
+    batch = []
+    for course in queryset.iterator(chunk_size=batch_size):
+        batch.append(course)
+        if len(batch) >= batch_size:
+            total += _export_batch(stream, batch)
+            batch = []
+    total += _export_batch(stream, batch)
+    return total
+
+
+def _export_batch(stream, courses):
+    if not courses:
+        return 0
+    course_ids = [course.id for course in courses]
+
+    topics = {}
+    topic_queryset = LessonTopic.objects.filter(
+        lesson__course_id__in=course_ids
+    ).select_related('type', 'created_by').order_by('lesson_id', 'topic_order', 'id')
+    for topic in topic_queryset:
+        topics.setdefault(topic.lesson_id, []).append(serialize_topic(topic))
+
+    lessons = {}
+    lesson_queryset = CourseLesson.objects.filter(
+        course_id__in=course_ids
+    ).select_related('created_by').order_by('course_id', 'lesson_order', 'id')
+    for lesson in lesson_queryset:
+        lessons.setdefault(lesson.course_id, []).append(
+            serialize_lesson(lesson, topics.get(lesson.id, []))
+        )
+
+    for course in courses:
+        stream.write(json.dumps(serialize_course(course, lessons.get(course.id, []))) + '\n')
+    return len(courses)
+
+
+class CourseImporter:
+    """
+    Create courses from JSON lines produced by ``export_courses``.
+
+    Rows are inserted with ``bulk_create`` one batch at a time, each batch
+    in its own transaction. Slugs are allocated up front with
+    ``SlugAllocator``, keeping the exported slug where it is still free.
+    ``bulk_create`` sends no signals, so the work of the save handlers is
+    done once per batch instead: the new rows are added to the search
+    index in one insert, the topic bodies rendered together and the cached
+    responses invalidated once. There
+    is no ``update_course_modified_date`` to run as every course is new.
+
+    Categories, course types and topic types are matched by slug or name
+    and created when missing. Authors are matched by email; ``owner`` is used
+    for unknown ones.
+    """
+
+    def __init__(self, owner=None, batch_size=1000):
+        self.owner = owner
+        self.batch_size = batch_size
+        self.categories = {}
+        self.course_types = {}
+        self.topic_types = {}
+        self.users = {}
+        self.course_slugs = SlugAllocator(Course, 'course_slug')
+        self.lesson_slugs = SlugAllocator(CourseLesson, 'lesson_slug', scope_fields=['course_id'])
+        self.topic_slugs = SlugAllocator(LessonTopic, 'topic_slug', scope_fields=['lesson_id'])
+        self.counts = {'courses': 0, 'lessons': 0, 'topics': 0}
+
+    def run(self, lines):
+        """Import every course in ``lines``. Returns the created object counts."""
+        batch = []
+        batch_rows = 0
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Line {line_number}: invalid JSON ({e})")
+            batch.append(data)
+            batch_rows += 1 + sum(1 + len(lesson.get('topics', [])) for lesson in data.get('lessons', []))
+            if batch_rows >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+                batch_rows = 0
+        self.import_batch(batch)
+        return self.counts
+
+    def import_batch(self, batch):
+        if not batch:
+            return
+        with transaction.atomic():
+            self.resolve_references(batch)
+
+            courses = [self.build_course(data) for data in batch]
+            Course.objects.bulk_create(courses, batch_size=self.batch_size)
+
+            lessons = []
+            lesson_data = []
+            for course, data in zip(courses, batch):
+                self.lesson_slugs.mark_new(course_id=course.id)
+                for item in data.get('lessons', []):
+                    lessons.append(self.build_lesson(course, item))
+                    lesson_data.append(item)
+            CourseLesson.objects.bulk_create(lessons, batch_size=self.batch_size)
+
+            topics = []
+            for lesson, data in zip(lessons, lesson_data):
+                self.topic_slugs.mark_new(lesson_id=lesson.id)
+                for item in data.get('topics', []):
+                    topics.append(self.build_topic(lesson, item))
+            LessonTopic.objects.bulk_create(topics, batch_size=self.batch_size)
+            # bulk_create skips save() and its render signal
+            store_rendered_content({topic.rendered_content_id: topic.topic_content for topic in topics})
+
+            if search_enabled():
+                index_documents(courses)
+                index_documents(lessons)
+                index_documents(topics)
+
+        for model in (Course, CourseLesson, LessonTopic):
+            bump_generation_on_commit(model)
+        self.counts['courses'] += len(courses)
+        self.counts['lessons'] += len(lessons)
+        self.counts['topics'] += len(topics)
+
+    def resolve_references(self, batch):
+        """Load the categories, types and authors of a batch with one query per model."""
+        categories, course_types, topic_types, emails = {}, {}, {}, set()
+        for data in batch:
+            categories[data['category']['slug']] = data['category']
+            course_types[data['type']['slug']] = data['type']
+            emails.add(data.get('created_by'))
+            for lesson in data.get('lessons', []):
+                emails.add(lesson.get('created_by'))
+                for topic in lesson.get('topics', []):
+                    topic_types[topic['type']['slug']] = topic['type']
+                    emails.add(topic.get('created_by'))
+
+        self.load_lookup(self.categories, CourseCategory, 'category_slug', 'category_name', categories)
+        self.load_lookup(self.course_types, CourseType, 'course_slug', 'course_name', course_types)
+        self.load_lookup(self.topic_types, TopicType, 'topic_slug', 'type_name', topic_types,
+                         lambda: {'created_by': self.get_owner()})
+
+        emails = {email for email in emails if email and email not in self.users}
+        if emails:
+            for user in User.objects.filter(email__in=emails):
+                self.users[user.email] = user
+
+    def load_lookup(self, lookup, model, slug_field, name_field, wanted, get_extra=None):
+        """
+        Fill ``lookup`` with the ``{slug: item}`` rows in ``wanted``. Both
+        slug and name are unique: a row matching either is used, so a
+        category renamed or re-slugged on one side doesn't fail the import.
+        """
+        missing = [slug for slug in wanted if slug not in lookup]
+        if not missing:
+            return
+        names = [wanted[slug]['name'] for slug in missing]
+        by_slug, by_name = {}, {}
+        for instance in model.objects.filter(
+            Q(**{f'{slug_field}__in': missing}) | Q(**{f'{name_field}__in': names})
+        ):
+            by_slug[getattr(instance, slug_field)] = instance
+            by_name[getattr(instance, name_field)] = instance
+        for slug in missing:
+            name = wanted[slug]['name']
+            instance = by_slug.get(slug) or by_name.get(name)
+            if instance is None:
+                extra = get_extra() if get_extra else {}
+                instance = model.objects.create(**{slug_field: slug, name_field: name}, **extra)
+                by_name[name] = instance
+            lookup[slug] = instance
+
+    def get_owner(self):
+        if self.owner is None:
+            raise ValueError("Import data references unknown users and no owner was given.")
+        return self.owner
+
+    def get_user(self, email):
+        user = self.users.get(email)
+        return user if user is not None else self.get_owner()
+
+    def build_course(self, data):
+        return Course(
+            course_category=self.categories[data['category']['slug']],
+            course_type=self.course_types[data['type']['slug']],
+            course_title=data['title'],
+            course_slug=self.course_slugs.allocate(data['title'], preferred=data.get('slug')),
+            course_description=data.get('description', ''),
+            course_banner=data.get('banner') or None,
+            is_free_course=data.get('is_free_course', True),
+            course_price=Decimal(data.get('price') or '0'),
+            is_published=data.get('is_published', False),
+            is_active=data.get('is_active', True),
+            created_by=self.get_user(data.get('created_by')),
+        )
+
+    def build_lesson(self, course, data):
+        return CourseLesson(
+            course=course,
+            lesson_title=data['title'],
+            lesson_slug=self.lesson_slugs.allocate(data['title'], preferred=data.get('slug'), course_id=course.id),
+            lesson_description=data.get('description', ''),
+            lesson_order=data.get('order', 0),
+            is_active=data.get('is_active', True),
+            created_by=self.get_user(data.get('created_by')),
+        )
+
+    def build_topic(self, lesson, data):
+        content = data.get('content', '')
+        return LessonTopic(
+            lesson=lesson,
+            type=self.topic_types[data['type']['slug']],
+            topic_title=data['title'],
+            topic_slug=self.topic_slugs.allocate(data['title'], preferred=data.get('slug'), lesson_id=lesson.id),
+            topic_content=content,
+            rendered_content_id=get_content_hash(content),
+            topic_order=data.get('order', 0),
+            is_active=data.get('is_active', True),
+            created_by=self.get_user(data.get('created_by')),
+        )
@@ -7,7 +7,11 @@ from content_management_system.views import (
     CourseLessonViewSet,
     TopicTypeViewSet,
     LessonTopicViewSet,
-    CourseCommentViewSet
+    CourseCommentViewSet,
+    CourseOutlineView,
+    ResponseCacheStatsView,
+    TopicContentView,
+    SearchView
 )
 
 router = DefaultRouter()
@@ -20,5 +24,9 @@ router.register(r'lesson-topics', LessonTopicViewSet, basename='lesson-topic')
 router.register(r'comments', CourseCommentViewSet, basename='course-comment')
 
 urlpatterns = [
+    path('search/', SearchView.as_view(), name='search'),
+    path('courses/<slug:slug>/outline/', CourseOutlineView.as_view(), name='course-outline'),
+    path('lesson-topics/<int:pk>/content/', TopicContentView.as_view(), name='lesson-topic-content'),
+    path('cache-stats/', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,119 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from content_management_system.models import Course
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCountBuffer:
+    """
+    Collects course page views in memory and writes them in batches, one
+    ``UPDATE ... SET course_views = course_views + n`` per course.
+
+    A flush happens once the buffer is older than ``COURSE_VIEWS_FLUSH_INTERVAL``
+    seconds or holds ``COURSE_VIEWS_FLUSH_SIZE`` views, and at process exit.
+    A background thread flushes every interval too, so the views of a
+    worker that stops getting requests are written and not kept until it
+    exits, or lost if it is killed. Each worker process keeps its own
+    buffer; because the UPDATE only adds to the stored value, flushes from
+    different processes never conflict.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.pending_total = 0
+        self.last_flush = time.monotonic()
+        self.flusher_started = False
+
+    def _check_fork(self):
+        # A forked worker must not re-flush views counted by its parent.
+        if self.pid != os.getpid():
+            self._reset()
+
+    def get_limits(self):
+        return (
+            getattr(settings, 'COURSE_VIEWS_FLUSH_INTERVAL', 10),
+            getattr(settings, 'COURSE_VIEWS_FLUSH_SIZE', 500),
+        )
+
+    def record(self, course_id):
+        self._check_fork()
+        interval, size = self.get_limits()
+        if not self.flusher_started and flush_in_background():
+            self._start_flusher()
+        with self.lock:
+            self.pending[course_id] += 1
+            self.pending_total += 1
+            due = (
+                self.pending_total >= size
+                or time.monotonic() - self.last_flush >= interval
+            )
+        if due:
+            self.flush()
+
+    def _start_flusher(self):
+        # Threads don't survive a fork; _check_fork resets the flag.
+        with self.lock:
+            if self.flusher_started:
+                return
+            self.flusher_started = True
+        threading.Thread(target=self._run_flusher, name='course-view-flusher', daemon=True).start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.get_limits()[0])
+            if self.pending_total:
+                close_old_connections()
+                self.flush()
+
+    def flush(self):
+        """Write buffered views to the database. Returns the number of views written."""
+        self._check_fork()
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            self.pending_total = 0
+            self.last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            with transaction.atomic():
+                for course_id, views in sorted(pending.items()):
+                    Course.objects.filter(pk=course_id).update(course_views=F('course_views') + views)
+        except DatabaseError:
+            logger.exception("Could not flush course views, keeping them for the next flush")
+            with self.lock:
+                self.pending.update(pending)
+                self.pending_total += sum(pending.values())
+            return 0
+        return sum(pending.values())
+
+
+def flush_in_background():
+    return getattr(settings, 'COURSE_VIEWS_FLUSH_IN_BACKGROUND', True)
+
+
+course_view_buffer = ViewCountBuffer()
+
+
+def record_course_view(course_id):
+    course_view_buffer.record(course_id)
+
+
+def flush_course_views():
+    return course_view_buffer.flush()
+
+
+atexit.register(flush_course_views)
@@ -1,21 +1,73 @@
+import base64
+import binascii
+import datetime
+import decimal
+import hashlib
+import json
+import math
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Prefetch, Q, Sum
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from rest_framework import serializers, viewsets, pagination, filters
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from content_management_system.models import (
-    CourseCategory, CourseType, Course, CourseLesson, TopicType, LessonTopic, CourseComment
+    CourseCategory, CourseType, Course, CourseLesson, TopicType, LessonTopic, CourseComment,
+    RenderedTopicContent
 )
 from rest_framework.filters import OrderingFilter, SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from .serializers import CourseCommentSerializer
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from .serializers import (
+    CourseCommentSerializer, ExpandableFieldsMixin, get_comment_max_depth, get_row_serializer,
+    load_comment_threads, parse_field_tree
+)
+from .view_tracking import record_course_view
+from .render_queue import get_or_render, get_topic_hash
+from .response_cache import ResponseCacheMixin, cache_stats
+from server.middleware import accepts_gzip, mark_compressed
+from server.routers import replica_reads
+from .search import KIND_CODES, SearchResults, build_match_query, matching_ids, search_enabled
 
 
 # Custom Pagination Class
 class CustomPagination(pagination.PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset (cursor) mode.
+
+    Cursor mode is selected with ``?pagination=cursor`` (or by sending a
+    ``cursor`` param) or per viewset with ``pagination_mode = 'cursor'``.
+    It pages on the queryset ordering plus the primary key, skips the
+    OFFSET scan and reports a cached estimate instead of a fresh COUNT(*).
+    Orderings that aren't plain field paths, such as expressions, can't be
+    keyed on and are paged by offset instead.
+    """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.use_cursor_mode(request, view)
+        if self.cursor_mode:
+            ordering = self.get_keyset_ordering(queryset)
+            if ordering is not None:
+                return self.paginate_queryset_by_cursor(queryset, ordering, request, view)
+            self.cursor_mode = False
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return self.get_cursor_paginated_response(data)
         return Response({
             'total_items': self.page.paginator.count,
             'total_pages': self.page.paginator.num_pages,
@@ -25,15 +77,387 @@ class CustomPagination(pagination.PageNumberPagination):
             'previous_page_link': self.get_previous_link(),
             'results': data
         })
+
+    def use_cursor_mode(self, request, view):
+        if self.cursor_query_param in request.query_params:
+            return True
+        mode = request.query_params.get(self.mode_query_param)
+        if mode is None:
+            mode = getattr(view, 'pagination_mode', 'page')
+        return mode == 'cursor'
+
+    # Keyset pagination
+    def get_keyset_ordering(self, queryset):
+        """The ordering to key on, or None if it isn't made of field paths only."""
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not all(isinstance(field, str) and field != '?' for field in ordering):
+            return None
+        names = [field.lstrip('-') for field in ordering]
+        if 'pk' not in names and 'id' not in names:
+            # The primary key breaks ties so every row has a unique position.
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def encode_cursor(self, values, reverse=False):
+        position = [self.encode_value(value) for value in values]
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            return list(payload['p']), bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError, binascii.Error):
+            raise NotFound('Invalid cursor')
+
+    def encode_value(self, value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
+
+    def get_position(self, obj, ordering):
+        values = []
+        for field in ordering:
+            if isinstance(obj, dict):
+                # values() rows
+                values.append(obj[field.lstrip('-')])
+                continue
+            value = obj
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def get_keyset_filter(self, ordering, position, reverse):
+        # (a, b, c) > (x, y, z) expands to
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = '%s__%s' % (name, 'lt' if descending else 'gt')
+            term = Q(**{lookup: position[index]})
+            for prev_field, prev_value in zip(ordering[:index], position[:index]):
+                term &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= term
+        return condition
+
+    def paginate_queryset_by_cursor(self, queryset, ordering, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        position, reverse = self.decode_cursor(request)
+        if position is not None and len(position) != len(ordering):
+            raise NotFound('Invalid cursor')
+
+        self.estimated_count = self.get_estimated_count(queryset)
+
+        if reverse:
+            query_ordering = [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+        else:
+            query_ordering = ordering
+        page_queryset = queryset.order_by(*query_ordering)
+        if position is not None:
+            # decode_cursor only checks the shape; values that don't fit the
+            # ordering fields fail when the lookups are prepared.
+            try:
+                page_queryset = page_queryset.filter(self.get_keyset_filter(ordering, position, reverse))
+            except (TypeError, ValueError, DjangoValidationError):
+                raise NotFound('Invalid cursor')
+
+        results = list(page_queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.next_cursor = None
+        self.previous_cursor = None
+        if results and self.has_next:
+            self.next_cursor = self.encode_cursor(self.get_position(results[-1], ordering))
+        if results and self.has_previous:
+            self.previous_cursor = self.encode_cursor(self.get_position(results[0], ordering), reverse=True)
+        return results
+
+    def get_estimated_count(self, queryset):
+        timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 300)
+        if timeout is None:
+            return None
+        unordered = queryset.order_by()
+        key = 'pagination-count:%s' % hashlib.md5(str(unordered.query).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = unordered.count()
+            cache.set(key, count, timeout)
+        return count
+
+    def get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_cursor_paginated_response(self, data):
+        total_pages = None
+        if self.estimated_count is not None:
+            total_pages = max(1, math.ceil(self.estimated_count / self.page_size))
+        return Response({
+            'total_items': self.estimated_count,
+            'total_pages': total_pages,
+            'current_page': None,
+            'items_per_page': self.page_size,
+            'next_page_link': self.get_cursor_link(self.next_cursor),
+            'previous_page_link': self.get_cursor_link(self.previous_cursor),
+            'results': data
+        })
     
 
-class CourseCommentViewSet(viewsets.ModelViewSet):
+class SparseFieldsetMixin:
+    """
+    Viewset mixin reading ``?fields=`` and ``?expand=`` (see
+    ExpandableFieldsMixin) and narrowing the queryset to match: only the
+    expanded relations are joined and, when ``fields`` is given, only the
+    columns the response needs are selected.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_requested_shape(self):
+        params = self.request.query_params
+        return (
+            parse_field_tree(params.get(self.fields_query_param)),
+            parse_field_tree(params.get(self.expand_query_param)),
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), ExpandableFieldsMixin):
+            fields, expand = self.get_requested_shape()
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = self.get_requested_shape()
+        if fields is None and expand is None:
+            return queryset
+
+        related, columns = self.get_serializer().get_query_shape()
+        queryset = queryset.select_related(None).select_related(*set(related))
+        if fields is not None:
+            # Ordering columns are read by the cursor paginator.
+            ordering_fields = getattr(self, 'ordering_fields', None) or []
+            if ordering_fields == '__all__':
+                ordering_fields = []
+            ordering = [field.lstrip('-') for field in getattr(self, 'ordering', None) or []]
+            queryset = queryset.only(*set(columns + list(ordering_fields) + ordering))
+        return queryset
+
+
+class ReplicaReadMixin:
+    """Serve the view's safe requests from a read replica (see server.routers)."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads(request):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ValuesListMixin:
+    """
+    Fast path for list requests: rows are read with ``values()``, joined
+    fields included, and rendered by a precompiled RowSerializer instead of
+    model instances and serializer fields. The output is identical; views
+    whose serializer the RowSerializer can't reproduce use the normal path.
+    Disabled with ``CMS_VALUES_FAST_PATH = False``.
+    """
+
+    def get_row_serializer(self):
+        if not getattr(settings, 'CMS_VALUES_FAST_PATH', True):
+            return None
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, ExpandableFieldsMixin):
+            return None
+        fields, expand = self.get_requested_shape()
+        return get_row_serializer(serializer_class, fields, expand)
+
+    def get_values_columns(self, row_serializer, queryset):
+        columns = list(row_serializer.columns)
+        # The cursor paginator reads the position from the ordering columns.
+        if self.paginator is not None and hasattr(self.paginator, 'get_keyset_ordering'):
+            for field in self.paginator.get_keyset_ordering(queryset) or []:
+                if field.lstrip('-') not in columns:
+                    columns.append(field.lstrip('-'))
+        return columns
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.get_row_serializer()
+        if row_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*self.get_values_columns(row_serializer, queryset))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.render(page))
+        return Response(row_serializer.render(rows))
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and retrieve.
+
+    Before serializing, one aggregate query takes the latest of the
+    ``conditional_timestamp_fields`` and distinct counts of the
+    ``conditional_count_fields`` over the filtered queryset. Together with the full request path they form the ETag, so
+    an unchanged resource is answered with 304 without running a serializer.
+
+    ``conditional_counter_fields`` are columns written with update(), which
+    leaves updated_at alone, such as Course.course_views. Their sum goes
+    into the ETag too, and no Last-Modified is used as it can't reflect them.
+    """
+    conditional_timestamp_fields = ['updated_at']
+    conditional_counter_fields = []
+    conditional_count_fields = ['pk']
+
+    def get_conditional_state(self, queryset):
+        aggregates = {
+            f'modified_{index}': Max(field)
+            for index, field in enumerate(self.conditional_timestamp_fields)
+        }
+        counters = {
+            f'counter_{index}': Sum(field)
+            for index, field in enumerate(self.conditional_counter_fields)
+        }
+        row_counts = {
+            f'row_count_{index}': Count(field, distinct=True)
+            for index, field in enumerate(self.conditional_count_fields)
+        }
+        values = queryset.order_by().aggregate(**aggregates, **row_counts, **counters)
+
+        row_count_values = [values.pop(name) for name in row_counts]
+        counter_values = [values.pop(name) for name in counters]
+        timestamps = [value for value in values.values() if value is not None]
+        last_modified = max(timestamps) if timestamps and not counters else None
+        fingerprint = '|'.join([
+            self.request.get_full_path(),
+            *(str(value) for value in row_count_values),
+            *(value.isoformat() if value else '' for value in values.values()),
+            *(str(value) for value in counter_values),
+        ])
+        etag = '"%s"' % hashlib.md5(fingerprint.encode()).hexdigest()
+        return etag, last_modified
+
+    def check_not_modified(self, queryset):
+        """Return a 304 response if the client's copy is current, else None."""
+        etag, last_modified = self.get_conditional_state(queryset)
+        self.conditional_state = (etag, last_modified)
+        return get_conditional_response(
+            self.request._request,
+            etag=etag,
+            # HTTP dates have whole seconds
+            last_modified=int(last_modified.timestamp()) if last_modified else None
+        )
+
+    def get_object_queryset(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, DjangoValidationError):
+            raise Http404
+
+    def list(self, request, *args, **kwargs):
+        return (
+            self.check_not_modified(self.filter_queryset(self.get_queryset()))
+            or super().list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return (
+            self.check_not_modified(self.get_object_queryset())
+            or super().retrieve(request, *args, **kwargs)
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        state = getattr(self, 'conditional_state', None)
+        if state and response.status_code in (200, 304):
+            etag, last_modified = state
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+
+class SearchPagination(CustomPagination):
+    # Search results are ranked, so there are no ordering fields to key on.
+    def use_cursor_mode(self, request, view):
+        return False
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    ``?search=`` backed by the full-text index instead of LIKE '%term%'.
+    The view's ``search_index_kind`` selects which documents to match.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        kind = getattr(view, 'search_index_kind', None)
+        if kind is None or not search_enabled():
+            return super().filter_queryset(request, queryset, view)
+        if build_match_query(text) is None:
+            return queryset
+        return queryset.filter(id__in=matching_ids(kind, text))
+
+
+class SearchView(GenericAPIView):
+    """
+    Ranked search across courses, lessons and topics.
+    Query params: ``q`` (required), ``type`` (course/lesson/topic), ``course`` (id).
+    """
+    permission_classes = [AllowAny]
+    pagination_class = SearchPagination
+
+    def get(self, request):
+        kind = request.query_params.get('type') or None
+        if kind is not None and kind not in KIND_CODES:
+            raise ValidationError({'type': f"Must be one of: {', '.join(KIND_CODES)}."})
+        course_id = request.query_params.get('course') or None
+        if course_id is not None and not course_id.isdigit():
+            raise ValidationError({'course': 'Must be a course id.'})
+
+        results = SearchResults(request.query_params.get('q', ''), kind=kind, course_id=course_id)
+        page = self.paginate_queryset(results)
+        return self.get_paginated_response(page)
+
+
+class CourseCommentViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = CourseComment.objects.filter(parent__isnull=True).select_related('user', 'course')
     serializer_class = CourseCommentSerializer
     pagination_class = CustomPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['course']  # Enables filtering by course ID
     ordering = ['-created_at']
+    # Replies are part of each top-level comment's payload
+    conditional_timestamp_fields = ['updated_at', 'thread_comments__updated_at']
+    # Roots and replies: either can be deleted without moving a timestamp
+    conditional_count_fields = ['pk', 'thread_comments']
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -43,36 +467,80 @@ class CourseCommentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def get_max_depth(self):
+        max_depth = get_comment_max_depth()
+        try:
+            requested = int(self.request.query_params.get('max_depth', max_depth))
+        except (TypeError, ValueError):
+            return max_depth
+        return max(0, min(requested, max_depth))
+
+    def get_thread_serializer(self, roots):
+        context = self.get_serializer_context()
+        context.update(load_comment_threads(roots, self.get_max_depth()))
+        return self.get_serializer(roots, many=True, context=context)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        not_modified = self.check_not_modified(queryset)
+        if not_modified:
+            return not_modified
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_thread_serializer(page)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_thread_serializer(list(queryset))
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        not_modified = self.check_not_modified(self.get_object_queryset())
+        if not_modified:
+            return not_modified
+        serializer = self.get_thread_serializer([self.get_object()])
+        return Response(serializer.data[0])
+
 
 
 # Serializers
-class CourseCategorySerializer(serializers.ModelSerializer):
+class CourseCategorySerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CourseCategory
         fields = ['id', 'category_name', 'category_slug', 'category_description', 'is_active']
 
     permission_classes = [AllowAny]
 
-class CourseTypeSerializer(serializers.ModelSerializer):
+class CourseTypeSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CourseType
         fields = ['id', 'course_name', 'course_slug', 'course_description', 'is_active']
     permission_classes = [AllowAny]
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     course_category = CourseCategorySerializer(read_only=True)
     course_type = CourseTypeSerializer(read_only=True)
+    rating_histogram = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
         fields = [
             'id', 'course_category', 'course_type', 'course_title', 'course_slug',
             'course_description', 'is_free_course', 'course_price', 'is_published',
-            'created_at', 'updated_at', 'is_active'
+            'created_at', 'updated_at', 'is_active', 'course_views',
+            'rating_average', 'rating_count', 'rating_score', 'rating_histogram'
         ]
     permission_classes = [AllowAny]
+    expandable_fields = {
+        'course_category': CourseCategorySerializer,
+        'course_type': CourseTypeSerializer,
+    }
+    model_field_dependencies = {
+        'rating_histogram': [f'rating_{value}_count' for value in range(1, 6)],
+    }
+
+    def get_rating_histogram(self, obj):
+        return {str(value): getattr(obj, f'rating_{value}_count') for value in range(1, 6)}
 
-class CourseLessonSerializer(serializers.ModelSerializer):
+class CourseLessonSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     course = CourseSerializer(read_only=True)
 
     class Meta:
@@ -82,82 +550,289 @@ class CourseLessonSerializer(serializers.ModelSerializer):
             'lesson_order', 'created_at', 'is_active'
         ]
     permission_classes = [AllowAny]
+    expandable_fields = {'course': CourseSerializer}
 
-class TopicTypeSerializer(serializers.ModelSerializer):
+class TopicTypeSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = TopicType
         fields = ['id', 'type_name', 'topic_slug', 'created_at', 'is_active']
     permission_classes = [AllowAny]
 
-class LessonTopicSerializer(serializers.ModelSerializer):
+class LessonTopicSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     lesson = CourseLessonSerializer(read_only=True)
     type = TopicTypeSerializer(read_only=True)
+    rendered_html = serializers.SerializerMethodField()
+    code_blocks = serializers.SerializerMethodField()
+    word_count = serializers.SerializerMethodField()
+    reading_time = serializers.SerializerMethodField()
 
     class Meta:
         model = LessonTopic
         fields = [
             'id', 'lesson', 'type', 'topic_order', 'topic_title', 'topic_slug',
-            'topic_content', 'created_at', 'is_active'
+            'topic_content', 'created_at', 'is_active',
+            'rendered_html', 'code_blocks', 'word_count', 'reading_time'
         ]
     permission_classes = [AllowAny]
+    expandable_fields = {
+        'lesson': CourseLessonSerializer,
+        'type': TopicTypeSerializer,
+    }
+    model_field_dependencies = {
+        name: ['rendered_content', f'rendered_content__{name}']
+        for name in ['rendered_html', 'code_blocks', 'word_count', 'reading_time']
+    }
+
+    # The rendered fields are null until the render worker has processed
+    # the topic; clients fall back to topic_content meanwhile.
+    def get_rendered(self, obj):
+        try:
+            return obj.rendered_content
+        except RenderedTopicContent.DoesNotExist:
+            return None
+
+    def get_rendered_html(self, obj):
+        rendered = self.get_rendered(obj)
+        return rendered.rendered_html if rendered else None
+
+    def get_code_blocks(self, obj):
+        rendered = self.get_rendered(obj)
+        return rendered.code_blocks if rendered else None
+
+    def get_word_count(self, obj):
+        rendered = self.get_rendered(obj)
+        return rendered.word_count if rendered else None
+
+    def get_reading_time(self, obj):
+        rendered = self.get_rendered(obj)
+        return rendered.reading_time if rendered else None
+
+class OutlineTopicSerializer(serializers.ModelSerializer):
+    type = TopicTypeSerializer(read_only=True)
+
+    class Meta:
+        model = LessonTopic
+        fields = ['id', 'type', 'topic_order', 'topic_title', 'topic_slug']
+
+
+class OutlineLessonSerializer(serializers.ModelSerializer):
+    topics = OutlineTopicSerializer(many=True, read_only=True, source='active_topics')
+
+    class Meta:
+        model = CourseLesson
+        fields = [
+            'id', 'lesson_title', 'lesson_slug', 'lesson_description',
+            'lesson_order', 'created_at', 'topics'
+        ]
 
 # ViewSets
-class CourseCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CourseCategoryViewSet(
+    ReplicaReadMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetMixin, ValuesListMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     queryset = CourseCategory.objects.filter(is_active=True)
     serializer_class = CourseCategorySerializer
     pagination_class = CustomPagination
     filter_backends = [OrderingFilter]
     ordering_fields = ['category_name', 'id']
     ordering = ['category_name']
+    cache_models = [CourseCategory]
     permission_classes = [AllowAny]
 
-class CourseTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class CourseTypeViewSet(
+    ReplicaReadMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetMixin, ValuesListMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     queryset = CourseType.objects.filter(is_active=True)
     serializer_class = CourseTypeSerializer
     pagination_class = CustomPagination
     filter_backends = [OrderingFilter]
     ordering_fields = ['course_name', 'id']
     ordering = ['course_name']
+    cache_models = [CourseType]
     permission_classes = [AllowAny]
 
-class CourseViewSet(viewsets.ReadOnlyModelViewSet):
+class CourseViewSet(
+    ReplicaReadMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetMixin, ValuesListMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     queryset = Course.objects.filter(is_active=True)
     serializer_class = CourseSerializer
     pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['course_category', 'course_category__category_slug']
-    ordering_fields = ['course_title', 'created_at', 'id']
+    ordering_fields = [
+        'course_title', 'created_at', 'id', 'course_views',
+        'rating_average', 'rating_count', 'rating_score'
+    ]
     ordering = ['course_title']
     search_fields = ['course_title', 'course_description']
+    search_index_kind = 'course'
+    conditional_timestamp_fields = [
+        'updated_at', 'course_category__updated_at', 'course_type__updated_at'
+    ]
+    conditional_counter_fields = ['course_views']
+    cache_models = [Course, CourseCategory, CourseType]
     permission_classes = [AllowAny]
 
-class CourseLessonViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = CourseLesson.objects.filter(is_active=True)
+    def on_cached_response(self, request, hit, *args, **kwargs):
+        # A cache hit skips retrieve(), so count the view here.
+        if hit and 'pk' in kwargs:
+            record_course_view(int(kwargs['pk']))
+
+    def retrieve(self, request, *args, **kwargs):
+        not_modified = self.check_not_modified(self.get_object_queryset())
+        if not_modified:
+            record_course_view(int(self.kwargs['pk']))
+            return not_modified
+        instance = self.get_object()
+        record_course_view(instance.pk)
+        return Response(self.get_serializer(instance).data)
+
+class CourseLessonViewSet(
+    ReplicaReadMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetMixin, ValuesListMixin,
+    viewsets.ReadOnlyModelViewSet
+):
+    queryset = CourseLesson.objects.filter(is_active=True).select_related(
+        'course__course_category', 'course__course_type'
+    )
     serializer_class = CourseLessonSerializer
     pagination_class = CustomPagination
-    filter_backends = [OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['course', 'course__course_slug']
     ordering_fields = ['lesson_title', 'lesson_order', 'id']
     ordering = ['lesson_order']
+    conditional_timestamp_fields = [
+        'updated_at', 'course__updated_at',
+        'course__course_category__updated_at', 'course__course_type__updated_at'
+    ]
+    # The nested course includes its view count
+    conditional_counter_fields = ['course__course_views']
+    cache_models = [CourseLesson, Course, CourseCategory, CourseType]
     permission_classes = [AllowAny]
 
 
-class TopicTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class TopicTypeViewSet(
+    ReplicaReadMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetMixin, ValuesListMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     queryset = TopicType.objects.filter(is_active=True)
     serializer_class = TopicTypeSerializer
     pagination_class = CustomPagination
     filter_backends = [OrderingFilter]
     ordering_fields = ['type_name', 'id']
     ordering = ['type_name']
+    cache_models = [TopicType]
     permission_classes = [AllowAny]
 
 
-class LessonTopicViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = LessonTopic.objects.filter(is_active=True)
+class LessonTopicViewSet(
+    ReplicaReadMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetMixin, ValuesListMixin,
+    viewsets.ReadOnlyModelViewSet
+):
+    queryset = LessonTopic.objects.filter(is_active=True).select_related(
+        'type', 'lesson__course__course_category', 'lesson__course__course_type', 'rendered_content'
+    )
     serializer_class = LessonTopicSerializer
     pagination_class = CustomPagination
-    filter_backends = [OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['lesson', 'lesson__course', 'lesson__course__course_slug']
     ordering_fields = ['topic_title', 'topic_order', 'id']
     ordering = ['topic_order']
+    conditional_timestamp_fields = [
+        'updated_at', 'type__updated_at', 'lesson__updated_at', 'lesson__course__updated_at',
+        'lesson__course__course_category__updated_at', 'lesson__course__course_type__updated_at',
+        'rendered_content__created_at'
+    ]
+    # The nested course includes its view count
+    conditional_counter_fields = ['lesson__course__course_views']
+    cache_models = [
+        LessonTopic, TopicType, CourseLesson, Course, CourseCategory, CourseType, RenderedTopicContent
+    ]
     permission_classes = [AllowAny]
     
 
+
+class CourseOutlineView(ReplicaReadMixin, APIView):
+    """
+    A course with its ordered lessons and topic headers (no topic content)
+    in one response. Lessons and topics are cached per ``Course.updated_at``,
+    which the signal handlers bump whenever a lesson or topic changes. The
+    view count is updated without it, so it is part of the ETag and no
+    Last-Modified is sent.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, slug):
+        course = get_object_or_404(
+            Course.objects.select_related('course_category', 'course_type'),
+            course_slug=slug,
+            is_active=True
+        )
+        etag = '"outline-%s-%s-%s"' % (course.pk, course.updated_at.timestamp(), course.course_views)
+        not_modified = get_conditional_response(request._request, etag=etag)
+        if not_modified:
+            return not_modified
+
+        cache_key = f'course-outline:{course.pk}:{course.updated_at.timestamp()}'
+        lessons = cache.get(cache_key)
+        if lessons is None:
+            lessons = OutlineLessonSerializer(self.get_lessons(course), many=True).data
+            cache.set(cache_key, lessons, getattr(settings, 'COURSE_OUTLINE_CACHE_TIMEOUT', 3600))
+
+        response = Response({
+            'course': CourseSerializer(course, context={'request': request}).data,
+            'lessons': lessons,
+        })
+        response['ETag'] = etag
+        return response
+
+    def get_lessons(self, course):
+        topics = LessonTopic.objects.filter(is_active=True).select_related('type').only(
+            'id', 'lesson_id', 'topic_order', 'topic_title', 'topic_slug',
+            'type__id', 'type__type_name', 'type__topic_slug', 'type__created_at', 'type__is_active'
+        ).order_by('topic_order', 'id')
+        return CourseLesson.objects.filter(course=course, is_active=True).prefetch_related(
+            Prefetch('topics', queryset=topics, to_attr='active_topics')
+        ).order_by('lesson_order', 'id')
+
+
+class TopicContentView(APIView):
+    """
+    A topic's rendered HTML as stored, gzip-compressed when the client
+    accepts it, so serving it costs one lookup and no rendering or
+    compression. The content hash is the ETag.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        topic = get_object_or_404(
+            LessonTopic.objects.only('id', 'topic_content', 'rendered_content'),
+            pk=pk,
+            is_active=True
+        )
+        etag = '"%s"' % get_topic_hash(topic)
+        not_modified = get_conditional_response(request._request, etag=etag)
+        if not_modified:
+            return not_modified
+
+        rendered = get_or_render(topic)
+        if accepts_gzip(request):
+            response = HttpResponse(bytes(rendered.compressed_html), content_type='text/html; charset=utf-8')
+            response['ETag'] = etag
+            mark_compressed(response)
+        else:
+            response = HttpResponse(rendered.rendered_html, content_type='text/html; charset=utf-8')
+            response['ETag'] = etag
+            patch_vary_headers(response, ['Accept-Encoding'])
+        response['X-Word-Count'] = rendered.word_count
+        response['X-Reading-Time'] = rendered.reading_time
+        return response
+
+
+class ResponseCacheStatsView(APIView):
+    """Response cache hit/miss counters of the worker answering the request."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats.as_dict())
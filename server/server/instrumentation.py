@@ -0,0 +1,203 @@
+import functools
+import logging
+import os
+import random
+import re
+import sys
+import sysconfig
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db.models import signals
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Share of requests that are profiled. Unsampled requests pay for one
+    # random() call.
+    'SAMPLE_RATE': 0.05,
+    # A query shape run this many times in one request is reported as N+1.
+    'REPEATED_QUERY_THRESHOLD': 5,
+    'SERVER_TIMING': True,
+}
+
+# Profile of the current request, None when it isn't sampled
+_profile = ContextVar('request_profile', default=None)
+
+# IN lists differ in length between calls of the same query
+re_in_list = re.compile(r'\((?:%s, )*%s\)')
+
+# Frames from these paths are skipped when looking for the code that
+# issued a query.
+LIBRARY_PATHS = tuple({
+    sysconfig.get_paths()['stdlib'], sysconfig.get_paths()['purelib'], sysconfig.get_paths()['platlib'],
+    os.path.dirname(sys.modules['django'].__file__), os.path.abspath(__file__), '<',
+})
+
+# pre_init/post_init fire per loaded row and are left out.
+MODEL_SIGNALS = [
+    signals.pre_save, signals.post_save, signals.pre_delete, signals.post_delete, signals.m2m_changed,
+]
+
+
+def get_config(name):
+    return getattr(settings, 'REQUEST_INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+def get_query_shape(sql):
+    return re_in_list.sub('(...)', sql)
+
+
+def get_caller():
+    """``path:line in function`` of the innermost project frame."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(LIBRARY_PATHS):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class RequestProfile:
+    """Counters collected while one sampled request runs."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.timings = {'db': 0.0, 'serializer': 0.0, 'signals': 0.0}
+        self.depth = {'serializer': 0, 'signals': 0}
+        # query shape -> [count, caller recorded when it became repeated]
+        self.shapes = {}
+
+    def record_query(self, sql, duration):
+        self.query_count += 1
+        self.timings['db'] += duration
+        shape = get_query_shape(sql)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, None]
+            return
+        entry[0] += 1
+        # Walking the stack is the expensive part, so only repeated shapes pay for it.
+        if entry[0] == get_config('REPEATED_QUERY_THRESHOLD'):
+            entry[1] = get_caller()
+
+    def get_repeated_queries(self):
+        threshold = get_config('REPEATED_QUERY_THRESHOLD')
+        return [
+            {'sql': shape, 'count': count, 'caller': caller}
+            for shape, (count, caller) in self.shapes.items() if count >= threshold
+        ]
+
+    def get_total(self):
+        return time.perf_counter() - self.started
+
+
+def get_profile():
+    return _profile.get()
+
+
+@contextmanager
+def profile_request():
+    """Profile the code in the block; yields the RequestProfile."""
+    profile = RequestProfile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+def record_queries(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` hook feeding the current profile."""
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_query(sql, time.perf_counter() - started)
+
+
+@contextmanager
+def timed(kind):
+    """
+    Add the time spent in the block to ``kind`` of the current profile.
+    Nested blocks of the same kind count once, so a serializer rendering
+    nested serializers isn't added up twice.
+    """
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    profile.depth[kind] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.depth[kind] -= 1
+        if not profile.depth[kind]:
+            profile.timings[kind] += time.perf_counter() - started
+
+
+def timed_method(kind):
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if _profile.get() is None:
+                return method(*args, **kwargs)
+            with timed(kind):
+                return method(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_model_signals():
+    """Time every receiver of the model signals. Safe to call more than once."""
+    for signal in MODEL_SIGNALS:
+        if getattr(signal, 'instrumented', False):
+            continue
+        signal.send = timed_method('signals')(signal.send)
+        signal.instrumented = True
+
+
+def get_server_timing(profile):
+    return ', '.join([
+        'db;dur=%.1f;desc="%d queries"' % (profile.timings['db'] * 1000, profile.query_count),
+        'serializer;dur=%.1f' % (profile.timings['serializer'] * 1000),
+        'signals;dur=%.1f' % (profile.timings['signals'] * 1000),
+        'total;dur=%.1f' % (profile.get_total() * 1000),
+    ])
+
+
+def should_sample():
+    return random.random() < get_config('SAMPLE_RATE')
+
+
+def log_profile(request, response, profile, view_name):
+    """One structured line per sampled request, plus one per repeated query shape."""
+    data = {
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'view': view_name,
+        'queries': profile.query_count,
+        'db_ms': round(profile.timings['db'] * 1000, 1),
+        'serializer_ms': round(profile.timings['serializer'] * 1000, 1),
+        'signals_ms': round(profile.timings['signals'] * 1000, 1),
+        'total_ms': round(profile.get_total() * 1000, 1),
+    }
+    logger.info(
+        ' '.join(f'{key}={value}' for key, value in data.items()),
+        extra={'request_profile': data}
+    )
+    for repeated in profile.get_repeated_queries():
+        logger.warning(
+            'Repeated query in %s (%d times, from %s): %s',
+            view_name, repeated['count'], repeated['caller'], repeated['sql'],
+            extra={'repeated_query': {**repeated, 'view': view_name, 'path': request.path}}
+        )
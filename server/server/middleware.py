@@ -0,0 +1,197 @@
+import zlib
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from server.instrumentation import (
+    get_config as get_instrumentation_config, get_server_timing, instrument_model_signals,
+    log_profile, profile_request, record_queries, should_sample
+)
+from server.routers import get_replicas, pin_to_primary
+
+# Compression levels by payload size, measured on lesson-topic listings
+# (zlib, one core, ms per response / compressed size):
+#
+#   payload     level 1          level 4          level 6          level 9
+#   1.7 KB      0.08ms 25.9%     0.08ms 24.5%     0.08ms 24.5%     0.08ms 24.5%
+#   28 KB       0.19ms 13.7%     0.28ms 10.3%     0.57ms  9.6%     0.91ms  9.5%
+#   240 KB      1.4ms  12.1%     2.3ms   9.1%     6.1ms   7.9%    16.1ms   7.6%
+#   2.5 MB      18ms   12.3%     28ms    8.9%     67ms    7.6%     182ms   7.3%
+#
+# Level 6 is free below ~64 KB. Past that it costs 2-3x level 4 for about
+# 1% of the original size, and past ~1 MB level 1 keeps the CPU time per
+# request in check.
+DEFAULTS = {
+    'PATH_PREFIXES': ['/api/'],
+    # Responses carrying secrets next to data an attacker can reflect into
+    # them leak the secret through the compressed size (BREACH): tokens,
+    # profiles and the other account endpoints.
+    'EXCLUDED_PATH_PREFIXES': ['/api/users/'],
+    # Bodies below this fit in a packet or two, compressing them saves nothing.
+    'MIN_SIZE': 1024,
+    # (largest payload in bytes, level); the last entry applies to anything larger
+    'LEVELS': [(64 * 1024, 6), (1024 * 1024, 4), (None, 1)],
+    # Streaming responses have no known size up front
+    'STREAMING_LEVEL': 4,
+}
+
+re_accepts_gzip = _lazy_re_compile(r'\bgzip\b')
+
+
+def get_config(name):
+    return getattr(settings, 'RESPONSE_COMPRESSION', {}).get(name, DEFAULTS[name])
+
+
+def get_compression_level(size):
+    for limit, level in get_config('LEVELS'):
+        if limit is None or size <= limit:
+            return level
+    return get_config('LEVELS')[-1][1]
+
+
+def gzip_compress(data, level=None):
+    """Gzip ``data`` at ``level``, or at the level for its size."""
+    if level is None:
+        level = get_compression_level(len(data))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def accepts_gzip(request):
+    return bool(re_accepts_gzip.search(request.headers.get('Accept-Encoding', '')))
+
+
+def should_compress(request, response):
+    if not any(request.path.startswith(prefix) for prefix in get_config('PATH_PREFIXES')):
+        return False
+    if any(request.path.startswith(prefix) for prefix in get_config('EXCLUDED_PATH_PREFIXES')):
+        return False
+    if response.has_header('Content-Encoding') or not accepts_gzip(request):
+        return False
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    return True
+
+
+def mark_compressed(response):
+    """Headers of a response whose body was replaced with its gzip encoding."""
+    response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    # The encoded body differs from the identity one, so a strong ETag
+    # has to become weak (RFC 9110 8.8.1), as GZipMiddleware does.
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+
+def compress_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        # Sync flush so every chunk reaches the client when it is produced.
+        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def compress_async_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Gzip ``/api/`` responses for clients that accept it, except the
+    account endpoints under ``/api/users/``.
+
+    The level follows the payload size (see LEVELS above) and bodies under
+    MIN_SIZE are sent as they are. Streaming responses are compressed
+    chunk by chunk. Responses that already carry a Content-Encoding, such
+    as cached responses replayed with their stored gzip bytes, are passed
+    through untouched.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not should_compress(request, response):
+            return response
+
+        if response.streaming:
+            level = get_config('STREAMING_LEVEL')
+            if response.is_async:
+                response.streaming_content = compress_async_stream(response.streaming_content, level)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, level)
+            del response['Content-Length']
+            mark_compressed(response)
+            return response
+
+        if len(response.content) < get_config('MIN_SIZE'):
+            return response
+        compressed = gzip_compress(response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        mark_compressed(response)
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    After a successful write, pin the client to the primary database for
+    REPLICA_STICKY_SECONDS so it reads its own writes while the replicas
+    catch up (see server.routers).
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in self.safe_methods and response.status_code < 400 and get_replicas():
+            pin_to_primary(response)
+        return response
+
+
+class InstrumentationMiddleware:
+    """
+    Profile a sample of requests (REQUEST_INSTRUMENTATION['SAMPLE_RATE']):
+    query count, database, serializer and signal handler time go into a
+    Server-Timing header and a log line on server.instrumentation, and
+    query shapes repeated within the request are logged with the view and
+    the line that ran them (see server.instrumentation).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_model_signals()
+
+    def __call__(self, request):
+        if not should_sample():
+            return self.get_response(request)
+
+        with profile_request() as profile, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_queries))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name or match._func_path if match else None
+        if get_instrumentation_config('SERVER_TIMING'):
+            timing = get_server_timing(profile)
+            if response.has_header('Server-Timing'):
+                timing = response['Server-Timing'] + ', ' + timing
+            response['Server-Timing'] = timing
+        log_profile(request, response, profile, view_name)
+        return response
@@ -0,0 +1,88 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Replica alias chosen for the current request, None outside replica reads
+_replica_alias = ContextVar('replica_alias', default=None)
+
+# Cookie pinning a client to the primary for a while after it wrote
+STICKY_COOKIE = 'db_primary_until'
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def is_pinned_to_primary(request):
+    """True while the client is inside the read-your-writes window of its last write."""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin_to_primary(response):
+    seconds = get_sticky_seconds()
+    response.set_cookie(
+        STICKY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax'
+    )
+
+
+@contextmanager
+def replica_reads(request=None):
+    """
+    Send reads of REPLICA_APP_LABELS models to one replica, picked once so
+    the whole request sees a single snapshot. Clients that wrote within the
+    last REPLICA_STICKY_SECONDS keep reading from the primary.
+    """
+    replicas = get_replicas()
+    if not replicas or (request is not None and is_pinned_to_primary(request)):
+        yield None
+        return
+    alias = random.choice(replicas)
+    token = _replica_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _replica_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Reads go to a replica only inside ``replica_reads()``, which the
+    read-only CMS views enter, and only for the models of
+    REPLICA_APP_LABELS. Everything else, and every write, uses the
+    primary. Auth and token tables are never read from a replica.
+    """
+
+    def get_app_labels(self):
+        return getattr(settings, 'REPLICA_APP_LABELS', ['content_management_system'])
+
+    def db_for_read(self, model, **hints):
+        alias = _replica_alias.get()
+        if alias is not None and model._meta.app_label in self.get_app_labels():
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or objects loaded from a replica would be saved back to it.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and get its schema with the data.
+        if db in get_replicas():
+            return False
+        return None
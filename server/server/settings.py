@@ -48,7 +48,7 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user_management_system.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -64,6 +64,9 @@ SIMPLE_JWT = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'server.middleware.InstrumentationMiddleware',
+    'server.middleware.CompressionMiddleware',
+    'server.middleware.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -101,13 +104,55 @@ WSGI_APPLICATION = 'server.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Production SQLite profile, applied on every new connection:
+# WAL lets readers run alongside the single writer, synchronous=NORMAL is
+# durable in WAL mode except for the last commits on power loss, and
+# busy_timeout makes writers wait for the lock instead of failing.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms
+    'cache_size': -20000,  # KiB, i.e. 20 MB per connection
+    'mmap_size': 134217728,  # 128 MB
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests, so the pragmas and page
+        # cache survive instead of being rebuilt by every request.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            # Take the write lock when a transaction starts. A deferred
+            # transaction that later writes can't wait on busy_timeout and
+            # fails with "database is locked" instead.
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Read replicas for the read-only CMS endpoints, as aliases in DATABASES.
+# To try it locally with a copy of the database kept current by
+# `manage.py refresh_replicas`:
+#   DATABASES['replica'] = {
+#       **DATABASES['default'],
+#       'NAME': BASE_DIR / 'db.replica.sqlite3',
+#       'TEST': {'MIRROR': 'default'},
+#   }
+#   DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['server.routers.ReplicaRouter']
+# Apps whose models may be read from a replica
+REPLICA_APP_LABELS = ['content_management_system']
+# Seconds a client keeps reading from the primary after a write
+REPLICA_STICKY_SECONDS = 10
+
+# Applies the test-only settings of server/test_runner.py
+TEST_RUNNER = 'server.test_runner.TestRunner'
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -153,6 +198,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Emails are queued in the outbox table and sent by manage.py send_queued_emails
+EMAIL_OUTBOX = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 8,
+    'RETRY_DELAY': 30,
+    'MAX_RETRY_DELAY': 3600,
+    'CLAIM_TIMEOUT': 300,
+}
 SITE_URL = 'http://localhost:3000'
 
 
@@ -179,3 +233,91 @@ SIMPLE_JWT = {
     "TOKEN_BLACKLIST_ENABLED": True,
 }
 
+
+# Deepest reply level returned by the comments endpoint (?max_depth= may lower it)
+COMMENT_THREAD_MAX_DEPTH = 10
+
+# Seconds an estimated row count is cached for cursor pagination (None skips the count)
+PAGINATION_COUNT_CACHE_TIMEOUT = 300
+
+# Bayesian "top rated" score: a course's ratings are blended with
+# COURSE_RATING_PRIOR_WEIGHT virtual ratings of COURSE_RATING_PRIOR_MEAN
+COURSE_RATING_PRIOR_MEAN = 3.0
+COURSE_RATING_PRIOR_WEIGHT = 5
+
+# Course page views are buffered per process and written when the buffer is
+# this many seconds old or holds this many views
+COURSE_VIEWS_FLUSH_INTERVAL = 10
+COURSE_VIEWS_FLUSH_SIZE = 500
+# Also flush every interval from a background thread, so an idle worker
+# doesn't hold its views until it exits
+COURSE_VIEWS_FLUSH_IN_BACKGROUND = True
+
+# Seconds a course outline stays cached (entries are keyed by Course.updated_at)
+COURSE_OUTLINE_CACHE_TIMEOUT = 3600
+
+# Render topic content in a background thread after save. When False it is
+# rendered as part of the commit instead.
+TOPIC_CONTENT_RENDER_IN_BACKGROUND = True
+
+# Caches. The response cache keeps its generation counters in the same
+# backend, which must be shared by every worker process so a write in one
+# invalidates the responses cached by the others: files here, or e.g. Redis
+# when the workers run on several hosts. `check --deploy` warns about
+# per-process backends. Tests use in-memory caches (server.test_runner).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Gzip for API responses, see server/middleware.py for how the levels were picked
+RESPONSE_COMPRESSION = {
+    'PATH_PREFIXES': ['/api/'],
+    'EXCLUDED_PATH_PREFIXES': ['/api/users/'],
+    'MIN_SIZE': 1024,
+    'LEVELS': [(64 * 1024, 6), (1024 * 1024, 4), (None, 1)],
+    'STREAMING_LEVEL': 4,
+}
+
+# Render CMS list responses from values() rows instead of model instances
+CMS_VALUES_FAST_PATH = True
+
+# Per-request query/timing profile, see server/instrumentation.py.
+# Sampled requests get a Server-Timing header and a log line.
+REQUEST_INSTRUMENTATION = {
+    'SAMPLE_RATE': 0.05,
+    'REPEATED_QUERY_THRESHOLD': 5,
+    'SERVER_TIMING': True,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'server.instrumentation': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Read-through cache for the read-only CMS viewsets
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'responses',
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 5,
+}
+
+# In-process cache of full user rows for views that need more than the
+# claims in the access token (see user_management_system.authentication)
+USER_CACHE = {
+    'MAX_SIZE': 1024,
+    'TIMEOUT': 60,
+}
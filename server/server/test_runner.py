@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def get_test_settings():
+    """Settings replaced for the whole test run, on top of server.settings."""
+    return {
+        # A fresh in-memory cache per run instead of the shared files
+        'CACHES': {
+            **settings.CACHES,
+            'responses': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'responses',
+                'OPTIONS': {'MAX_ENTRIES': 10000},
+            },
+        },
+        # The flusher thread would write to the test database behind the
+        # tests' transactions; tests flush explicitly.
+        'COURSE_VIEWS_FLUSH_IN_BACKGROUND': False,
+        # Sampled requests would log a line each at random
+        'REQUEST_INSTRUMENTATION': {**settings.REQUEST_INSTRUMENTATION, 'SAMPLE_RATE': 0},
+    }
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner applying get_test_settings() while the tests run."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**get_test_settings())
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 
 class UserManagementSystemConfig(AppConfig):
     name = 'user_management_system'
+
+    def ready(self):
+        # Connect the user cache invalidation signal handlers
+        from user_management_system import authentication  # noqa: F401
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import router
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import ClaimsUser, CustomUser
+
+# Copied into every token so request.user can be built without a query.
+# Access tokens live a minute, so a changed claim is picked up by the next
+# refresh, which stamps the claims again from the user row.
+USER_CLAIMS = ['username', 'is_verified', 'is_staff']
+
+DEFAULTS = {
+    # Users kept per process, least recently used evicted first
+    'MAX_SIZE': 1024,
+    # Seconds a user is served from the cache. Saves in this process
+    # invalidate it at once; this bounds how stale other processes get.
+    'TIMEOUT': 60,
+}
+
+
+def get_config(name):
+    return getattr(settings, 'USER_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def add_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token carrying USER_CLAIMS; its access tokens copy them."""
+
+    @classmethod
+    def for_user(cls, user):
+        return add_user_claims(super().for_user(user), user)
+
+
+def build_user(values, model=CustomUser):
+    """
+    ``model`` instance from ``{attname: value}`` without a query. Fields
+    left out are deferred and loaded on first access.
+    """
+    field_names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(
+        router.db_for_read(model), field_names, [values[name] for name in field_names]
+    )
+
+
+def get_claims_user(token):
+    values = {claim: token[claim] for claim in USER_CLAIMS}
+    values['id'] = CustomUser._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+    # Tokens are only issued to active users, like simplejwt's TokenUser.
+    # Only reads trust this; writes load the row (ClaimsJWTAuthentication).
+    values['is_active'] = True
+    return build_user(values, ClaimsUser)
+
+
+class UserCache:
+    """Bounded, expiring cache of user rows for this process."""
+    field_names = [field.attname for field in CustomUser._meta.concrete_fields]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # user id -> (expires at, row values)
+        self.rows = OrderedDict()
+        # A row read while its user was invalidated must not be stored.
+        self.invalidations = 0
+
+    def get(self, user_id):
+        """The user with ``user_id``, or None if it doesn't exist."""
+        user_id = CustomUser._meta.pk.to_python(user_id)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.rows.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.rows.move_to_end(user_id)
+                return build_user(dict(zip(self.field_names, entry[1])))
+            invalidations = self.invalidations
+
+        row = CustomUser.objects.filter(pk=user_id).values_list(*self.field_names).first()
+        if row is None:
+            return None
+        with self.lock:
+            if invalidations == self.invalidations:
+                self.rows[user_id] = (now + get_config('TIMEOUT'), row)
+                self.rows.move_to_end(user_id)
+                while len(self.rows) > get_config('MAX_SIZE'):
+                    self.rows.popitem(last=False)
+        return build_user(dict(zip(self.field_names, row)))
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.invalidations += 1
+            self.rows.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.invalidations += 1
+            self.rows.clear()
+
+
+user_cache = UserCache()
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+def get_active_user(user_id, cached=True):
+    """
+    The full, active user for ``user_id``; raises AuthenticationFailed
+    otherwise. With ``cached=False`` the row is read from the database, as
+    anything saving the user must do: a cached row may be up to TIMEOUT
+    seconds old and saving it would write the old columns back.
+    """
+    if cached:
+        user = user_cache.get(user_id)
+    else:
+        user = CustomUser.objects.filter(pk=user_id).first()
+    if user is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the user query for reads: request.user is a
+    ClaimsUser built from the token claims, with every other field
+    deferred. Views that need those fields use FullUserMixin. Tokens
+    issued without the claims fall back to the user cache.
+
+    Requests with unsafe methods are authenticated against the current user
+    row instead, so a user deactivated since the token was issued can't
+    write and views save current values.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None or request.method in SAFE_METHODS:
+            return result
+        user, validated_token = result
+        return get_active_user(user.pk, cached=False), validated_token
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        if all(claim in validated_token for claim in USER_CLAIMS):
+            return get_claims_user(validated_token)
+        return get_active_user(validated_token[api_settings.USER_ID_CLAIM])
+
+
+class FullUserMixin:
+    """
+    For views that read fields of request.user beyond the token claims:
+    replaces the claims user with the full row from the user cache. Unsafe
+    methods already authenticate with the row from the database.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        user = request.user
+        if user.is_authenticated and user.get_deferred_fields():
+            request.user = get_active_user(user.pk)
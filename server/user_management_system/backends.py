@@ -4,6 +4,25 @@ from django.contrib.auth import get_user_model
 
 UserModel = get_user_model()
 
+
+def get_user_for_login(email, password):
+    """
+    The user with ``email`` if ``password`` is theirs, else None. Costs one
+    query and one password hash whether or not the email exists, so
+    response times don't reveal registered addresses. A hash made with
+    outdated hasher settings is upgraded on success.
+    """
+    try:
+        user = UserModel._default_manager.get(email=email)
+    except UserModel.DoesNotExist:
+        # Run the hasher anyway, like ModelBackend does
+        UserModel().set_password(password)
+        return None
+    if user.check_password(password):
+        return user
+    return None
+
+
 class EmailBackend(ModelBackend):
     """
     Authenticate using email instead of username.
@@ -14,12 +33,7 @@ class EmailBackend(ModelBackend):
         email = email or username
         if email is None or password is None:
             return None
-        try:
-            user = UserModel.objects.get(email=email)
-        except UserModel.DoesNotExist:
-            return None
-        else:
-            if user.check_password(password) and self.user_can_authenticate(user):
-                return user
-            print("User cannot authenticate")
+        user = get_user_for_login(email, password)
+        if user is not None and self.user_can_authenticate(user):
+            return user
         return None
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from user_management_system.retention import (
+    delete_in_chunks, get_expired_tokens, get_old_outbox_emails, get_stale_unverified_users
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding and blacklisted refresh tokens, registrations that were "
+        "never verified and old outbox emails. Meant to run periodically, e.g. daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--unverified-days', type=int, default=7,
+            help="Age in days after which unverified registrations are deleted."
+        )
+        parser.add_argument(
+            '--outbox-days', type=int, default=30,
+            help="Age in days after which sent or failed outbox emails are deleted."
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows deleted per transaction.")
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help="Seconds to sleep between batches, leaving the write lock to other writers."
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted.")
+
+    def handle(self, *args, **options):
+        tokens = get_expired_tokens()
+        users = get_stale_unverified_users(options['unverified_days'])
+        emails = get_old_outbox_emails(options['outbox_days'])
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"Would delete {tokens.count()} expired tokens, {users.count()} unverified users "
+                f"and {emails.count()} outbox emails."
+            )
+            return
+
+        deleted_tokens = delete_in_chunks(tokens, options['batch_size'], options['pause'])
+        deleted_users = delete_in_chunks(users, options['batch_size'], options['pause'])
+        deleted_emails = delete_in_chunks(emails, options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted_tokens} expired tokens, {deleted_users} unverified users "
+            f"and {deleted_emails} outbox emails."
+        ))
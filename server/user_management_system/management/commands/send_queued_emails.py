@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from user_management_system.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the emails waiting in the outbox over one SMTP connection per run. "
+        "Run it from cron, or keep it running with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Emails claimed and sent at a time.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting.")
+        parser.add_argument(
+            '--interval', type=float, default=5.0, help="Seconds between polls with --loop."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = deliver_pending(batch_size=options['batch_size'])
+            if sent or failed or not options['loop']:
+                style = self.style.WARNING if failed else self.style.SUCCESS
+                self.stdout.write(style(f"Sent {sent} emails, {failed} failed and will be retried."))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
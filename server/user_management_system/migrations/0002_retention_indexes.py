@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+# simplejwt's token table only indexes user_id and jti. Revocation selects a
+# user's unexpired tokens and pruning selects expired ones.
+TOKEN_TABLE = 'token_blacklist_outstandingtoken'
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user_management_system', '0001_initial'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_verified', False)), fields=['date_joined'], name='user_unverified_joined_idx'),
+        ),
+        migrations.RunSQL(
+            f"CREATE INDEX IF NOT EXISTS outstandingtoken_user_expires_idx ON {TOKEN_TABLE} (user_id, expires_at)",
+            "DROP INDEX IF EXISTS outstandingtoken_user_expires_idx",
+        ),
+        migrations.RunSQL(
+            f"CREATE INDEX IF NOT EXISTS outstandingtoken_expires_idx ON {TOKEN_TABLE} (expires_at)",
+            "DROP INDEX IF EXISTS outstandingtoken_expires_idx",
+        ),
+    ]
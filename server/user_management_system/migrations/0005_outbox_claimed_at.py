@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management_system', '0004_claims_user'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='outboxemail',
+            name='outbox_pending_dedup_key',
+        ),
+        migrations.AddField(
+            model_name='outboxemail',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='outboxemail',
+            constraint=models.UniqueConstraint(condition=models.Q(('claimed_at__isnull', True), ('failed_at__isnull', True), ('sent_at__isnull', True)), fields=('dedup_key',), name='outbox_pending_dedup_key'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 import time
 from django.utils.text import slugify
 import os
@@ -15,6 +17,13 @@ class CustomUser(AbstractUser):
     pending_email = models.EmailField(null=True, blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
 
+    class Meta(AbstractUser.Meta):
+        # Registrations prune_auth_tables looks for
+        indexes = [
+            models.Index(
+                fields=['date_joined'], condition=Q(is_verified=False), name='user_unverified_joined_idx'
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         # Save first to get a primary key (if new user)
@@ -37,4 +46,63 @@ class CustomUser(AbstractUser):
 
                 # Update the avatar field to new name and save again (avoid recursion by updating directly)
                 self.avatar.name = new_path
-                super().save(update_fields=['avatar'])
\ No newline at end of file
+                super().save(update_fields=['avatar'])
+
+class ClaimsUserReadOnly(Exception):
+    """Raised on saving or deleting a ClaimsUser."""
+
+
+class ClaimsUser(CustomUser):
+    """
+    User built from access token claims, with every other field deferred.
+    Equal to its CustomUser row, but not saveable: the claims may be stale
+    and saving them would write them back.
+    """
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise ClaimsUserReadOnly("Users built from token claims can't be saved, load the user row first.")
+
+    def delete(self, *args, **kwargs):
+        raise ClaimsUserReadOnly("Users built from token claims can't be deleted, load the user row first.")
+
+class OutboxEmail(models.Model):
+    """
+    Email waiting to be sent by the send_queued_emails worker. Rows are
+    written in the request's transaction, so an email exists only if the
+    change it announces was committed.
+    """
+    dedup_key = models.CharField(max_length=255, null=True, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipient = models.EmailField()
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    # Set while a worker is sending the email
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # One unclaimed pending email per key: a repeated request
+            # replaces it. Once a worker has claimed it, a new one is queued.
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=Q(sent_at__isnull=True, failed_at__isnull=True, claimed_at__isnull=True),
+                name='outbox_pending_dedup_key'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['send_after'], condition=Q(sent_at__isnull=True, failed_at__isnull=True),
+                name='outbox_pending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipient}"
@@ -0,0 +1,152 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import OutboxEmail
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    # Attempts before an email is marked failed
+    'MAX_ATTEMPTS': 8,
+    # Seconds before the first retry, doubled on every later one
+    'RETRY_DELAY': 30,
+    'MAX_RETRY_DELAY': 3600,
+    # Seconds a claimed batch is reserved for the worker sending it, so a
+    # second worker doesn't send it too. Longer than one batch may take;
+    # after it the batch is claimed again, e.g. if the worker was killed.
+    'CLAIM_TIMEOUT': 300,
+}
+
+
+def get_config(name):
+    return getattr(settings, 'EMAIL_OUTBOX', {}).get(name, DEFAULTS[name])
+
+
+def queue_email(subject, body, recipient, from_email=None, dedup_key=None):
+    """
+    Add an email to the outbox, in the caller's transaction. A pending
+    email with the same ``dedup_key`` is updated rather than sent twice,
+    unless a worker is already sending it: then a new email is queued, as
+    the claimed one may be sent with the old content.
+    """
+    values = {
+        'subject': subject,
+        'body': body,
+        'recipient': recipient,
+        'from_email': from_email or '',
+        'attempts': 0,
+        'last_error': '',
+        'send_after': timezone.now(),
+    }
+    if dedup_key is not None:
+        # Two requests racing past the update both insert, and the pending
+        # dedup_key constraint fails the second transaction. On SQLite
+        # writers take the lock at BEGIN (IMMEDIATE) and can't race.
+        if get_pending().filter(dedup_key=dedup_key, claimed_at__isnull=True).update(**values):
+            return
+    OutboxEmail.objects.create(dedup_key=dedup_key, **values)
+
+
+def get_pending():
+    return OutboxEmail.objects.filter(sent_at__isnull=True, failed_at__isnull=True)
+
+
+def claim_batch(batch_size):
+    """
+    Reserve up to ``batch_size`` due emails for this worker and return them.
+    They share one ``claimed_at``, which record_results checks.
+    """
+    now = timezone.now()
+    claim_expired = now - timedelta(seconds=get_config('CLAIM_TIMEOUT'))
+    with transaction.atomic():
+        due = get_pending().filter(
+            Q(claimed_at__isnull=True) | Q(claimed_at__lt=claim_expired), send_after__lte=now
+        ).order_by('send_after')
+        ids = list(due.values_list('id', flat=True)[:batch_size])
+        get_pending().filter(id__in=ids).update(claimed_at=now)
+    return list(OutboxEmail.objects.filter(id__in=ids, claimed_at=now).order_by('id'))
+
+
+def get_retry_delay(attempts):
+    return min(get_config('RETRY_DELAY') * 2 ** (attempts - 1), get_config('MAX_RETRY_DELAY'))
+
+
+def send_batch(emails, connection):
+    """
+    Send ``emails`` over the open ``connection``. Messages go one per
+    send_messages call so a failure is pinned on its email and nothing
+    already delivered is sent again. Returns (sent, failed).
+    """
+    sent, failed = [], []
+    for email in emails:
+        message = EmailMessage(
+            email.subject, email.body, email.from_email or None, [email.recipient], connection=connection
+        )
+        try:
+            connection.send_messages([message])
+        except Exception as e:
+            email.last_error = f'{type(e).__name__}: {e}'
+            failed.append(email)
+        else:
+            sent.append(email)
+    return sent, failed
+
+
+def record_results(sent, failed, claimed_at):
+    """
+    Store the outcome of a batch claimed at ``claimed_at``. Emails whose
+    claim expired and was taken by another worker are left to it.
+    """
+    now = timezone.now()
+    claimed = OutboxEmail.objects.filter(claimed_at=claimed_at)
+    with transaction.atomic():
+        claimed.filter(id__in=[email.id for email in sent]).update(sent_at=now)
+        # A failed email goes back to the queue unless a newer one with its
+        # key was queued while it was claimed; that one replaces it.
+        replaced = set(get_pending().filter(
+            dedup_key__in=[email.dedup_key for email in failed if email.dedup_key],
+            claimed_at__isnull=True
+        ).values_list('dedup_key', flat=True))
+        for email in failed:
+            email.attempts += 1
+            email.claimed_at = None
+            if email.dedup_key in replaced or email.attempts >= get_config('MAX_ATTEMPTS'):
+                email.failed_at = now
+            else:
+                email.send_after = now + timedelta(seconds=get_retry_delay(email.attempts))
+        claimed.bulk_update(failed, ['attempts', 'last_error', 'failed_at', 'send_after', 'claimed_at'])
+
+
+def deliver_pending(batch_size=None, connection=None):
+    """
+    Send every due email, a batch at a time, over one connection. Returns
+    (sent, failed) counts. Failed emails are retried with exponential
+    backoff until MAX_ATTEMPTS.
+    """
+    batch_size = batch_size or get_config('BATCH_SIZE')
+    total_sent = total_failed = 0
+    connection = connection or get_connection()
+    opened = False
+    try:
+        while True:
+            emails = claim_batch(batch_size)
+            if not emails:
+                break
+            if not opened:
+                connection.open()
+                opened = True
+            sent, failed = send_batch(emails, connection)
+            record_results(sent, failed, emails[0].claimed_at)
+            total_sent += len(sent)
+            total_failed += len(failed)
+            # Nothing got through, the server or connection is likely down:
+            # leave the rest of the queue for the next run instead of
+            # spending an attempt of every email on it.
+            if failed and not sent:
+                break
+    finally:
+        if opened:
+            connection.close()
+    return total_sent, total_failed
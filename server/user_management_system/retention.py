@@ -0,0 +1,44 @@
+import time
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+from .models import CustomUser, OutboxEmail
+
+
+def delete_in_chunks(queryset, batch_size=500, pause=0.0):
+    """
+    Delete the rows of ``queryset`` ``batch_size`` at a time, each chunk in
+    its own short transaction so writers are never locked out for long.
+    Returns the number of rows of the queryset's model deleted.
+    """
+    total = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        with transaction.atomic():
+            queryset.model.objects.filter(pk__in=ids).delete()
+        total += len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+def get_expired_tokens():
+    # Blacklist entries go with their outstanding token (on_delete=CASCADE).
+    return OutstandingToken.objects.filter(expires_at__lte=aware_utcnow()).order_by()
+
+
+def get_stale_unverified_users(days):
+    """Accounts that never verified their email or logged in within ``days`` of registering."""
+    return CustomUser.objects.filter(
+        is_verified=False, last_login__isnull=True, date_joined__lt=timezone.now() - timedelta(days=days)
+    ).order_by()
+
+
+def get_old_outbox_emails(days):
+    """Emails sent, or given up on, more than ``days`` ago."""
+    cutoff = timezone.now() - timedelta(days=days)
+    return OutboxEmail.objects.filter(Q(sent_at__lt=cutoff) | Q(failed_at__lt=cutoff)).order_by()
@@ -3,13 +3,16 @@ import random
 import time
 import string
 from django.core.exceptions import ValidationError
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from .models import CustomUser
 from django.core.validators import validate_email
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import update_last_login
+from rest_framework_simplejwt.settings import api_settings
+from .backends import get_user_for_login
+from .authentication import ClaimsRefreshToken
 
 
 
@@ -72,19 +75,16 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = 'email'
+    token_class = ClaimsRefreshToken
 
     def validate(self, attrs):
         email = attrs.get('email')
         password = attrs.get('password')
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            raise serializers.ValidationError({
-                "detail": "Invalid email or password."
-            })
-
-        if not check_password(password, user.password):
+        # One lookup and one password hash. super().validate() would run
+        # authenticate() and hash the password again.
+        user = get_user_for_login(email, password)
+        if user is None:
             raise serializers.ValidationError({
                 "detail": "Invalid email or password."
             })
@@ -94,8 +94,16 @@ class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
                 "detail": "Email not verified. Please check your inbox to verify your email."
             })
 
-        data = super().validate({self.username_field: email, 'password': password})
-        return data
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise exceptions.AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+
+        self.user = user
+        refresh = self.get_token(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
     
 
 class UserProfileSerializer(serializers.ModelSerializer):
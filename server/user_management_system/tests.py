@@ -1,3 +1,289 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from django.core import mail
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from content_management_system.models import Course, CourseCategory, CourseComment, CourseType
+from user_management_system.authentication import ClaimsRefreshToken, get_claims_user, user_cache
+from user_management_system.models import ClaimsUserReadOnly, CustomUser, OutboxEmail
+from user_management_system.outbox import claim_batch, deliver_pending, record_results
+from user_management_system.utils import blacklist_user_tokens
 
-# Create your tests here.
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='claims_user', email='claims@example.com', password='claims-Password-1',
+            first_name='Claims', is_verified=True
+        )
+        self.client = APIClient()
+
+    def authenticate(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def count_user_queries(self, method, path, **kwargs):
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(path, **kwargs)
+        table = CustomUser._meta.db_table
+        return response, len([query for query in captured if f'FROM "{table}"' in query['sql']])
+
+    def test_login_token_carries_claims(self):
+        response = self.client.post(
+            '/api/users/token/', {'email': 'claims@example.com', 'password': 'claims-Password-1'}
+        )
+        self.assertEqual(response.status_code, 200)
+        token = AccessToken(response.data['access'])
+        self.assertEqual(
+            (token['username'], token['is_verified'], token['is_staff']), ('claims_user', True, False)
+        )
+
+    def test_claims_request_skips_user_query(self):
+        category = CourseCategory.objects.create(category_name='Category', category_slug='category')
+        course_type = CourseType.objects.create(course_name='Video', course_slug='video')
+        course = Course.objects.create(
+            course_category=category, course_type=course_type, course_title='Course',
+            course_description='Description', created_by=self.user
+        )
+        self.authenticate(ClaimsRefreshToken.for_user(self.user).access_token)
+        response, user_queries = self.count_user_queries('get', '/api/cms/comments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_queries, 0)
+
+        # Writes are authenticated against the user row
+        response, user_queries = self.count_user_queries(
+            'post', '/api/cms/comments/', data={'course': course.pk, 'content': 'Hello'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(CourseComment.objects.get().user, self.user)
+        self.assertEqual(user_queries, 1)
+
+    def test_claims_user_is_not_saveable(self):
+        token = ClaimsRefreshToken.for_user(self.user).access_token
+        user = get_claims_user(token)
+        self.assertEqual(user, self.user)
+        with self.assertRaises(ClaimsUserReadOnly):
+            user.save()
+        with self.assertRaises(ClaimsUserReadOnly):
+            user.delete()
+
+    def test_deactivated_user_cannot_write(self):
+        self.authenticate(ClaimsRefreshToken.for_user(self.user).access_token)
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.put('/api/users/update-profile/', {'first_name': 'Updated', 'last_name': 'User'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).first_name, 'Claims')
+
+    def test_full_user_views_use_cache(self):
+        self.authenticate(ClaimsRefreshToken.for_user(self.user).access_token)
+        response, user_queries = self.count_user_queries('get', '/api/users/profile/')
+        self.assertEqual(response.data['email'], 'claims@example.com')
+        self.assertEqual(user_queries, 1)
+        response, user_queries = self.count_user_queries('get', '/api/users/profile/')
+        self.assertEqual(user_queries, 0)
+
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.data['first_name'], 'Renamed')
+
+    def test_profile_update_keeps_newer_password(self):
+        self.authenticate(ClaimsRefreshToken.for_user(self.user).access_token)
+        self.assertEqual(self.client.get('/api/users/profile/').status_code, 200)
+        # Changed by another process, whose save doesn't reach this cache
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.set_password('newer-Password-2')
+        CustomUser.objects.filter(pk=user.pk).update(password=user.password)
+
+        response = self.client.put('/api/users/update-profile/', {'first_name': 'Updated', 'last_name': 'User'})
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertEqual(user.first_name, 'Updated')
+        self.assertTrue(user.check_password('newer-Password-2'))
+
+    def test_token_without_claims_falls_back_to_cache(self):
+        self.authenticate(AccessToken.for_user(self.user))
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.data['username'], 'claims_user')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/users/profile/').status_code, 401)
+
+    def test_refresh_restamps_claims(self):
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        CustomUser.objects.filter(pk=self.user.pk).update(is_staff=True)
+        user_cache.clear()
+        self.client.cookies['refresh_token'] = str(refresh)
+        response = self.client.post('/api/users/token/refresh/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AccessToken(response.data['access'])['is_staff'])
+
+
+class TokenRetentionTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='token_user', email='tokens@example.com', password='x', is_verified=True
+        )
+
+    def expire(self, token):
+        OutstandingToken.objects.filter(jti=token['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+
+    def test_blacklist_user_tokens(self):
+        tokens = [RefreshToken.for_user(self.user) for _ in range(3)]
+        RefreshToken.for_user(CustomUser.objects.create_user(username='other_user', email='o@example.com'))
+        self.expire(tokens[0])
+        tokens[1].blacklist()
+
+        with self.assertNumQueries(2):
+            self.assertEqual(blacklist_user_tokens(self.user), 1)
+        self.assertEqual(
+            set(BlacklistedToken.objects.values_list('token__jti', flat=True)),
+            {tokens[1]['jti'], tokens[2]['jti']}
+        )
+        self.assertEqual(blacklist_user_tokens(self.user), 0)
+
+    def test_prune_auth_tables(self):
+        expired, current = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        expired.blacklist()
+        self.expire(expired)
+        joined = timezone.now() - timedelta(days=30)
+        stale = CustomUser.objects.create_user(username='stale_user', email='stale@example.com')
+        recent = CustomUser.objects.create_user(username='recent_user', email='recent@example.com')
+        CustomUser.objects.filter(pk__in=[stale.pk, self.user.pk]).update(date_joined=joined)
+
+        out = StringIO()
+        call_command('prune_auth_tables', '--batch-size=1', stdout=out)
+        self.assertIn('Deleted 1 expired tokens, 1 unverified users and 0 outbox emails.', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [current['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertEqual(
+            set(CustomUser.objects.values_list('pk', flat=True)), {self.user.pk, recent.pk}
+        )
+
+
+class FailingBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP server unavailable')
+
+
+class EmailOutboxTests(TestCase):
+    def register(self, email='outbox@example.com'):
+        return self.client.post('/api/users/register/', {
+            'first_name': 'Out', 'last_name': 'Box', 'email': email,
+            'password': 'outbox-Password-1', 'confirm_password': 'outbox-Password-1',
+        })
+
+    def test_emails_are_queued_and_sent_by_worker(self):
+        self.assertEqual(self.register().status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboxEmail.objects.get().recipient, 'outbox@example.com')
+
+        out = StringIO()
+        call_command('send_queued_emails', stdout=out)
+        self.assertIn('Sent 1 emails', out.getvalue())
+        self.assertEqual([message.to for message in mail.outbox], [['outbox@example.com']])
+        self.assertIsNotNone(OutboxEmail.objects.get().sent_at)
+        self.assertEqual(deliver_pending(), (0, 0))
+
+    def test_repeated_resend_is_deduplicated(self):
+        self.register()
+        for _ in range(3):
+            self.client.post('/api/users/resend-verification-email/', {'email': 'outbox@example.com'})
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+        self.assertEqual(deliver_pending(), (1, 0))
+
+        # After sending, a new request queues a new email
+        self.client.post('/api/users/resend-verification-email/', {'email': 'outbox@example.com'})
+        self.assertEqual(OutboxEmail.objects.filter(sent_at__isnull=True).count(), 1)
+
+    def test_resend_during_delivery_queues_new_email(self):
+        self.register()
+        claimed = claim_batch(10)
+        self.client.post('/api/users/resend-verification-email/', {'email': 'outbox@example.com'})
+        self.assertEqual(OutboxEmail.objects.count(), 2)
+        self.assertEqual(OutboxEmail.objects.get(pk=claimed[0].pk).attempts, 0)
+
+        # The claim expired and another worker took the email over
+        with override_settings(EMAIL_OUTBOX={'CLAIM_TIMEOUT': 0}):
+            self.assertEqual(len(claim_batch(10)), 2)
+        record_results(claimed, [], claimed[0].claimed_at)
+        self.assertFalse(OutboxEmail.objects.filter(sent_at__isnull=False).exists())
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        self.register()
+        with override_settings(
+            EMAIL_BACKEND='user_management_system.tests.FailingBackend',
+            EMAIL_OUTBOX={'MAX_ATTEMPTS': 2, 'RETRY_DELAY': 60},
+        ):
+            self.assertEqual(deliver_pending(), (0, 1))
+            email = OutboxEmail.objects.get()
+            self.assertEqual(email.attempts, 1)
+            self.assertIn('SMTP server unavailable', email.last_error)
+            self.assertGreater(email.send_after, timezone.now() + timedelta(seconds=50))
+            # Not due yet
+            self.assertEqual(deliver_pending(), (0, 0))
+
+            OutboxEmail.objects.update(send_after=timezone.now())
+            self.assertEqual(deliver_pending(), (0, 1))
+            self.assertIsNotNone(OutboxEmail.objects.get().failed_at)
+
+        self.assertEqual(deliver_pending(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+
+class CountingHasher(PBKDF2PasswordHasher):
+    iterations = 1000
+    calls = 0
+
+    def encode(self, password, salt, iterations=None):
+        CountingHasher.calls += 1
+        return super().encode(password, salt, iterations)
+
+
+class StrongerCountingHasher(CountingHasher):
+    iterations = 2000
+
+
+@override_settings(PASSWORD_HASHERS=['user_management_system.tests.CountingHasher'])
+class LoginHashingTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='login_user', email='login@example.com', password='login-Password-1', is_verified=True
+        )
+        CountingHasher.calls = 0
+
+    def login(self, email='login@example.com', password='login-Password-1'):
+        return self.client.post('/api/users/token/', {'email': email, 'password': password})
+
+    def test_one_hash_per_login(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(CountingHasher.calls, 1)
+
+    def test_failed_logins_hash_once(self):
+        for email, password in [('login@example.com', 'wrong'), ('nobody@example.com', 'login-Password-1')]:
+            CountingHasher.calls = 0
+            response = self.login(email, password)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['detail'][0], 'Invalid email or password.')
+            self.assertEqual(CountingHasher.calls, 1)
+
+    def test_unverified_and_inactive_users(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(is_verified=False)
+        self.assertIn('not verified', self.login().data['detail'][0])
+        CustomUser.objects.filter(pk=self.user.pk).update(is_verified=True, is_active=False)
+        self.assertEqual(self.login().status_code, 401)
+
+    def test_hash_upgraded_on_login(self):
+        with override_settings(PASSWORD_HASHERS=['user_management_system.tests.StrongerCountingHasher']):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
@@ -1,11 +1,12 @@
-from django.core.mail import send_mail
 from django.conf import settings
 from django.urls import reverse
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
 from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
 from django.contrib.sites.shortcuts import get_current_site
+from .outbox import queue_email
 
 
 # def send_verification_email(user, request):
@@ -35,7 +36,11 @@ def send_verification_email(user, request, use_pending=False):
     subject = "Verify your new email address"
     message = f"Hi {user.username},\n\nClick the link below to verify your new email:\n{verify_url}"
 
-    send_mail(subject, message, "no-reply@yalsworld.com", [to_email])
+    # Resending replaces a pending email instead of queueing another one
+    queue_email(
+        subject, message, to_email, from_email="no-reply@yalsworld.com",
+        dedup_key=f"verify-email:{user.pk}:{to_email}"
+    )
 
 
 
@@ -45,22 +50,27 @@ def send_password_reset_email(user, request):
     reset_link = request.build_absolute_uri(
         reverse('reset-password-confirm', kwargs={'uidb64': uid, 'token': token})
     )
-    send_mail(
+    queue_email(
         subject='Reset your password',
-        message=f'Click the link to reset your password: {reset_link}',
+        body=f'Click the link to reset your password: {reset_link}',
+        recipient=user.email,
         from_email=settings.EMAIL_HOST_USER,
-        recipient_list=[user.email]
+        dedup_key=f'password-reset:{user.pk}'
     )
     print("Reset Password Link:", reset_link)
 
 
 def blacklist_user_tokens(user):
-    tokens = OutstandingToken.objects.filter(user=user)
-    for token in tokens:
-        try:
-            BlacklistedToken.objects.get_or_create(token=token)
-        except Exception as e:
-            print('error', e)
+    """Blacklist every unexpired refresh token of ``user``. Returns the number revoked."""
+    # Served by the (user_id, expires_at) index; expired tokens are
+    # rejected anyway and left to prune_auth_tables.
+    token_ids = OutstandingToken.objects.filter(
+        user=user, expires_at__gt=aware_utcnow(), blacklistedtoken__isnull=True
+    ).values_list('id', flat=True)
+    created = BlacklistedToken.objects.bulk_create(
+        [BlacklistedToken(token_id=token_id) for token_id in token_ids], ignore_conflicts=True
+    )
+    return len(created)
 
 
 
@@ -73,4 +83,7 @@ def send_email_change_verification_email(user, request):
 
     subject = "Confirm your email change"
     message = f"Click the link below to confirm your new email address:\n{verify_url}"
-    send_mail(subject, message, "no-reply@yalsworld.com", [user.pending_email])
+    queue_email(
+        subject, message, user.pending_email, from_email="no-reply@yalsworld.com",
+        dedup_key=f"confirm-email-change:{user.pk}"
+    )
@@ -16,13 +16,20 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from django.utils.text import slugify
 from rest_framework_simplejwt.tokens import RefreshToken
 from .utils import blacklist_user_tokens
+from .authentication import FullUserMixin, add_user_claims, get_active_user
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework import status
 from django.urls import reverse
 from django.utils.encoding import force_bytes
+from django.db import transaction
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+
+    # The verification email is queued in the same transaction as the user
+    @transaction.atomic
     def perform_create(self, serializer):
         user = serializer.save()
         send_verification_email(user, self.request)
@@ -48,7 +55,7 @@ class VerifyEmailView(APIView):
             return Response({"message": "Email verified successfully."}, status=status.HTTP_200_OK)
 
         return Response({"error": "Invalid or expired token."}, status=status.HTTP_400_BAD_REQUEST)
-class UpdateProfileView(generics.UpdateAPIView):
+class UpdateProfileView(FullUserMixin, generics.UpdateAPIView):
     serializer_class = UpdateProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -56,7 +63,7 @@ class UpdateProfileView(generics.UpdateAPIView):
         return self.request.user
 class UpdateUsernameView(UpdateProfileView):
     serializer_class = UpdateUsernameSerializer
-class UpdateAvatarView(generics.UpdateAPIView):
+class UpdateAvatarView(FullUserMixin, generics.UpdateAPIView):
     serializer_class = UpdateAvatarSerializer
     permission_classes = [permissions.IsAuthenticated]
     def get_object(self):
@@ -76,7 +83,7 @@ class UpdateAvatarView(generics.UpdateAPIView):
             user.save()
         if old_avatar_path and os.path.exists(old_avatar_path):
             os.remove(old_avatar_path)
-class ChangePasswordView(generics.UpdateAPIView):
+class ChangePasswordView(FullUserMixin, generics.UpdateAPIView):
     serializer_class = ChangePasswordSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -98,9 +105,10 @@ class ChangePasswordView(generics.UpdateAPIView):
         response.delete_cookie('refresh_token')
 
         return response
-class ChangeEmailView(APIView):
+class ChangeEmailView(FullUserMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @transaction.atomic
     def put(self, request):
         user = request.user
         new_email = request.data.get('new_email')
@@ -159,11 +167,20 @@ class CookieTokenRefreshView(APIView):
 
         try:
             token = RefreshToken(refresh_token)
-            access_token = str(token.access_token)
-            return Response({'access': access_token})
+            access_token = token.access_token
         except Exception:
             return Response({'detail': 'Invalid refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
-class UserProfileView(generics.RetrieveAPIView):
+
+        # Claims come from the user row, not the refresh token, so changes
+        # such as a revoked is_staff reach the next access token. Read
+        # from the database so a deactivated user gets no new token.
+        try:
+            user = get_active_user(token[api_settings.USER_ID_CLAIM], cached=False)
+        except AuthenticationFailed:
+            return Response({'detail': 'Invalid refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
+        add_user_claims(access_token, user)
+        return Response({'access': str(access_token)})
+class UserProfileView(FullUserMixin, generics.RetrieveAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -185,7 +202,7 @@ class LogoutView(APIView):
             return response
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-class DeleteUserView(APIView):
+class DeleteUserView(FullUserMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
     def delete(self, request):
         user = request.user
@@ -238,6 +255,7 @@ class ResendVerificationEmailView(APIView):
     permission_classes = [permissions.AllowAny]
     serializer_class = ResendVerificationEmailSerializer
 
+    @transaction.atomic
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)